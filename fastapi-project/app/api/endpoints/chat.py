@@ -1,21 +1,40 @@
 # FastAPI endpoints for chat functionality (start, message, history, threads)
-import json
-from fastapi import APIRouter, HTTPException
+from functools import partial
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Response
 from fastapi.responses import StreamingResponse
 from app.models.chat import StartChatRequest, StartChatResponse, SendMessageRequest
 from app.services.chat_manager import (
     update_last_used,
     validate_asset_id,
     create_chat_thread,
-    get_asset_id_for_thread,
+    get_asset_ids_for_thread,
+    thread_asset_ids,
+    load_threads,
 )
-from app.services.history import add_message, get_history
+from app.services.retention import remove_thread
+from app.services.history import add_message, get_history, history_version
+from app.services.retrieval import retrieve_context
+from app.services import warmup
+from app.services.asset_summary import is_overview_question, overview_answer
+from app.core.token_quota import (
+    estimate_message_cost,
+    estimate_tokens,
+    reserve_tokens,
+    reserve_hedge,
+    settle_tokens,
+)
+from app.core.rate_limit import retry_after_header
+from app.core.admission import llm_admission, AdmissionRejected
+from app.core.profiler import profile_request
+from app.core.conditional import file_version, make_etag, etag_matches, not_modified, set_etag
+from starlette.concurrency import run_in_threadpool
+from slowapi.util import get_remote_address
 from app.core.chroma import ChromaDBClient
-import os, json
 
 # Send a message to the chat thread and get a response
 from app.core.rag_agent import is_question_relevant, stream_rag_response
-from app.constant import DIRECTORY, FileFormat
+from app.constant import DIRECTORY, FileFormat, CHAT_SETTINGS, LIMITER_SETTINGS, LLMLane
 
 # from app.core.rag_agent import RAGAgent
 import logging
@@ -27,44 +46,59 @@ router = APIRouter()
 chroma_client = ChromaDBClient()
 
 
-# Start a new chat thread for a given asset/document
+# Start a new chat thread for a given asset/document, or a set of them (asset_ids)
 @router.post("/chat/start", response_model=StartChatResponse)
 @limiter.limit("5/minute")
 async def start_chat(request: Request, req: StartChatRequest):
-    asset_id = req.asset_id
-    if not asset_id:
+    asset_ids = list(dict.fromkeys(req.asset_ids or ([req.asset_id] if req.asset_id else [])))
+    if not asset_ids or not all(asset_ids):
         raise HTTPException(status_code=400, detail="Missing or invalid asset ID")
-    if not validate_asset_id(asset_id):
-        logger.warning(f"Asset ID not found: {asset_id}")
-        raise HTTPException(status_code=404, detail="Asset ID not found in database")
-    thread_id = create_chat_thread(asset_id)
+    if len(asset_ids) > CHAT_SETTINGS.MAX_THREAD_ASSETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A thread can span at most {CHAT_SETTINGS.MAX_THREAD_ASSETS} assets",
+        )
+    for asset_id in asset_ids:
+        if not validate_asset_id(asset_id):
+            logger.warning("Asset ID not found: %s", asset_id)
+            raise HTTPException(status_code=404, detail="Asset ID not found in database")
+    thread_id = create_chat_thread(asset_ids=asset_ids)
     return {DIRECTORY.THREAD_ID.value: thread_id}
 
 
 @router.post("/chat/message")
 @limiter.limit("30/minute")
+@profile_request("chat")
 async def send_message(request: Request, req: SendMessageRequest):
     thread_id = req.thread_id
     message = req.message
     if not thread_id or not message:
         raise HTTPException(status_code=400, detail="Missing thread ID or message")
     try:
-        asset_id = get_asset_id_for_thread(thread_id)
-        if not asset_id:
-            logger.warning(f"Thread ID not found: {thread_id}")
+        asset_ids = get_asset_ids_for_thread(thread_id)
+        if not asset_ids:
+            logger.warning("Thread ID not found: %s", thread_id)
             raise HTTPException(status_code=404, detail="Thread ID not found")
     except Exception as e:
-        logger.error(f"Error fetching thread/asset ID: {e}")
+        logger.error("Error fetching thread/asset ID: %s", e)
         raise HTTPException(status_code=404, detail="Thread ID not found")
 
     update_last_used(thread_id)
     add_message(thread_id, message, sender="user")
-    retriever = chroma_client.get_retriever(asset_id)
 
-    # [1] Retrieve context
-    # [1] Retrieve context
-    docs = retriever.get_relevant_documents(message)
-    context = "\n\n".join([getattr(doc, "page_content", str(doc)) for doc in docs[:2]])
+    # [0] Whole-document questions are answered from the precomputed summaries (no retrieval, no LLM)
+    if is_overview_question(message):
+        overview = overview_answer(asset_ids)
+        if overview:
+            add_message(thread_id, overview, sender="agent")
+
+            async def response_stream():
+                yield overview
+
+            return StreamingResponse(response_stream(), media_type="application/json")
+
+    # [1] Retrieve context, fanned out across the thread's assets and merged by score
+    context = await retrieve_context(chroma_client, asset_ids, message)
 
     if not context.strip():
 
@@ -88,79 +122,143 @@ async def send_message(request: Request, req: SendMessageRequest):
 
         return StreamingResponse(response_stream(), media_type="application/json")
 
-    # [2] Check relevance
-    is_relevant = await is_question_relevant(context, message)
+    # [2] Reserve the estimated LLM tokens for this client before calling OpenAI
+    client_key = get_remote_address(request)
+    cost = estimate_message_cost(context, message)
+    reserved = cost["relevance"] + cost["answer"]
+    allowed, retry_after = await run_in_threadpool(reserve_tokens, client_key, reserved)
+    if not allowed:
+        logger.warning("Token quota exceeded for %s: needs %d tokens", client_key, reserved)
+        raise HTTPException(
+            status_code=429,
+            detail="Token quota exceeded",
+            headers={"Retry-After": retry_after_header(retry_after)},
+        )
+
+    # Hedged backup requests are charged to the same client on top of the reservation
+    charge_hedge = partial(reserve_hedge, client_key)
+
+    # [3] Check relevance; reject fast if the LLM lanes are saturated
+    try:
+        llm_admission.check(LLMLane.ANSWER)
+        is_relevant = await is_question_relevant(context, message, charge_hedge)
+    except AdmissionRejected as e:
+        await run_in_threadpool(settle_tokens, client_key, reserved, 0)
+        logger.warning("LLM admission rejected for thread_id=%s: %s", thread_id, e)
+        raise HTTPException(
+            status_code=429,
+            detail="Assistant is busy, please retry shortly",
+            headers={"Retry-After": e.retry_after_header},
+        )
+    except Exception:
+        await run_in_threadpool(settle_tokens, client_key, reserved, 0)
+        raise
 
     async def response_stream():
+        spent = cost["relevance"]
         try:
             if not is_relevant:
                 logger.info(
-                    f"[STREAM] Question unrelated. Sending fallback for thread_id={thread_id}"
+                    "[STREAM] Question unrelated. Sending fallback for thread_id=%s", thread_id
                 )
                 answer = "The question is not related to the document’s context."
                 yield answer
             else:
                 answer = ""
-                async for token in stream_rag_response(context, message):
+                spent += cost["answer"] - LIMITER_SETTINGS.COMPLETION_TOKEN_ESTIMATE
+                async for token in stream_rag_response(context, message, charge_hedge):
                     answer += token
                     yield token
+                spent += estimate_tokens(answer)
                 add_message(thread_id, answer, sender="agent")
-                logger.info(f"[STREAM] Streaming complete for thread_id={thread_id}")
+                logger.info("[STREAM] Streaming complete for thread_id=%s", thread_id)
+        except AdmissionRejected as ex:
+            spent = cost["relevance"]  # The answer call never reached OpenAI
+            logger.warning("[STREAM] Answer not admitted for thread_id=%s: %s", thread_id, ex)
+            yield f"Assistant is busy, please retry in {ex.retry_after_header} seconds."
         except Exception as ex:
-            logger.error(f"[STREAM] Streaming response error: {ex}")
+            logger.error("[STREAM] Streaming response error: %s", ex)
             yield "Agent error: problem generating answer."
         finally:
+            # Settle the reservation against what was actually sent and generated
+            await run_in_threadpool(settle_tokens, client_key, reserved, spent)
             logger.info(
-                f"[STREAM] Streaming response generator finished for thread_id={thread_id}"
+                "[STREAM] Streaming response generator finished for thread_id=%s", thread_id
             )
 
     return StreamingResponse(response_stream(), media_type="application/json")
 
 
 # Get chat history for a thread
+# Supports If-None-Match (304 from a stat of the history file) and a delta mode:
+# ?since=<cursor> returns {"messages": [...new...], "cursor": <next cursor>}
 @router.get("/chat/history")
-@limiter.limit("3/minute")
-async def chat_history(request: Request, thread_id: str):
+@limiter.limit("30/minute")
+async def chat_history(
+    request: Request, response: Response, thread_id: str, since: Optional[int] = None
+):
     if not thread_id:
         raise HTTPException(status_code=400, detail="Missing thread ID")
+    version = history_version(thread_id)
+    if version:
+        etag = make_etag(thread_id, version, since)
+        if etag_matches(request, etag):
+            # A poll that finds nothing new is still activity: keep the thread from being reaped
+            await run_in_threadpool(update_last_used, thread_id)
+            return not_modified(etag)
     try:
         history = get_history(thread_id)
         if not history:
-            logger.warning(f"History not found for thread: {thread_id}")
+            logger.warning("History not found for thread: %s", thread_id)
             raise HTTPException(status_code=404, detail="Thread ID not found")
         update_last_used(thread_id)
-        return history
     except Exception as e:
-        logger.error(f"Error loading history for thread {thread_id}: {e}")
+        logger.error("Error loading history for thread %s: %s", thread_id, e)
         raise HTTPException(status_code=404, detail="Thread ID not found")
+    # Histories are append-only, so a cursor is simply the number of messages already seen
+    if since is not None and not 0 <= since <= len(history):
+        raise HTTPException(status_code=400, detail="Invalid history cursor")
+    # Versioned before the read, so a concurrent append can only make the next poll a 200.
+    # Archived histories were rehydrated by the read and are versioned now.
+    set_etag(response, make_etag(thread_id, version or history_version(thread_id), since))
+    if since is None:
+        return history
+    return {FileFormat.MESSAGES.value: history[since:], FileFormat.CURSOR.value: len(history)}
 
 
 # List all chat threads, optionally filtered by asset_id
 @router.get("/chat/threads")
 @limiter.limit("60/minute")
-async def list_threads(request: Request, asset_id: str = None):
+async def list_threads(request: Request, response: Response, asset_id: str = None):
     """
     List all chat threads. If asset_id is provided, filter threads for that asset only.
-    Returns: List of {"thread_id": str, "asset_id": str, "created_at": str, "last_used": str}
+    Returns: List of {"thread_id": str, "asset_id": str, "asset_ids": [str], "created_at": str, "last_used": str}
+    Answers If-None-Match with 304 while the thread map file is unchanged.
     """
 
     _THREAD_DB = DIRECTORY.THREAD_ASSET_MAP.value
-    if not os.path.exists(_THREAD_DB):
+    version = file_version(_THREAD_DB)
+    if not version:
         return []
+    etag = make_etag(version, asset_id)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
     try:
-        with open(_THREAD_DB, "r") as f:
-            data = json.load(f)
+        data = await run_in_threadpool(load_threads)
     except Exception as e:
-        logger.error(f"Error reading thread-asset map: {e}")
+        logger.error("Error reading thread-asset map: %s", e)
         return []
     out = []
     for tid, raw in data.items():
-        if asset_id and raw["asset_id"] != asset_id:
+        asset_ids = thread_asset_ids(raw)
+        if asset_id and asset_id not in asset_ids:
             continue
         out.append(
             {
                 DIRECTORY.THREAD_ID.value: tid,
                 FileFormat.ASSET_ID.value: raw[FileFormat.ASSET_ID.value],
+                FileFormat.ASSET_IDS.value: asset_ids,
                 FileFormat.CREATED_AT.value: raw.get(FileFormat.CREATED_AT.value, ""),
                 FileFormat.LAST_USED.value: raw.get(FileFormat.LAST_USED.value, ""),
             }
@@ -168,3 +266,21 @@ async def list_threads(request: Request, asset_id: str = None):
     # Optionally sort by last_used newest first
     out.sort(key=lambda x: x[FileFormat.LAST_USED.value], reverse=True)
     return out
+
+
+# Delete a chat thread and its history
+@router.delete("/chat/threads/{thread_id}")
+@limiter.limit("30/minute")
+async def delete_thread_endpoint(request: Request, thread_id: str):
+    if not await run_in_threadpool(remove_thread, thread_id):
+        raise HTTPException(status_code=404, detail="Thread ID not found")
+    return {DIRECTORY.THREAD_ID.value: thread_id, FileFormat.STATUS.value: "deleted"}
+
+
+# Endpoint to show this API process's warm-up state: model load time, hot assets kept warm
+# (cold vs warm search latency per asset), assets warmed within the last two passes and
+# first-hit latency (warmed vs cold)
+@router.get("/chat/warmup")
+@limiter.limit("30/minute")
+async def warmup_status(request: Request):
+    return warmup.stats()
@@ -1,39 +1,133 @@
-# FastAPI endpoints for document processing, status, listing, and folder ingestion
+# FastAPI endpoints for document processing, status, progress, listing, and folder ingestion
 import os
-from typing import List
-from fastapi import APIRouter, HTTPException, Request
-from app.schemas.document import DocumentProcessRequest, DocumentProcessResponse
-from app.services.document_service import get_all_documents, list_chroma_files
-from app.document_tasks import process_document_task
-from celery.result import AsyncResult
+import json
+import asyncio
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from app.schemas.document import (
+    DocumentProcessRequest,
+    DocumentProcessResponse,
+    DocumentUploadResponse,
+    DocumentReindexRequest,
+    EmbeddingMigrationRequest,
+)
+from app.services.document_service import get_all_documents, list_chroma_files, list_asset_ids
+from app.document_tasks import process_document_task, reindex_asset_task, summarize_asset_task
+from app.services.asset_summary import load_summary
+from app.services.chat_manager import validate_asset_id
+from app.maintenance_tasks import compact_index_task, reembed_task
+from app.services import embedding_migration
+from app.core import embedding_versions
+from app.core.embedding_versions import MigrationPending
+from app.services.retention import remove_asset
+from app.core.progress import subscribe_progress
+from app.services.upload_service import spool_upload, FileTooLargeError
+from app.task_queue import dispatch_task, dispatch_ingestion, get_task_status, get_queue_stats
+from app.core.conditional import catalog_version, make_etag, etag_matches, not_modified, set_etag
 from app.limiter import limiter
-from app.constant import FileFormat, FileExtension, FileStatus
+from app.constant import FileFormat, FileExtension, FileStatus, PROGRESS_SETTINGS
 
 router = APIRouter()
 
 
-# Endpoint to process a single document (async via Celery)
+# Endpoint to process a single document (async via the task queue)
 @router.post("/documents/process", response_model=DocumentProcessResponse)
 @limiter.limit("20/minute")
 async def process_document_endpoint(request: Request, body: DocumentProcessRequest):
-    task = process_document_task.delay(body.file_path)
+    task_id = await run_in_threadpool(
+        dispatch_ingestion,
+        process_document_task,
+        body.file_path,
+        tenant_id=body.tenant_id,
+        profile=body.profile,
+    )
     # Return a response with task_id for async processing
-    return {FileFormat.TASK_ID.value: task.id, FileFormat.ASSET_ID.value: None}
+    return {FileFormat.TASK_ID.value: task_id, FileFormat.ASSET_ID.value: None}
+
+
+# Endpoint to upload a document by streaming the raw request body (async via the task queue)
+# The body is spooled to disk in fixed-size blocks while hashing, so no out-of-band copy is needed
+@router.post("/documents/upload", response_model=DocumentUploadResponse)
+@limiter.limit("20/minute")
+async def upload_document_endpoint(
+    request: Request, file_name: str, tenant_id: Optional[str] = None, profile: bool = False
+):
+    content_length = request.headers.get("content-length")
+    try:
+        file_path, content_hash, file_size = await spool_upload(
+            request.stream(),
+            file_name,
+            int(content_length) if content_length and content_length.isdigit() else None,
+        )
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=413, detail=f"{e}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"{e}")
+    task_id = await run_in_threadpool(
+        dispatch_ingestion,
+        process_document_task,
+        file_path,
+        content_hash,
+        tenant_id=tenant_id,
+        profile=profile,
+    )
+    return {
+        FileFormat.TASK_ID.value: task_id,
+        FileFormat.FILE_NAME.value: os.path.basename(file_path),
+        FileFormat.FILE_SIZE.value: file_size,
+        FileFormat.CONTENT_HASH.value: content_hash,
+        FileFormat.ASSET_ID.value: None,
+    }
 
 
-# Endpoint to check the status of a Celery document processing task
+# Endpoint to check the status of a document processing task (Celery or embedded)
 @router.get("/documents/status/{task_id}")
 @limiter.limit("10/minute")
 async def get_status(request: Request, task_id: str):
-    result = AsyncResult(task_id)
+    result = get_task_status(task_id)
     if not result:
         raise HTTPException(status_code=404, detail="Task not found")
-    if result.status == FileStatus.SUCCESS.value:
+    if result["state"] == FileStatus.SUCCESS.value:
         return {
-            FileFormat.STATUS.value: result.status,
-            FileFormat.ASSET_ID.value: result.result,
+            FileFormat.STATUS.value: result["state"],
+            FileFormat.ASSET_ID.value: result["result"],
         }
-    return {FileFormat.STATUS.value: result.status}
+    return {FileFormat.STATUS.value: result["state"]}
+
+
+# Endpoint to show each ingestion queue's backlog, per-tenant outstanding jobs and recent wait times
+@router.get("/documents/queues")
+@limiter.limit("30/minute")
+async def ingestion_queues(request: Request):
+    try:
+        return await run_in_threadpool(get_queue_stats)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"{e}")
+
+
+# Endpoint to stream ingestion progress events (Server-Sent Events) for a task
+# Replaces status polling: the worker pushes pages parsed, chunks embedded and chunks stored
+@router.get("/documents/progress/{task_id}")
+@limiter.limit("20/minute")
+async def stream_progress(request: Request, task_id: str):
+    async def event_stream():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + PROGRESS_SETTINGS.STREAM_TIMEOUT
+        async for event in subscribe_progress(task_id):
+            if await request.is_disconnected() or loop.time() > deadline:
+                break
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"event: progress\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 from app.schemas.document import (
@@ -44,13 +138,19 @@ from app.schemas.document import (
 
 
 # Endpoint to list all stored documents (from ChromaDB)
+# Answers If-None-Match with 304 while the asset catalog version is unchanged (no Chroma read)
 @router.get("/documents/list", response_model=List[StoredDocumentInfo])
 @limiter.limit("10/minute")
-async def list_documents_endpoint(request: Request):
+async def list_documents_endpoint(request: Request, response: Response):
+    etag = make_etag(catalog_version(), embedding_versions.active_version())
+    if etag_matches(request, etag):
+        return not_modified(etag)
     try:
-        return get_all_documents()
+        documents = get_all_documents()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"{e}")
+    set_etag(response, etag)
+    return documents
 
 
 # Endpoint to list raw ChromaDB files (for debugging/ops)
@@ -62,6 +162,114 @@ async def list_chroma_files_endpoint():
         raise HTTPException(status_code=500, detail=f"{e}")
 
 
+# Endpoint to delete a stored document (its chunks, threads and chat histories)
+@router.delete("/documents/{asset_id}")
+@limiter.limit("10/minute")
+async def delete_document_endpoint(request: Request, asset_id: str):
+    try:
+        deleted = await run_in_threadpool(remove_asset, asset_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"{e}")
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Asset ID not found in database")
+    return {FileFormat.ASSET_ID.value: asset_id, FileFormat.STATUS.value: "deleted"}
+
+
+# Endpoint to rebuild the vector index and reclaim space (async via the task queue)
+# The task result (records, bytes before/after/reclaimed) is available via /documents/status/{task_id}
+@router.post("/chroma/compact")
+@limiter.limit("1/minute")
+async def compact_chroma_endpoint(request: Request):
+    task_id = await run_in_threadpool(dispatch_task, compact_index_task)
+    return {FileFormat.TASK_ID.value: task_id}
+
+
+# Endpoint to re-chunk and re-embed stored assets after a chunking or model change (async via the task queue)
+# Text is read from the parse cache, so the original files are not parsed again
+@router.post("/documents/reindex")
+@limiter.limit("2/minute")
+async def reindex_documents_endpoint(request: Request, body: DocumentReindexRequest):
+    asset_ids = body.asset_ids
+    if asset_ids is None:
+        asset_ids = await run_in_threadpool(list_asset_ids)
+
+    def dispatch_all():
+        # One broker publish (or embedded-store insert) per asset: off the event loop
+        return [
+            {
+                FileFormat.ASSET_ID.value: asset_id,
+                FileFormat.TASK_ID.value: dispatch_task(reindex_asset_task, asset_id),
+            }
+            for asset_id in asset_ids
+        ]
+
+    return {FileFormat.TASKS.value: await run_in_threadpool(dispatch_all)}
+
+
+# Endpoint to get an asset's precomputed summary and key topics
+@router.get("/documents/{asset_id}/summary")
+@limiter.limit("30/minute")
+async def get_summary_endpoint(request: Request, asset_id: str):
+    summary = load_summary(asset_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="No summary for this asset")
+    return summary
+
+
+# Endpoint to (re)build an asset's summary (async via the task queue)
+@router.post("/documents/{asset_id}/summary")
+@limiter.limit("10/minute")
+async def build_summary_endpoint(request: Request, asset_id: str):
+    if not await run_in_threadpool(validate_asset_id, asset_id):
+        raise HTTPException(status_code=404, detail="Asset ID not found in database")
+    task_id = dispatch_task(summarize_asset_task, asset_id)
+    return {FileFormat.TASK_ID.value: task_id, FileFormat.ASSET_ID.value: asset_id}
+
+
+# Endpoint to start building a new embedding version alongside the active one (async via the task queue)
+# Ingestion dual-writes to both versions until cutover; retrieval keeps using the active version
+@router.post("/embeddings/migrate")
+@limiter.limit("2/minute")
+async def start_embedding_migration(request: Request, body: EmbeddingMigrationRequest):
+    try:
+        state = await run_in_threadpool(embedding_migration.start, body.version)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"{e}")
+    task_id = dispatch_task(reembed_task)
+    return {FileFormat.TASK_ID.value: task_id, **state}
+
+
+# Endpoint to show the active/target embedding versions and re-embedding progress
+@router.get("/embeddings/status")
+@limiter.limit("30/minute")
+async def embedding_status(request: Request):
+    return {
+        **embedding_versions.load_state(),
+        FileFormat.STATUS.value: embedding_versions.load_progress(),
+    }
+
+
+# Endpoint to atomically switch retrieval to the target embedding version
+# Refuses while assets are still pending unless force=true
+@router.post("/embeddings/cutover")
+@limiter.limit("2/minute")
+async def embedding_cutover(request: Request, force: bool = False):
+    try:
+        return await run_in_threadpool(embedding_migration.cutover, force)
+    except MigrationPending as e:
+        raise HTTPException(status_code=409, detail=f"{e}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"{e}")
+
+
+# Endpoint to abandon an embedding migration (the target version stops receiving writes
+# and what was re-embedded into it is dropped)
+@router.post("/embeddings/abort")
+@limiter.limit("2/minute")
+async def abort_embedding_migration(request: Request):
+    return await run_in_threadpool(embedding_migration.abort)
+
+
 # Supported file extensions for folder ingestion
 SUPPORTED_EXTENSIONS = {
     FileExtension.PDF.value,
@@ -70,7 +278,7 @@ SUPPORTED_EXTENSIONS = {
 }
 
 
-# Endpoint to process all supported files in a folder (async via Celery)
+# Endpoint to process all supported files in a folder (async via the task queue)
 @router.post("/documents/process_folder")
 @limiter.limit("10/minute")
 async def process_folder(request: Request, body: DocumentProcessRequest):
@@ -89,11 +297,17 @@ async def process_folder(request: Request, body: DocumentProcessRequest):
         raise HTTPException(
             status_code=400, detail="No supported files found in folder."
         )
-    # Queue Celery tasks for each file
+    # Queue a task for each file (a folder is a backfill: never interactive)
     tasks = []
     for file_path in all_files:
-        task = process_document_task.delay(file_path)
+        task_id = await run_in_threadpool(
+            dispatch_ingestion,
+            process_document_task,
+            file_path,
+            tenant_id=body.tenant_id,
+            interactive=False,
+        )
         tasks.append(
-            {FileFormat.FILE.value: file_path, FileFormat.TASK_ID.value: task.id}
+            {FileFormat.FILE.value: file_path, FileFormat.TASK_ID.value: task_id}
         )
     return {FileFormat.TASKS.value: tasks}
@@ -0,0 +1,39 @@
+# FastAPI endpoints to list and download sampled request/task profiles
+import hmac
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import FileResponse
+from app.constant import PROFILING_SETTINGS
+from app.core.profiler import list_profiles, profile_path
+from app.limiter import limiter
+
+
+def require_profile_token(request: Request):
+    """
+    Profiles expose code paths, timings and request labels: only callers presenting
+    PROFILE_TOKEN in the profiling header may read them. Without a token configured the
+    endpoints are closed.
+    """
+    token = PROFILING_SETTINGS.TOKEN
+    value = request.headers.get(PROFILING_SETTINGS.HEADER)
+    if not token or value is None or not hmac.compare_digest(value.encode(), token.encode()):
+        raise HTTPException(status_code=403, detail="Profiles require the profiling token")
+
+
+router = APIRouter(dependencies=[Depends(require_profile_token)])
+
+
+# Endpoint to list stored profiles, newest first
+@router.get("/profiles")
+@limiter.limit("30/minute")
+async def list_profiles_endpoint(request: Request):
+    return list_profiles()
+
+
+# Endpoint to download a profile as folded stacks (flamegraph.pl / speedscope)
+@router.get("/profiles/{profile_id}")
+@limiter.limit("30/minute")
+async def download_profile_endpoint(request: Request, profile_id: str):
+    path = profile_path(profile_id)
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=profile_id)
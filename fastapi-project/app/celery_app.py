@@ -1,10 +1,98 @@
 from celery import Celery
-from app.constant import CELERY_SETTINGS
+from celery.signals import (
+    setup_logging,
+    worker_process_init,
+    task_prerun,
+    task_postrun,
+    task_revoked,
+    task_failure,
+)
+from app.core.logging_config import configure_logging
+from app.core import ingest_scheduler
+from app.constant import (
+    CELERY_SETTINGS,
+    RETENTION_SETTINGS,
+    HISTORY_SETTINGS,
+    SCHEDULING_SETTINGS,
+    IngestClass,
+)
 
 celery_app = Celery(
     CELERY_SETTINGS.CELERY_PROCESSOR,
     broker=CELERY_SETTINGS.BROKER_URL,  # Change to your broker URL
     backend=CELERY_SETTINGS.RESULT_BACKEND,
 )
-celery_app.conf.task_routes = {"app.document_tasks.*": {"queue": "docs"}}
+# Register task modules with the worker
+celery_app.conf.include = ["app.document_tasks", "app.maintenance_tasks"]
+# Ingestion is routed per job by task_queue.dispatch_ingestion (interactive/standard/bulk);
+# these are the defaults for tasks queued without it
+_queues = SCHEDULING_SETTINGS.QUEUES
+celery_app.conf.task_routes = {
+    "app.document_tasks.process_document_task": {"queue": _queues[IngestClass.STANDARD.value]},
+    "app.document_tasks.reindex_asset_task": {"queue": _queues[IngestClass.BULK.value]},
+    "app.document_tasks.summarize_asset_task": {"queue": _queues[IngestClass.STANDARD.value]},
+    # Split ingestion subtasks follow their job's queue; this is only the fallback
+    "app.document_tasks.*": {"queue": _queues[IngestClass.BULK.value]},
+    "app.maintenance_tasks.*": {"queue": "maintenance"},
+}
+# Redis broker priorities 0 (first) .. PRIORITY_LEVELS-1 keep tenants fair within a queue
+celery_app.conf.broker_transport_options = {
+    "priority_steps": list(range(SCHEDULING_SETTINGS.PRIORITY_LEVELS)),
+    "sep": ":",
+    "queue_order_strategy": "priority",
+}
+# Take one task at a time, so a queued interactive job is never prefetched behind a running one
+celery_app.conf.worker_prefetch_multiplier = 1
 celery_app.conf.task_time_limit = CELERY_SETTINGS.CELERY_TASK_TIME_LIMIT
+# Raise SoftTimeLimitExceeded first so ingestion can checkpoint and retry instead of being killed
+celery_app.conf.task_soft_time_limit = CELERY_SETTINGS.CELERY_SOFT_TIME_LIMIT
+# Re-deliver tasks lost to a worker crash; ingestion is idempotent and resumes from its checkpoint
+celery_app.conf.task_acks_late = True
+# Periodic maintenance (run `celery -A app.celery_app.celery_app beat`)
+celery_app.conf.beat_schedule = {
+    "reap-idle-threads-and-assets": {
+        "task": "app.maintenance_tasks.reap_idle_task",
+        "schedule": RETENTION_SETTINGS.REAP_INTERVAL,
+    },
+    "compact-vector-index": {
+        "task": "app.maintenance_tasks.compact_index_task",
+        "schedule": RETENTION_SETTINGS.COMPACT_INTERVAL,
+    },
+    "archive-idle-chat-histories": {
+        "task": "app.maintenance_tasks.archive_histories_task",
+        "schedule": HISTORY_SETTINGS.ARCHIVE_INTERVAL,
+    },
+}
+
+
+# Use the app's queue-based logging instead of Celery's; each prefork child starts its own listener
+@setup_logging.connect
+def _setup_logging(**kwargs):
+    configure_logging()
+
+
+@worker_process_init.connect
+def _init_worker_logging(**kwargs):
+    configure_logging()
+
+
+# Queue wait time and tenant counters of scheduled ingestion jobs (see app.core.ingest_scheduler)
+@task_prerun.connect
+def _record_job_start(task_id=None, **kwargs):
+    ingest_scheduler.record_started(task_id)
+
+
+@task_postrun.connect
+def _record_job_end(task_id=None, state=None, **kwargs):
+    ingest_scheduler.record_finished(task_id, state)
+
+
+# Jobs revoked while queued, terminated, or failed outside a run get no (or no usable) postrun
+@task_revoked.connect
+def _record_job_revoked(request=None, **kwargs):
+    ingest_scheduler.record_discarded(request.id)
+
+
+@task_failure.connect
+def _record_job_failed(task_id=None, **kwargs):
+    ingest_scheduler.record_discarded(task_id)
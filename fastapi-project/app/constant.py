@@ -1,3 +1,4 @@
+import os
 from enum import Enum
 
 # --------------------
@@ -28,6 +29,28 @@ If yes, respond with 'relevant'. If not, respond with 'irrelevant'.
 """
 # System prompt for response agent
 response_system_prompt = "You are a precise assistant. Use the document context to answer. If not answerable, reply: 'I can’t find an answer relevant to the provided document.' {custom_prompt}"
+# Prompts for precomputed asset summaries (map over chunks, reduce summaries, extract topics)
+summary_map_prompt = """
+Summarize the following section of the document "{file_name}" in at most {max_words} words.
+Keep concrete facts, names, numbers and conclusions; do not add anything that is not in the text.
+
+TEXT:
+{text}
+"""
+summary_reduce_prompt = """
+The following are summaries of consecutive parts of the document "{file_name}".
+Combine them into one coherent summary of at most {max_words} words, in document order.
+
+TEXT:
+{text}
+"""
+summary_topics_prompt = """
+List the key topics covered by the document "{file_name}", one per line, at most {max_topics} lines,
+each a short phrase. Use only the summary below.
+
+TEXT:
+{text}
+"""
 
 # --------------------
 # Enum classes for file types, formats, and status
@@ -60,12 +83,116 @@ class FileFormat(str, Enum):
     STATUS = "status"
     FILE = "file"
     TASKS = "tasks"
+    STAGE = "stage"
+    PAGES_PARSED = "pages_parsed"
+    PAGES_TOTAL = "pages_total"
+    CHUNKS_EMBEDDED = "chunks_embedded"
+    CHUNKS_STORED = "chunks_stored"
+    ERROR = "error"
+    CONTENT_HASH = "content_hash"
+    COMMITTED_CHUNKS = "committed_chunks"
+    INGESTED_AT = "ingested_at"
+    THREADS = "threads"
+    ASSETS = "assets"
+    RECORDS = "records"
+    VACUUMED = "vacuumed"
+    BYTES_BEFORE = "bytes_before"
+    BYTES_AFTER = "bytes_after"
+    BYTES_RECLAIMED = "bytes_reclaimed"
+    UNITS = "units"
+    EMBEDDING_VERSION = "embedding_version"
+    ACTIVE = "active"
+    TARGET = "target"
+    PREVIOUS = "previous"
+    MODEL = "model"
+    ASSETS_TOTAL = "assets_total"
+    ASSETS_DONE = "assets_done"
+    CHUNKS_REEMBEDDED = "chunks_reembedded"
+    PENDING_ASSETS = "pending_assets"
+    PARSER_VERSION = "parser_version"
+    FILE_PATH = "file_path"
+    UPDATED_AT = "updated_at"
+    TENANT_ID = "tenant_id"
+    ASSET_IDS = "asset_ids"
+    DISTANCES = "distances"
+    COLLECTION = "collection"
+    MESSAGES = "messages"
+    SUMMARY = "summary"
+    TOPICS = "topics"
+    CURSOR = "cursor"
+    QUEUE = "queue"
+    INGEST_CLASS = "ingest_class"
+    QUEUED = "queued"
+    RUNNING = "running"
+    WAIT_SECONDS = "wait_seconds"
+    WORKERS = "workers"
+    OUTSTANDING = "outstanding"
+    STARTED_AT = "started_at"
+    VERSIONS = "versions"
+    PROFILE = "profile"
+    METADATA = "metadata"
+    COLLECTIONS = "collections"
+    RECALL = "recall"
+    MEAN_MS = "mean_ms"
+    P95_MS = "p95_ms"
+    QUERIES = "queries"
+    TUNED_AT = "tuned_at"
+    WARMED_AT = "warmed_at"
+    COLD_MS = "cold_ms"
+    WARM_MS = "warm_ms"
+    MODEL_MS = "model_ms"
+    PASSES = "passes"
+    LAST_PASS_AT = "last_pass_at"
+    LAST_PASS_MS = "last_pass_ms"
+    RECENTLY_WARMED = "recently_warmed"
+    HOT = "hot"
+    FIRST_HIT_MS = "first_hit_ms"
+    WARMED = "warmed"
+    COLD = "cold"
+
+class ShardStrategy(str, Enum):
+    SINGLE = "single"  # Everything in one collection (legacy layout)
+    TENANT = "tenant"  # One collection per tenant
+    ASSET_HASH = "asset_hash"  # Fixed number of collections, assets spread by hash
+    ASSET = "asset"  # One collection per asset
+
+class HnswParam(str, Enum):
+    # Per-collection vector index parameters (see app.core.hnsw_params)
+    SPACE = "space"  # Distance: l2, cosine or ip; fixed when a collection is created
+    M = "M"  # Graph links per node; fixed when the index is built
+    CONSTRUCTION_EF = "construction_ef"  # Build-time candidate list; fixed when the index is built
+    SEARCH_EF = "search_ef"  # Query-time candidate list; fixed when the index is built (Chroma 0.4)
+    K = "k"  # Chunks retrieved per asset search
+
+    @property
+    def metadata_key(self) -> str:
+        # Chroma collection metadata key (k is not an index parameter)
+        return f"hnsw:{self.value}"
+
+class IngestClass(str, Enum):
+    # Ingestion job classes, highest priority first; each has its own Celery queue
+    INTERACTIVE = "interactive"  # Small single-file uploads someone is waiting on
+    STANDARD = "standard"  # Everything between interactive and bulk, and summaries
+    BULK = "bulk"  # Large files, re-indexing and (in embedded mode) maintenance
+
+class ExecutionMode(str, Enum):
+    CELERY = "celery"  # Redis broker + Celery workers (multi-node)
+    EMBEDDED = "embedded"  # Local process pool + SQLite task table (single node, no Redis)
+
+# OpenAI models (defined before the settings that pick defaults from it)
+class OpenEnum(str, Enum):
+    GPT_3_5_TURBO = "gpt-3.5-turbo"
+    GPT_4 = "gpt-4"
+    GPT_4_32K = "gpt-4-32k"
+    GPT_4_TURBO = "gpt-4-turbo"
+    GPT_4_TURBO_32K = "gpt-4-turbo-32k"
 
 # --------------------
 # Settings for file processing and Celery
 # --------------------
 class FILE_SETTINGS:
     MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
+    UPLOAD_CHUNK_SIZE = 1024 * 1024  # Bytes buffered per write while spooling uploads
     SUPPORTED_FORMATS = {FileType.PDF, FileType.TXT, FileType.DOCX}  # Supported file types
     CHUNK_SIZE_WORDS = 2000  # Number of words per chunk; adjust for your model
     MODEL_NAME = (
@@ -76,11 +203,245 @@ class FILE_SETTINGS:
     CUDA = "cuda"  # Use "cuda" for GPU, "cpu" for CPU
     CPU = "cpu"  # Use "cuda" for GPU, "cpu" for CPU
 
+class EMBEDDING_SETTINGS:
+    LEGACY_VERSION = "v1"  # Vectors stored before versioning; keeps the original collection names
+    # Embedding model per version; add a version here, then migrate and cut over to it
+    MODELS = {
+        "v1": FILE_SETTINGS.MODEL_NAME,
+        "v2": "paraphrase-MiniLM-L3-v2",  # Smaller CPU-friendly model
+    }
+    # Versions whose vectors are L2-normalized at encode time; fixed for a version once it holds vectors
+    NORMALIZED_VERSIONS = set()
+    ENCODE_BATCH_SIZE = 32  # Texts per model forward pass
+    STATE_FILE = "embedding_versions.json"  # Active/target version pointer (swapped atomically)
+    PROGRESS_FILE = "embedding_migration.json"  # Progress of the running re-embedding job
+    REEMBED_BATCH_SIZE = 64  # Chunks re-embedded per model call
+    REEMBED_CHUNKS_PER_SECOND = 50  # Rate limit so re-embedding never starves live ingestion
+    REEMBED_TIME_BUDGET = 60 * 8  # Seconds per Celery run before the job re-queues itself
+
 class CELERY_SETTINGS:
     BROKER_URL = "redis://localhost:6379/0"  # Celery broker URL
     RESULT_BACKEND = "redis://localhost:6379/1"  # Celery result backend
     CELERY_TASK_TIME_LIMIT = 60 * 10  # 10 minutes
+    CELERY_SOFT_TIME_LIMIT = CELERY_TASK_TIME_LIMIT - 30  # Leave time to checkpoint before the hard kill
     CELERY_PROCESSOR = "doc_processor"
+    CHECKPOINT_BATCH_SIZE = 32  # Chunks committed to ChromaDB per checkpoint
+    RETRY_BACKOFF_BASE = 10  # Seconds; transient errors back off exponentially from here
+    RETRY_BACKOFF_MAX = 60 * 10  # Upper bound on a single retry countdown
+    RETRY_TIME_LIMIT_COUNTDOWN = 1  # Resume quickly after hitting the soft time limit
+    MAX_TOTAL_RETRIES = 10  # Hard cap, including the free retries after a time limit with progress
+    CHECKPOINT_REDIS_URL = "redis://localhost:6379/4"  # Ingestion checkpoints, shared by all worker hosts
+    CHECKPOINT_PREFIX = "ingest-checkpoint:"
+    CHECKPOINT_TTL = 60 * 60 * 24 * 7  # Drop checkpoints of ingestions never seen finishing
+
+class SPLIT_SETTINGS:
+    # Celery mode: files at least this large (or long) are parsed and embedded by parallel
+    # subtasks and committed in order by a final step (see app.document_tasks)
+    ENABLED = os.getenv("SPLIT_INGESTION", "true").lower() == "true"
+    MIN_BYTES = 20 * 1024 * 1024
+    MIN_PAGES = 150
+    PAGES_PER_PART = 40  # PDF pages per parse subtask
+    BYTES_PER_PART = 4 * 1024 * 1024  # Text bytes per parse subtask (DOCX is parsed whole)
+    CHUNKS_PER_PART = 64  # Chunks per embed subtask
+    MAX_PARTS = 32  # Subtasks per phase; ranges grow beyond this
+    # The spool directory must be shared by all workers, like uploads/
+
+class PARSE_CACHE_SETTINGS:
+    PARSER_VERSION = 1  # Bump when extraction changes so stale cached text is not reused
+    COMPRESSION_LEVEL = 6  # zlib level for cached units
+    HASH_BLOCK_SIZE = 1024 * 1024  # Bytes read per step when hashing a file
+
+class EXECUTION_SETTINGS:
+    MODE = os.getenv("EXECUTION_MODE", ExecutionMode.CELERY.value)
+    WORKERS = int(os.getenv("EMBEDDED_WORKERS", "2"))  # Process pool size in embedded mode
+    TASKS_DB = "embedded_tasks.db"  # SQLite task table (state, result, progress) in embedded mode
+    MAX_RETRIES = 3  # Same retry budget as the Celery task
+    PROGRESS_POLL_INTERVAL = 0.5  # Seconds between progress polls of the task table
+    SCHEDULER_TICK = 30  # Seconds between checks of the periodic maintenance schedule
+
+class SCHEDULING_SETTINGS:
+    # Ingestion jobs are classified at enqueue time (see app.core.ingest_scheduler)
+    QUEUES = {
+        IngestClass.INTERACTIVE.value: "docs.interactive",
+        IngestClass.STANDARD.value: "docs.standard",
+        IngestClass.BULK.value: "docs.bulk",
+    }
+    INTERACTIVE_MAX_BYTES = 5 * 1024 * 1024  # Larger files are never interactive
+    INTERACTIVE_MAX_PAGES = 20
+    BULK_MIN_BYTES = 50 * 1024 * 1024  # Files at least this large (or this long) are bulk
+    BULK_MIN_PAGES = 200
+    # Pages estimated from size when a file type has no cheap page count (PDF uses its page tree)
+    BYTES_PER_PAGE = {FileType.PDF.value: 100 * 1024, FileType.TXT.value: 3 * 1024, FileType.DOCX.value: 15 * 1024}
+    # Share of ingestion workers per class: dedicated Celery workers (app.scripts.run_ingest_workers);
+    # in embedded mode interactive keeps its share free and bulk may use at most its share
+    WORKER_SHARES = {
+        IngestClass.INTERACTIVE.value: float(os.getenv("INTERACTIVE_WORKER_SHARE", "0.25")),
+        IngestClass.STANDARD.value: float(os.getenv("STANDARD_WORKER_SHARE", "0.5")),
+        IngestClass.BULK.value: float(os.getenv("BULK_WORKER_SHARE", "0.25")),
+    }
+    # Tenant fairness: a tenant's n-th outstanding job in a queue gets broker priority n (0 runs first)
+    PRIORITY_LEVELS = 10
+    TENANT_INTERACTIVE_LIMIT = 3  # Outstanding interactive jobs per tenant before new ones go to standard
+    REDIS_URL = "redis://localhost:6379/3"  # Job records, tenant counters and wait samples (Celery mode)
+    KEY_PREFIX = "ingest-sched:"
+    JOB_TTL = 60 * 60 * 24 * 2  # Drop job records and tenant counters of jobs never seen finishing
+    WAIT_SAMPLES = 1000  # Recent queue wait times kept per queue for the percentiles
+
+class CHAT_SETTINGS:
+    RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "4"))  # Chunks retrieved per asset before merging (default k)
+    CONTEXT_BUDGET_WORDS = 4000  # Words of merged context passed to the LLM (~2 chunks)
+    ASSET_RETRIEVAL_TIMEOUT = 5.0  # Seconds; a slower asset is left out of the answer
+    RETRIEVAL_WORKERS = 8  # Threads for asset searches, apart from the request threadpool
+    MAX_THREAD_ASSETS = 10  # Assets a single thread may span
+
+class LIMITER_SETTINGS:
+    # Shared by every worker/pod: sqlite:///<path> on a single node, redis://host:port/db across nodes
+    STORAGE_URI = os.getenv("RATE_LIMIT_STORAGE_URI", "sqlite:///rate_limits.db")
+    TOKEN_BUCKET_CAPACITY = 40000  # LLM tokens a client may burst
+    TOKEN_REFILL_PER_SECOND = 40000 / 60  # Sustained LLM tokens per second per client (40k/min)
+    COMPLETION_TOKEN_ESTIMATE = 512  # Reserved per answer; settled against the real answer length
+    TOKEN_ENCODING = "cl100k_base"  # tiktoken encoding used by the GPT-4 family
+    PRUNE_INTERVAL = 60  # Seconds between deletions of ended windows and full buckets (SQLite)
+
+class LLM_SETTINGS:
+    CONNECT_TIMEOUT = 5.0  # Seconds to open a connection to the OpenAI API
+    READ_TIMEOUT = 30.0  # Seconds between bytes before a stalled stream is abandoned
+    WRITE_TIMEOUT = 10.0
+    POOL_TIMEOUT = 5.0  # Seconds to wait for a free pooled connection
+    MAX_CONNECTIONS = 64  # Shared keep-alive pool for every LLM client in the process
+    MAX_KEEPALIVE_CONNECTIONS = 32
+    KEEPALIVE_EXPIRY = 90.0  # Seconds an idle pooled connection is kept open
+    MAX_RETRIES = 1  # SDK retries; hedging covers slow (not failed) requests
+    HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true"
+    HEDGE_PERCENTILE = 0.9  # Fire the backup request when the first token is later than this percentile
+    HEDGE_INITIAL_DELAY = 3.0  # Seconds; hedge deadline until enough samples are collected
+    HEDGE_MIN_DELAY = 0.5  # Bounds on the adaptive hedge deadline
+    HEDGE_MAX_DELAY = 10.0
+    HEDGE_MIN_SAMPLES = 20  # Latency samples needed before the percentile is trusted
+    LATENCY_WINDOW = 500  # Recent time-to-first-token samples kept per call type
+    FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL", OpenEnum.GPT_4_TURBO.value)  # Model used by hedges
+    PROVIDER = os.getenv("LLM_PROVIDER", "openai")  # "openai", or "stub" for the offline model (app.core.stub_llm)
+    STUB_MAX_WORDS = 120  # Words the stub answers with
+    STUB_LIST_ITEMS = 8  # Bullets the stub returns for list prompts
+    STUB_TOKEN_DELAY = 0.0  # Seconds between streamed stub tokens
+
+class SUMMARY_SETTINGS:
+    # Optional ingestion stage: map-reduce summary + key topics per asset, used for overview questions
+    ENABLED = os.getenv("ASSET_SUMMARIES", "false").lower() == "true"
+    MODEL = os.getenv("SUMMARY_MODEL", OpenEnum.GPT_4_TURBO.value)
+    MAP_CONCURRENCY = 4  # Section summaries requested in parallel
+    MAP_CHUNKS_PER_CALL = 4  # Consecutive chunks summarized together by one map call
+    MAP_MAX_CHUNKS_PER_CALL = 24  # Largest section, kept well inside the model's context window
+    MAP_MAX_CALLS = 32  # Map calls per asset; longer documents get larger, then sampled sections
+    REDUCE_FANIN = 8  # Summaries merged per reduce call (levels repeat until one is left)
+    MAX_TOPICS = 10  # Key topics kept in the outline
+    MAP_MAX_WORDS = 150  # Length of each section summary
+    SUMMARY_MAX_WORDS = 300  # Length of the final summary
+    COMPLETION_TOKEN_ESTIMATE = 512  # Reserved per call; settled against the real output length
+    QUOTA_KEY_PREFIX = "summary:"  # Token quota bucket per tenant (see app.core.token_quota)
+    MAX_QUOTA_WAIT = 60  # Seconds a call may wait for its tenant's quota before the task is retried
+    MAX_RETRIES = 3
+    # Whole-message patterns of a document-level question ("summarize this document", ...).
+    # Anything more specific ("summarize section 3", "what does the summary say about X")
+    # is answered through retrieval. {subject} stands for OVERVIEW_SUBJECT.
+    OVERVIEW_SUBJECT = r"(?:it|this|them|(?:this|the|these|those|my|uploaded) (?:document|doc|file|pdf|paper|report|text)s?)"
+    OVERVIEW_PATTERNS = (
+        r"(?:can you |could you )?(?:summari[sz]e|give me (?:a |an )?(?:summary|overview|tl;?dr))(?: (?:of |for )?{subject})?",
+        r"(?:a |an )?(?:short |brief )?(?:summary|overview|tl;?dr)(?: (?:of |for )?{subject})?",
+        r"(?:what are |list )?(?:the )?(?:key|main) (?:points|topics|takeaways)(?: (?:of |in )?{subject})?",
+        r"what(?:'s| is| are) {subject} about",
+    )
+
+class ADMISSION_SETTINGS:
+    # Per API worker: caps concurrent OpenAI calls so bursts queue briefly instead of all slowing down
+    MAX_CONCURRENT = 8  # LLM calls in flight at once
+    QUEUE_LIMITS = {"answer": 16, "relevance": 32, "summary": 64}  # Waiters per lane before rejecting with 429
+    LANE_PRIORITY = {"answer": 0, "relevance": 1, "summary": 2}  # Lower runs first: finish admitted users' answers
+    MAX_QUEUE_WAIT = 20  # Seconds a call may wait for a slot before giving up
+    INITIAL_SERVICE_TIME = {"answer": 8.0, "relevance": 1.5, "summary": 10.0}  # Seconds; seeds the Retry-After estimate
+
+class SHARD_SETTINGS:
+    # Routing for new writes; existing assets keep the collection recorded in the route catalog
+    STRATEGY = os.getenv("CHROMA_SHARD_STRATEGY", ShardStrategy.SINGLE.value)
+    HASH_BUCKETS = 16  # Number of collections for the asset_hash strategy
+    DEFAULT_TENANT = "default"  # Tenant used when a request does not name one
+    ROUTES_DB = "asset_routes.db"  # SQLite catalog of asset_id -> collection
+    MIGRATE_BATCH_SIZE = 500  # Records moved per batch by the shard migration tool
+
+class HNSW_SETTINGS:
+    # Index parameters of new collections (Chroma's defaults unless overridden);
+    # PARAMS_FILE overrides them per collection, or per version base name for all its shards
+    SPACE = os.getenv("HNSW_SPACE", "l2")  # Keep one space per deployment: merged results compare distances
+    M = int(os.getenv("HNSW_M", "16"))
+    CONSTRUCTION_EF = int(os.getenv("HNSW_CONSTRUCTION_EF", "100"))
+    SEARCH_EF = int(os.getenv("HNSW_SEARCH_EF", "10"))
+    PARAMS_FILE = "hnsw_params.json"  # Written by app.scripts.tune_hnsw
+    RELOAD_INTERVAL = 30  # Seconds between checks of PARAMS_FILE for changes
+    # Offline tuning (python -m app.scripts.tune_hnsw)
+    TARGET_RECALL = 0.95  # recall@k against exact search
+    SAMPLE_QUESTIONS = 200  # User questions sampled from chat histories
+    MIN_QUERIES = 20  # Collections with fewer sampled queries are left as they are
+    GRID_M = (8, 16, 32)
+    GRID_CONSTRUCTION_EF = (64, 100, 200)
+    GRID_SEARCH_EF = (10, 20, 40, 80, 160, 320)
+
+class WARMUP_SETTINGS:
+    # Keeps the model and the most recently active assets warm in each API process
+    ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+    ASSETS = int(os.getenv("WARMUP_ASSETS", "20"))  # Most recently active assets warmed per pass
+    INTERVAL = 60 * 5  # Seconds between passes (the first runs at startup)
+    MAX_IDLE = 60 * 60 * 24 * 7  # Assets with no thread activity for this long are not warmed
+    MAX_CHUNKS = 2000  # Chunk rows (metadata + text) read per asset
+    PASS_BUDGET = 120  # Seconds per pass; assets left over wait for the next pass
+    FIRST_HIT_IDLE = 60 * 15  # A search is a first hit when the asset was not searched for this long
+    SAMPLES = 1000  # Recent first-hit latencies kept (warmed and cold separately)
+    PROBE_TEXT = "warm-up"  # Query embedded and searched to warm the model and each asset
+
+class RETENTION_SETTINGS:
+    THREAD_TTL = 60 * 60 * 24 * 30  # Evict threads idle for 30 days
+    ASSET_TTL = 60 * 60 * 24 * 90  # Evict assets with no thread activity for 90 days
+    REAP_INTERVAL = 60 * 60  # Run the idle reaper hourly (Celery beat)
+    COMPACT_INTERVAL = 60 * 60 * 24  # Rebuild the vector index daily (Celery beat)
+    COMPACT_BATCH_SIZE = 500  # Records copied per batch while rebuilding a collection
+    COMPACT_SUFFIX = "__compact"  # Temporary collection name suffix during a rebuild
+    REPLACED_SUFFIX = "__replaced"  # Original collection, until its rebuilt copy is swapped in
+    LOCK_DIR = "locks"  # Collection and client lock files, inside the Chroma persist directory
+
+class HISTORY_SETTINGS:
+    ARCHIVE_AFTER = 60 * 60 * 24 * 7  # Archive histories untouched for 7 days
+    ARCHIVE_INTERVAL = 60 * 60 * 6  # Run the archiver every 6 hours (Celery beat)
+    SHARD_PREFIX_LEN = 2  # Hex chars of sha1(thread_id) per shard -> 256 shards
+    COMPRESSION_LEVEL = 9  # zstd level for archived history blocks (19 saves ~3% at 10x the time)
+    BLOCK_BYTES = 256 * 1024  # Raw history bytes compressed together as one block
+    MIN_LIVE_RATIO = 0.5  # Repack a segment when less than this fraction of it is live
+
+class PROGRESS_SETTINGS:
+    REDIS_URL = "redis://localhost:6379/2"  # Pub/sub + latest-state store for ingestion progress
+    CHANNEL_PREFIX = "ingest-progress:"  # Pub/sub channel per task_id
+    STATE_PREFIX = "ingest-progress-state:"  # Latest event per task_id for late subscribers
+    STATE_TTL = 60 * 60 * 24  # Keep the latest event for a day
+    MIN_INTERVAL = 0.5  # Seconds between non-terminal events from one task
+    KEEPALIVE = 15  # Seconds between SSE keep-alive comments
+    STREAM_TIMEOUT = 60 * 60  # Close a progress stream after an hour
+
+class LOGGING_SETTINGS:
+    LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    FORMAT = os.getenv("LOG_FORMAT", "json")  # "json" (one object per line) or "text"
+    FILE_NAME = "app.log"  # Written under DIRECTORY.LOGS by the listener thread
+    QUEUE_SIZE = 10000  # Records buffered for the listener; beyond this they are dropped, not awaited
+    RATE_LIMIT_BURST = 20  # Records per (logger, level, message template) per window; ERROR+ not limited
+    RATE_LIMIT_WINDOW = 10.0  # Seconds
+    ROUTED_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")  # Re-routed through the queue
+
+class PROFILING_SETTINGS:
+    HEADER = "X-Profile"  # Request header that opts a chat request in; echoed with the profile id
+    TOKEN = os.getenv("PROFILE_TOKEN")  # When set, the header value must equal it
+    REQUEST_SAMPLE_RATE = float(os.getenv("PROFILE_REQUEST_SAMPLE_RATE", "0"))  # Fraction of requests profiled
+    TASK_SAMPLE_RATE = float(os.getenv("PROFILE_TASK_SAMPLE_RATE", "0"))  # Fraction of ingestion tasks profiled
+    INTERVAL = 0.005  # Seconds between stack samples
+    MAX_DEPTH = 128  # Frames kept per sampled stack
+    MAX_DURATION = 60 * 15  # Stop sampling a profile after this many seconds
+    MAX_FILES = 200  # Newest profiles kept on disk
 
 # --------------------
 # Directory and file location enums
@@ -93,22 +454,41 @@ class DIRECTORY(str, Enum):
     ASSETS = "assets"
     LOGS = "logs"
     CHAT_HISTORIES = "chat_histories"
+    CHECKPOINTS = "ingest_checkpoints"
+    PARSE_CACHE = "parse_cache"  # Extracted text units per content hash
+    ASSET_SUMMARIES = "asset_summaries"  # Precomputed summary + key topics per asset
+    PROFILES = "profiles"  # Sampled request/task profiles (folded stacks)
+    SPLIT_SPOOL = "split_spool"  # Parsed units and vectors of split ingestion parts, per asset
+    HISTORY_ARCHIVE = "archive"  # Sub-directory of chat_histories for cold segments
     CHROMA_DIR = "./chroma_migrated"
     THREAD_ASSET_MAP = "thread_asset_map.json"
+    ASSET_CATALOG_VERSION = "asset_catalog.version"  # Token rewritten on every vector store/delete
     THREAD_ID = "thread_id"
 
 # --------------------
 # Model and chat enums
 # --------------------
-class OpenEnum(str, Enum):
-    GPT_3_5_TURBO = "gpt-3.5-turbo"
-    GPT_4 = "gpt-4"
-    GPT_4_32K = "gpt-4-32k"
-    GPT_4_TURBO = "gpt-4-turbo"
-    GPT_4_TURBO_32K = "gpt-4-turbo-32k"
-
 class ChatEnum(str, Enum):
     RELEVANT = "relevant"
 
 class FileStatus(str, Enum):
+    # Celery task states, shared by the embedded executor
+    PENDING = "PENDING"
+    STARTED = "STARTED"
+    RETRY = "RETRY"
     SUCCESS = "SUCCESS"
+    FAILURE = "FAILURE"
+
+class LLMLane(str, Enum):
+    RELEVANCE = "relevance"
+    ANSWER = "answer"
+    SUMMARY = "summary"  # Asset summaries, called from worker threads (see admitted_call)
+
+class ProgressStage(str, Enum):
+    STARTED = "started"
+    PARSING = "parsing"
+    EMBEDDING = "embedding"
+    STORING = "storing"
+    RETRY = "retry"
+    SUCCESS = "success"
+    FAILURE = "failure"
@@ -0,0 +1,166 @@
+"""
+Admission control for OpenAI calls.
+
+A fixed number of slots is shared by all lanes. When every slot is busy, callers wait in
+a bounded per-lane queue and freed slots go to the highest-priority lane first. A call
+that finds its lane's queue full is rejected immediately with a Retry-After estimate
+derived from the queue depth and the observed time a call holds a slot.
+"""
+import math
+import time
+import heapq
+import asyncio
+import functools
+import itertools
+import logging
+import threading
+from contextlib import asynccontextmanager
+from app.constant import ADMISSION_SETTINGS, LLMLane
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, lane: str, retry_after: float):
+        super().__init__(f"LLM {lane} lane is saturated; retry after {retry_after:.0f}s")
+        self.lane = lane
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+# AdmissionController is per event loop (one per API worker process).
+class AdmissionController:
+    def __init__(
+        self,
+        max_concurrent=ADMISSION_SETTINGS.MAX_CONCURRENT,
+        queue_limits=ADMISSION_SETTINGS.QUEUE_LIMITS,
+        priorities=ADMISSION_SETTINGS.LANE_PRIORITY,
+        max_wait=ADMISSION_SETTINGS.MAX_QUEUE_WAIT,
+        service_time=ADMISSION_SETTINGS.INITIAL_SERVICE_TIME,
+    ):
+        self.max_concurrent = max_concurrent
+        self.queue_limits = dict(queue_limits)
+        self.priorities = dict(priorities)
+        self.max_wait = max_wait
+        self._service_time = dict(service_time)  # EWMA of seconds a slot is held, per lane
+        self._active = 0
+        self._waiters = []  # heap of (priority, seq, future)
+        self._queued = {lane: 0 for lane in self.queue_limits}
+        self._seq = itertools.count()
+
+    def retry_after(self, lane: str) -> float:
+        """
+        Estimate when a new `lane` call would get a slot: the waiters ahead of it
+        drain max_concurrent at a time, each taking about one service time.
+        """
+        ahead = sum(
+            n for other, n in self._queued.items() if self.priorities[other] <= self.priorities[lane]
+        )
+        rounds = ahead // self.max_concurrent + 1
+        return rounds * self._service_time[lane]
+
+    def check(self, lane: str):
+        """
+        Raise AdmissionRejected if a `lane` call arriving now would be turned away.
+        Lets endpoints reject before they start streaming a response.
+        """
+        if self._active >= self.max_concurrent and self._queued[lane] >= self.queue_limits[lane]:
+            raise AdmissionRejected(lane, self.retry_after(lane))
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active,
+            "max_concurrent": self.max_concurrent,
+            "queued": dict(self._queued),
+            "service_time": {lane: round(t, 3) for lane, t in self._service_time.items()},
+        }
+
+    async def _acquire(self, lane: str):
+        if self._active < self.max_concurrent and not self._waiters:
+            self._active += 1
+            return
+        self.check(lane)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (self.priorities[lane], next(self._seq), future))
+        self._queued[lane] += 1
+        try:
+            await asyncio.wait_for(future, timeout=self.max_wait)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # The slot was handed over as we gave up; pass it on
+                self._release()
+            else:
+                future.cancel()
+            if isinstance(e, asyncio.TimeoutError):
+                raise AdmissionRejected(lane, self.retry_after(lane)) from e
+            raise
+        finally:
+            self._queued[lane] -= 1
+
+    def try_acquire(self) -> bool:
+        """
+        Take a slot only if one is free right now and nobody is waiting (for a hedge's
+        backup request, which must never queue or jump the queue). Pair with release().
+        """
+        if self._active < self.max_concurrent and not self._waiters:
+            self._active += 1
+            return True
+        return False
+
+    def release(self):
+        self._release()
+
+    def _release(self):
+        # Hand the slot straight to the next live waiter, or free it
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self, lane: LLMLane):
+        lane = LLMLane(lane).value
+        await self._acquire(lane)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            held = time.monotonic() - started
+            self._service_time[lane] = 0.8 * self._service_time[lane] + 0.2 * held
+            self._release()
+
+
+llm_admission = AdmissionController()
+
+
+# Synchronous callers (Celery and embedded pool worker threads) share one event loop per
+# process, since the controller is not thread-safe and lives on a single loop
+_sync_loop = None
+_sync_loop_lock = threading.Lock()
+
+
+def _loop_for_sync_callers():
+    global _sync_loop
+    with _sync_loop_lock:
+        if _sync_loop is None:
+            _sync_loop = asyncio.new_event_loop()
+            threading.Thread(target=_sync_loop.run_forever, name="llm-admission", daemon=True).start()
+    return _sync_loop
+
+
+def admitted_call(lane: LLMLane, fn, *args, **kwargs):
+    """
+    Run a blocking LLM call from synchronous worker code under a slot of this process's
+    llm_admission. Raises AdmissionRejected like slot(). Not for the API's event loop.
+    """
+
+    async def call():
+        async with llm_admission.slot(lane):
+            return await asyncio.get_running_loop().run_in_executor(None, functools.partial(fn, *args, **kwargs))
+
+    return asyncio.run_coroutine_threadsafe(call(), _loop_for_sync_callers()).result()
@@ -0,0 +1,37 @@
+"""
+Atomic file writes: data goes to a uniquely named temp file beside the target, which is
+then renamed over it, so readers see the old or the new content and never a torn file.
+The temp name is unique per call, so concurrent writers (threads or processes) never
+share one; the last rename wins.
+"""
+import os
+import json
+import uuid
+from typing import Union
+
+
+def write_atomic(path: str, data: Union[str, bytes]):
+    """
+    Replace `path` with `data` (text is written as UTF-8).
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, "xb") as f:
+            f.write(data.encode("utf-8") if isinstance(data, str) else data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_json_atomic(path: str, data, **dump_kwargs):
+    """
+    Replace `path` with `data` as JSON (json.dumps keyword arguments are passed through).
+    """
+    write_atomic(path, json.dumps(data, **dump_kwargs))
@@ -1,49 +1,92 @@
 import chromadb
 from chromadb.config import Settings
-from app.constant import DIRECTORY, FILE_SETTINGS, FileFormat
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import HuggingFaceEmbeddings
+from typing import Optional
+from app.constant import DIRECTORY, FileFormat, HnswParam
+from app.core.shard_router import ShardRouter
+from app.core.store_locks import lock_dir, register_client
+from app.core.embedding_versions import (
+    active_version,
+    collection_base,
+    routes_db,
+)
+from app.core.embedder import get_embedder
+from app.core.db_client import as_chroma_embeddings
 
 
 # ChromaDBClient provides an interface to ChromaDB for storing and retrieving document embeddings.
+# Lookups go to the shard collection recorded for each asset (see ShardRouter), in the
+# collections of the active embedding version unless a version is given. Callers that
+# embed and then search should resolve the version once and pass it to both calls,
+# so a cutover in between never mixes models.
 class ChromaDBClient:
     def __init__(
         self,
         persist_directory=DIRECTORY.CHROMA_DIR.value,
-        collection_name=FileFormat.DOCUMENTS.value,
     ):
-        # Initialize ChromaDB persistent client and collection
+        # Initialize ChromaDB persistent client
         self.client = chromadb.PersistentClient(path=persist_directory)
-        self.collection = self.client.get_or_create_collection(collection_name)
+        self.lock_dir = lock_dir(persist_directory)
+        register_client(persist_directory)
+        self._routers = {}
 
-    def asset_exists(self, asset_id: str) -> bool:
+    def router_for(self, version: Optional[str] = None) -> ShardRouter:
+        version = version or active_version()
+        if version not in self._routers:
+            self._routers[version] = ShardRouter(
+                self.client, collection_base(version), routes_db=routes_db(version), lock_dir=self.lock_dir
+            )
+        return self._routers[version]
+
+    @property
+    def router(self) -> ShardRouter:
+        return self.router_for()
+
+    def embed_query(self, query: str, version: Optional[str] = None):
         """
-        Check if any chunk exists for the given asset_id in the collection.
-        Returns True if found, else False.
+        Embed a user question with the model of the given (default: active) version,
+        as a float32 vector (same Embedder, and so the same normalization, as ingestion).
         """
-        results = self.collection.get(
-            where={FileFormat.ASSET_ID.value: asset_id}, include=[FileFormat.METADATAS.value]
-        )
-        return bool(results and results.get("metadatas"))
+        return get_embedder(version or active_version()).encode([query])[0]
 
-    def get_retriever(self, asset_id: str):
+    def search(
+        self, asset_id: str, query_embedding, k: Optional[int] = None, version: Optional[str] = None
+    ):
         """
-        Return a retriever that only searches chunks matching the given asset_id.
-        Uses LangChain's Chroma VectorStore wrapper for advanced retrieval.
+        Return the k chunks of an asset nearest to query_embedding, as
+        (document, metadata, distance) tuples ordered by distance (lower is closer).
+        k defaults to the k configured for the asset's collection (see app.core.hnsw_params).
         """
-
-        # Set up the retriever that queries only chunks matching this asset_id
-        embedding_function = HuggingFaceEmbeddings(
-            model_name=FILE_SETTINGS.MODEL_NAME
+        router = self.router_for(version)
+        collection = router.collection_for_asset(asset_id)
+        if collection is None:
+            return []
+        results = collection.query(
+            query_embeddings=as_chroma_embeddings(query_embedding),
+            n_results=k or router.params_for(collection.name)[HnswParam.K.value],
+            where={FileFormat.ASSET_ID.value: asset_id},
+            include=[
+                FileFormat.DOCUMENTS.value,
+                FileFormat.METADATAS.value,
+                FileFormat.DISTANCES.value,
+            ],
         )
-        store = Chroma(
-            client=self.client,
-            collection_name=self.collection.name,
-            embedding_function=embedding_function,
+        return list(
+            zip(
+                results[FileFormat.DOCUMENTS.value][0],
+                results[FileFormat.METADATAS.value][0],
+                results[FileFormat.DISTANCES.value][0],
+            )
         )
-        retriever = store.as_retriever(
-            search_kwargs={
-                FileFormat.FILTER.value: {FileFormat.ASSET_ID.value: asset_id}
-            }
+
+    def asset_exists(self, asset_id: str) -> bool:
+        """
+        Check if any chunk exists for the given asset_id in its shard collection.
+        Returns True if found, else False.
+        """
+        collection = self.router.collection_for_asset(asset_id)
+        if collection is None:
+            return False
+        results = collection.get(
+            where={FileFormat.ASSET_ID.value: asset_id}, include=[FileFormat.METADATAS.value]
         )
-        return retriever
+        return bool(results and results.get("metadatas"))
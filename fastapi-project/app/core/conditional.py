@@ -0,0 +1,77 @@
+"""
+Resource versions and conditional GET (ETag / If-None-Match) helpers.
+
+Versions are derived without reading the resource itself: a history or the thread map is
+versioned by its file's stat (every write replaces or rewrites the file), and the asset
+catalog by a small token file that ChromaDBClient rewrites on every store/delete.
+An unchanged poll is answered with 304 after a stat or a tiny read.
+"""
+import os
+import uuid
+import hashlib
+from typing import Optional
+from fastapi import Request, Response
+from app.constant import DIRECTORY
+from app.core.atomic_write import write_atomic
+
+_CATALOG_VERSION = DIRECTORY.ASSET_CATALOG_VERSION.value
+
+
+def file_version(path: str) -> Optional[str]:
+    """
+    Version of a file from its mtime (ns) and size, or None if it does not exist.
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
+
+def catalog_version() -> str:
+    """
+    Current asset catalog token ("0" before the first write).
+    """
+    try:
+        with open(_CATALOG_VERSION, "r") as f:
+            return f.read().strip() or "0"
+    except FileNotFoundError:
+        return "0"
+
+
+def bump_catalog_version():
+    """
+    Record that stored assets changed (atomic rewrite with a fresh token).
+    """
+    write_atomic(_CATALOG_VERSION, uuid.uuid4().hex)
+
+
+def make_etag(*parts) -> str:
+    """
+    Strong ETag over a resource version and whatever else shapes the response (filters, cursor).
+    """
+    digest = hashlib.sha1(":".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:24]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    True when If-None-Match names `etag` (or is "*"); weak validators compare equal, per RFC 9110.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [c.strip() for c in header.split(",")]
+    return "*" in candidates or any(c.removeprefix("W/") == etag for c in candidates)
+
+
+def set_etag(response: Response, etag: str):
+    # no-cache: browsers keep the body but revalidate every poll (and get the 304)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+
+
+def not_modified(etag: str) -> Response:
+    response = Response(status_code=304)
+    set_etag(response, etag)
+    return response
@@ -1,70 +1,378 @@
 import chromadb
 from chromadb.config import Settings
+import os
+import sqlite3
 import logging
-from typing import Dict, List, Any
-from app.constant import DIRECTORY, FileFormat
-
-# Configure logging to write to a file and console
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s %(name)s %(message)s",
-    handlers=[logging.FileHandler("chromadb_client.log"), logging.StreamHandler()],
+import numpy as np
+from typing import Dict, List, Any, Optional, Union
+from app.constant import DIRECTORY, FileFormat, RETENTION_SETTINGS
+from app.core.shard_router import ShardRouter
+from app.core.store_locks import lock_dir, register_client, other_clients
+from app.core.conditional import bump_catalog_version
+from app.core import hnsw_params
+from app.core.embedding_versions import (
+    active_version,
+    known_versions,
+    collection_base,
+    routes_db,
 )
 
 logger = logging.getLogger("chromadb-client")
 
 
+def as_chroma_embeddings(embeddings: Union[np.ndarray, List[List[float]]]) -> List[List[float]]:
+    """
+    Convert a float32 (n, dim) batch to the nested lists chromadb 0.4 requires, in one
+    C-level call at the store boundary (not one Python list per vector along the way).
+    """
+    if isinstance(embeddings, np.ndarray):
+        return np.atleast_2d(embeddings).tolist()
+    return embeddings
+
+
 # ChromaDBClient provides an interface to ChromaDB for storing and retrieving document embeddings and metadata.
+# Chunks are routed to shard collections by ShardRouter (see SHARD_SETTINGS.STRATEGY).
+# Each embedding version has its own collections and routes; methods act on the active
+# version (see app.core.embedding_versions) unless a version is given.
 class ChromaDBClient:
     def __init__(
         self,
         persist_directory=DIRECTORY.CHROMA_DIR.value,
-        collection_name=FileFormat.DOCUMENTS.value,
     ):
         # Use the new PersistentClient initialization as per Chroma migration docs
+        self.persist_directory = persist_directory
         self.client = chromadb.PersistentClient(path=persist_directory)
-        self.collection = self.client.get_or_create_collection(collection_name)
+        self.lock_dir = lock_dir(persist_directory)
+        register_client(persist_directory)
+        self._routers: Dict[str, ShardRouter] = {}
+
+    def router_for(self, version: Optional[str] = None) -> ShardRouter:
+        version = version or active_version()
+        if version not in self._routers:
+            self._routers[version] = ShardRouter(
+                self.client, collection_base(version), routes_db=routes_db(version), lock_dir=self.lock_dir
+            )
+        return self._routers[version]
+
+    @property
+    def router(self) -> ShardRouter:
+        return self.router_for()
+
+    @property
+    def collection(self):
+        # Base collection of the active version (also holds assets stored before sharding)
+        return self.router.get_collection(self.router.base_name, create=True)
 
     def file_exists(self, file_name: str) -> bool:
         """
-        Query the collection for any chunks where the stored 'file_name' matches exactly.
+        Query every shard for any chunks where the stored 'file_name' matches exactly.
         Returns True if found, else False.
         """
-        results = self.collection.get(
-            where={FileFormat.FILE_NAME.value: file_name},
-            include=[FileFormat.METADATAS.value],
-        )
-        return bool(results.get(FileFormat.METADATAS.value))
+        for collection in self.router.collections():
+            results = collection.get(
+                where={FileFormat.FILE_NAME.value: file_name}, limit=1, include=[]
+            )
+            if results.get(FileFormat.IDS.value):
+                return True
+        return False
 
     def store(
         self,
         asset_id: str,
-        embeddings: List[List[float]],
+        embeddings: Union[np.ndarray, List[List[float]]],
         texts: List[str],
         metadata: Dict[str, Any],
+        start_idx: int = 0,
+        tenant_id: Optional[str] = None,
+        version: Optional[str] = None,
     ):
         """
-        Store the embeddings and metadata in the collection.
-        Each chunk is stored with a unique id and associated metadata.
+        Store the embeddings and metadata in the asset's shard collection.
+        Each chunk is stored with a unique id and associated metadata, tagged with
+        the embedding version the vectors were produced by.
+        Ids are derived from asset_id and chunk index (starting at start_idx),
+        so re-storing a batch after a retry overwrites instead of duplicating.
         """
+        version = version or active_version()
+        router = self.router_for(version)
         n = len(embeddings)
-        ids = [f"{asset_id}_{i}" for i in range(n)]
-        metadatas = [
-            metadata
-            | {FileFormat.CHUNK_IDX.value: i, FileFormat.ASSET_ID.value: asset_id}
-            for i in range(n)
+        ids = [f"{asset_id}_{i}" for i in range(start_idx, start_idx + n)]
+        # One template per batch; each chunk only adds its index
+        template = {
+            **metadata,
+            FileFormat.ASSET_ID.value: asset_id,
+            FileFormat.EMBEDDING_VERSION.value: version,
+        }
+        chunk_idx = FileFormat.CHUNK_IDX.value
+        metadatas = [{**template, chunk_idx: i} for i in range(start_idx, start_idx + n)]
+        embeddings = as_chroma_embeddings(embeddings)
+        with router.writing(router.route_for_write(asset_id, tenant_id)) as collection:
+            collection.upsert(embeddings=embeddings, documents=texts, metadatas=metadatas, ids=ids)
+        bump_catalog_version()
+        logger.info("Stored %d chunks/embeddings for asset_id=%s in %s", n, asset_id, collection.name)
+
+    def delete_asset(self, asset_id: str, from_idx: int = 0, version: Optional[str] = None):
+        """
+        Delete the chunks of an asset, optionally only those with chunk_idx >= from_idx.
+        Used to drop uncommitted or orphaned chunks left by a failed ingestion attempt.
+        Deleting the whole asset also drops its route, and its collection when it is a
+        per-asset collection (asset strategy).
+        """
+        router = self.router_for(version)
+        where = {FileFormat.ASSET_ID.value: asset_id}
+        if from_idx:
+            where = {
+                "$and": [where, {FileFormat.CHUNK_IDX.value: {"$gte": from_idx}}]
+            }
+        name = router.route_of(asset_id)
+        with router.write_lock(name):
+            collection = router.get_collection(name)
+            if collection is not None:
+                collection.delete(where=where)
+                if not from_idx and router.is_asset_collection(name) and not collection.count():
+                    self.client.delete_collection(name)
+        if not from_idx:
+            router.catalog.delete(asset_id)
+        bump_catalog_version()
+        logger.info("Deleted chunks for asset_id=%s from chunk_idx=%d", asset_id, from_idx)
+
+    def drop_version(self, version: str) -> int:
+        """
+        Delete every collection and route of an embedding version that is not active
+        (a migration target being started over or abandoned). Returns collections dropped.
+        """
+        if version == active_version():
+            raise ValueError(f"Embedding version '{version}' is active")
+        router = self.router_for(version)
+        names = [
+            c.name
+            for c in self.client.list_collections()
+            if c.name == router.base_name or c.name.startswith(f"{router.base_name}_")
         ]
-        self.collection.add(
-            embeddings=embeddings, documents=texts, metadatas=metadatas, ids=ids
-        )
-        logger.info(f"Stored {n} chunks/embeddings for asset_id={asset_id}")
+        for name in names:
+            with router.write_lock(name):
+                self.client.delete_collection(name)
+        router.catalog.clear()
+        bump_catalog_version()
+        logger.info("Dropped %d collections of embedding version %s", len(names), version)
+        return len(names)
 
     def list_documents(self):
         """
-        Retrieve all documents and their metadata from the collection.
+        Retrieve all documents and their metadata across every shard collection.
         """
-        results = self.collection.get(
-            include=[FileFormat.METADATAS.value, FileFormat.DOCUMENTS.value]
-        )
-        print("existing documents in ChromaDB:")
+        results = {
+            FileFormat.IDS.value: [],
+            FileFormat.METADATAS.value: [],
+            FileFormat.DOCUMENTS.value: [],
+        }
+        for collection in self.router.collections():
+            page = collection.get(
+                include=[FileFormat.METADATAS.value, FileFormat.DOCUMENTS.value]
+            )
+            for key in results:
+                results[key].extend(page.get(key) or [])
         return results
+
+    def list_assets(self, version: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Return {asset_id: metadata} with one chunk's metadata per asset (no documents or embeddings).
+        """
+        assets = {}
+        for collection in self.router_for(version).collections():
+            results = collection.get(include=[FileFormat.METADATAS.value])
+            for m in results.get(FileFormat.METADATAS.value) or []:
+                asset_id = m.get(FileFormat.ASSET_ID.value)
+                if asset_id and asset_id not in assets:
+                    assets[asset_id] = m
+        return assets
+
+    def asset_exists(self, asset_id: str, version: Optional[str] = None) -> bool:
+        """
+        Check if any chunk exists for the given asset_id in its shard collection.
+        """
+        collection = self.router_for(version).collection_for_asset(asset_id)
+        if collection is None:
+            return False
+        results = collection.get(where={FileFormat.ASSET_ID.value: asset_id}, limit=1, include=[])
+        return bool(results.get(FileFormat.IDS.value))
+
+    def asset_metadata(self, asset_id: str, version: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Return one chunk's metadata for an asset (file name, type, content hash, ...), or None.
+        """
+        collection = self.router_for(version).collection_for_asset(asset_id)
+        if collection is None:
+            return None
+        results = collection.get(
+            where={FileFormat.ASSET_ID.value: asset_id},
+            limit=1,
+            include=[FileFormat.METADATAS.value],
+        )
+        metadatas = results.get(FileFormat.METADATAS.value) or []
+        return metadatas[0] if metadatas else None
+
+    def asset_chunks(self, asset_id: str, version: Optional[str] = None) -> List[str]:
+        """
+        Return an asset's stored chunk texts in chunk_idx order.
+        """
+        collection = self.router_for(version).collection_for_asset(asset_id)
+        if collection is None:
+            return []
+        results = collection.get(
+            where={FileFormat.ASSET_ID.value: asset_id},
+            include=[FileFormat.DOCUMENTS.value, FileFormat.METADATAS.value],
+        )
+        ordered = sorted(
+            zip(results.get(FileFormat.METADATAS.value) or [], results.get(FileFormat.DOCUMENTS.value) or []),
+            key=lambda pair: pair[0].get(FileFormat.CHUNK_IDX.value, 0),
+        )
+        return [text for _, text in ordered]
+
+    def content_hash_in_use(self, content_hash: str) -> bool:
+        """
+        Check whether any stored asset was ingested from content with this hash.
+        """
+        for collection in self.router.collections():
+            results = collection.get(
+                where={FileFormat.CONTENT_HASH.value: content_hash}, limit=1, include=[]
+            )
+            if results.get(FileFormat.IDS.value):
+                return True
+        return False
+
+    def _storage_bytes(self) -> int:
+        total = 0
+        for root, _, filenames in os.walk(self.persist_directory):
+            for name in filenames:
+                total += os.path.getsize(os.path.join(root, name))
+        return total
+
+    def _copy_records(self, source, target) -> int:
+        """
+        Copy every record of `source` into `target` in batches. Returns the number copied.
+        """
+        batch = RETENTION_SETTINGS.COMPACT_BATCH_SIZE
+        offset = 0
+        total = source.count()
+        # Bounded by count(): Chroma 0.4 returns every vector (including deleted ones)
+        # when an embeddings page comes back empty, so never request past the end
+        while offset < total:
+            page = source.get(
+                limit=batch,
+                offset=offset,
+                include=[
+                    FileFormat.EMBEDDINGS.value,
+                    FileFormat.DOCUMENTS.value,
+                    FileFormat.METADATAS.value,
+                ],
+            )
+            ids = page.get(FileFormat.IDS.value) or []
+            if not ids:
+                break
+            target.upsert(
+                ids=ids,
+                embeddings=page[FileFormat.EMBEDDINGS.value],
+                documents=page[FileFormat.DOCUMENTS.value],
+                metadatas=page[FileFormat.METADATAS.value],
+            )
+            offset += len(ids)
+        return offset
+
+    def _recover_interrupted_compaction(self, router: ShardRouter):
+        """
+        Finish or discard the collections left by an interrupted rebuild (see _rebuild_collection).
+        A temp copy is complete once the original has been renamed to its replaced name.
+        """
+        compact, replaced = RETENTION_SETTINGS.COMPACT_SUFFIX, RETENTION_SETTINGS.REPLACED_SUFFIX
+        names = {c.name for c in self.client.list_collections()}
+        originals = {n[: -len(compact)] for n in names if n.endswith(compact)}
+        originals |= {n[: -len(replaced)] for n in names if n.endswith(replaced)}
+        for original in originals:
+            if not (original == router.base_name or original.startswith(f"{router.base_name}_")):
+                continue
+            with router.write_lock(original):
+                names = {c.name for c in self.client.list_collections()}
+                temp_name, old_name = f"{original}{compact}", f"{original}{replaced}"
+                if temp_name in names and old_name not in names and original in names:
+                    # Copy never finished; the original is intact
+                    self.client.delete_collection(temp_name)
+                elif temp_name in names:
+                    temp = self.client.get_collection(temp_name)
+                    if original in names:
+                        # Created by a write after the interruption, so newer than the copy
+                        self._copy_records(self.client.get_collection(original), temp)
+                        self.client.delete_collection(original)
+                    temp.modify(name=original)
+                    if old_name in names:
+                        self.client.delete_collection(old_name)
+                elif original in names:
+                    # Swap finished; only the replaced original is left
+                    self.client.delete_collection(old_name)
+                else:
+                    self.client.get_collection(old_name).modify(name=original)
+                logger.warning("Recovered interrupted compaction of %s", original)
+
+    def _rebuild_collection(self, name: str, router: ShardRouter) -> int:
+        """
+        Copy a collection's live records into a fresh one and swap it in under the same name.
+        The fresh index is built with the collection's current M/construction_ef/search_ef
+        (see app.core.hnsw_params); its space is kept. Returns the number of records copied.
+
+        The collection's write lock is held throughout, so writers wait instead of writing
+        to a collection that is being copied; readers that miss it during the swap wait too.
+        The original is renamed aside (not deleted) before the copy takes its name, so at
+        every point one complete copy exists under a name recovery can find.
+        """
+        with router.write_lock(name):
+            collection = self.client.get_collection(name)
+            temp = self.client.create_collection(
+                f"{name}{RETENTION_SETTINGS.COMPACT_SUFFIX}",
+                metadata=hnsw_params.rebuild_metadata(collection.metadata, router.params_for(name)),
+            )
+            copied = self._copy_records(collection, temp)
+            collection.modify(name=f"{name}{RETENTION_SETTINGS.REPLACED_SUFFIX}")
+            temp.modify(name=name)
+            self.client.delete_collection(f"{name}{RETENTION_SETTINGS.REPLACED_SUFFIX}")
+        return copied
+
+    def compact(self) -> Dict[str, int]:
+        """
+        Rebuild every shard collection (of every live embedding version) to reclaim space held by deleted chunks
+        and apply tuned index parameters.
+        Deletes in ChromaDB only mark HNSW elements as deleted, so the index keeps growing;
+        copying live records into a fresh collection and swapping it in drops them for good.
+        The SQLite store is vacuumed afterwards, but only when no other process has the store
+        open (run app.scripts.compact_index with the app stopped to vacuum).
+        Returns sizes before/after in bytes.
+        """
+        bytes_before = self._storage_bytes()
+        records = 0
+        for version in known_versions():
+            router = self.router_for(version)
+            self._recover_interrupted_compaction(router)
+            for name in [c.name for c in router.collections()]:
+                records += self._rebuild_collection(name, router)
+
+        vacuumed = False
+        sqlite_path = os.path.join(self.persist_directory, "chroma.sqlite3")
+        others = other_clients(self.persist_directory)
+        if others:
+            logger.info("Skipping VACUUM: %d other processes have the store open", others)
+        elif os.path.exists(sqlite_path):
+            conn = sqlite3.connect(sqlite_path)
+            try:
+                conn.execute("VACUUM")
+                vacuumed = True
+            finally:
+                conn.close()
+
+        bytes_after = self._storage_bytes()
+        logger.info("Compacted %d records: %d -> %d bytes", records, bytes_before, bytes_after)
+        return {
+            FileFormat.RECORDS.value: records,
+            FileFormat.VACUUMED.value: vacuumed,
+            FileFormat.BYTES_BEFORE.value: bytes_before,
+            FileFormat.BYTES_AFTER.value: bytes_after,
+            FileFormat.BYTES_RECLAIMED.value: max(0, bytes_before - bytes_after),
+        }
@@ -1,7 +1,8 @@
 from sentence_transformers import SentenceTransformer
 from typing import List, Tuple
+import numpy as np
 import torch
-from app.constant import FILE_SETTINGS
+from app.constant import FILE_SETTINGS, EMBEDDING_SETTINGS
 
 
 class Embedder:
@@ -10,12 +11,29 @@ class Embedder:
         model_name=FILE_SETTINGS.MODEL_NAME,
         chunk_size=FILE_SETTINGS.CHUNK_SIZE_WORDS,
         chunk_overlap=FILE_SETTINGS.CHUNK_OVERLAP,
+        normalize=False,
     ):
         # Use GPU if available, else fallback to CPU
         device = FILE_SETTINGS.CUDA if torch.cuda.is_available() else FILE_SETTINGS.CPU
         self.model = SentenceTransformer(model_name, device=device)
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.normalize = normalize
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts in batches into one C-contiguous float32 array of shape (len(texts), dim),
+        L2-normalized here (once) when the embedding version asks for it.
+        Vectors stay in this array until the ChromaDB boundary (see db_client.as_chroma_embeddings).
+        """
+        vectors = self.model.encode(
+            texts,
+            batch_size=EMBEDDING_SETTINGS.ENCODE_BATCH_SIZE,
+            convert_to_numpy=True,
+            normalize_embeddings=self.normalize,
+            show_progress_bar=False,
+        )
+        return np.ascontiguousarray(vectors, dtype=np.float32)
 
     def chunk_text(self, text: str) -> List[str]:
         """
@@ -30,13 +48,27 @@ class Embedder:
             chunks.append(" ".join(chunk))
         return [c for c in chunks if c.strip()]
 
-    def embed(self, text: str) -> Tuple[List[List[float]], List[str]]:
+    def embed(self, text: str) -> Tuple[np.ndarray, List[str]]:
         """
         Embed the text by chunking and running through the model.
-        Returns a tuple of (embeddings, chunk_texts).
+        Returns a tuple of (embeddings as a float32 array, chunk_texts).
         """
         chunks = self.chunk_text(text)
         if not chunks:
             raise ValueError("No text found for embedding.")
-        embeddings = self.model.encode(chunks, show_progress_bar=False)
-        return [emb.tolist() for emb in embeddings], chunks
+        return self.encode(chunks), chunks
+
+
+# One Embedder per embedding version, loaded on first use in each process
+_embedders = {}
+
+
+def get_embedder(version: str) -> Embedder:
+    """
+    Return the Embedder for an embedding version (see app.core.embedding_versions).
+    """
+    if version not in _embedders:
+        from app.core.embedding_versions import model_name, normalized
+
+        _embedders[version] = Embedder(model_name=model_name(version), normalize=normalized(version))
+    return _embedders[version]
@@ -0,0 +1,202 @@
+"""
+Embedding model versions.
+
+Every stored vector belongs to a version (EMBEDDING_SETTINGS.MODELS maps versions to
+models) and each version has its own collections and asset routes. A small pointer file
+names the active version (used for retrieval) and, during a migration, the target
+version that ingestion also writes to and the re-embedding job fills. Cutover rewrites
+the pointer with an atomic rename, so every process switches on its next read.
+Changes to the pointer (start, abort, cutover) are serialized by a cross-process lock,
+which the re-embedding job also holds while it copies an asset.
+"""
+import os
+import json
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, List, Optional
+from filelock import FileLock
+from app.constant import EMBEDDING_SETTINGS, SHARD_SETTINGS, FileFormat
+from app.core.atomic_write import write_json_atomic
+
+_cache = {"stamp": None, "state": None}
+
+
+class MigrationPending(Exception):
+    def __init__(self, target: str, pending: int):
+        super().__init__(f"{pending} assets are not yet re-embedded into {target}")
+        self.target = target
+        self.pending = pending
+
+
+def _default_state() -> dict:
+    return {
+        FileFormat.ACTIVE.value: EMBEDDING_SETTINGS.LEGACY_VERSION,
+        FileFormat.TARGET.value: None,
+        FileFormat.PREVIOUS.value: None,
+    }
+
+
+def load_state() -> dict:
+    """
+    Return the version pointer, re-read only when the file changed.
+    """
+    path = EMBEDDING_SETTINGS.STATE_FILE
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return _default_state()
+    # Every save is a rename of a new file, so the inode changes even within one mtime tick
+    stamp = (st.st_ino, st.st_mtime_ns)
+    if _cache["stamp"] != stamp:
+        with open(path, "r") as f:
+            _cache["state"] = json.load(f)
+        _cache["stamp"] = stamp
+    return dict(_cache["state"])
+
+
+def _save_state(state: dict):
+    state[FileFormat.UPDATED_AT.value] = datetime.utcnow().isoformat() + "Z"
+    write_json_atomic(EMBEDDING_SETTINGS.STATE_FILE, state, indent=2)
+
+
+@contextmanager
+def migration_lock():
+    """
+    Exclusive lock on the version pointer across processes, re-entrant within a thread.
+    """
+    with FileLock(f"{EMBEDDING_SETTINGS.STATE_FILE}.lock", is_singleton=True):
+        yield
+
+
+def active_version() -> str:
+    return load_state()[FileFormat.ACTIVE.value]
+
+
+def target_version() -> Optional[str]:
+    return load_state().get(FileFormat.TARGET.value)
+
+
+def write_versions() -> List[str]:
+    """
+    Versions new chunks must be written to: the active one, plus the target while migrating.
+    """
+    state = load_state()
+    versions = [state[FileFormat.ACTIVE.value]]
+    if state.get(FileFormat.TARGET.value):
+        versions.append(state[FileFormat.TARGET.value])
+    return versions
+
+
+def known_versions() -> List[str]:
+    """
+    Versions that may hold vectors (active, target and the one before the last cutover).
+    """
+    state = load_state()
+    versions = write_versions()
+    previous = state.get(FileFormat.PREVIOUS.value)
+    if previous and previous not in versions:
+        versions.append(previous)
+    return versions
+
+
+def model_name(version: str) -> str:
+    if version not in EMBEDDING_SETTINGS.MODELS:
+        raise ValueError(f"Unknown embedding version: '{version}'")
+    return EMBEDDING_SETTINGS.MODELS[version]
+
+
+def normalized(version: str) -> bool:
+    """
+    Whether a version's vectors (stored and query) are L2-normalized at encode time.
+    """
+    return version in EMBEDDING_SETTINGS.NORMALIZED_VERSIONS
+
+
+def collection_base(version: str) -> str:
+    """
+    Base collection name for a version. The legacy version keeps the original name;
+    others are prefixed (not suffixed) so shard-name matching never mixes versions.
+    """
+    if version == EMBEDDING_SETTINGS.LEGACY_VERSION:
+        return FileFormat.DOCUMENTS.value
+    return f"{version}-{FileFormat.DOCUMENTS.value}"
+
+
+def routes_db(version: str) -> str:
+    if version == EMBEDDING_SETTINGS.LEGACY_VERSION:
+        return SHARD_SETTINGS.ROUTES_DB
+    root, ext = os.path.splitext(SHARD_SETTINGS.ROUTES_DB)
+    return f"{root}.{version}{ext}"
+
+
+def start_migration(version: str, prepare: Optional[Callable[[str], None]] = None) -> dict:
+    """
+    Make `version` the target: ingestion starts dual-writing and re-embedding may begin.
+    `prepare(version)` runs under the lock first (used to empty the target's storage).
+    """
+    model_name(version)
+    with migration_lock():
+        state = load_state()
+        if version == state[FileFormat.ACTIVE.value]:
+            raise ValueError(f"Embedding version '{version}' is already active")
+        if prepare:
+            prepare(version)
+        state[FileFormat.TARGET.value] = version
+        if state.get(FileFormat.PREVIOUS.value) == version:
+            state[FileFormat.PREVIOUS.value] = None
+        _save_state(state)
+    return state
+
+
+def abort_migration(cleanup: Optional[Callable[[str], None]] = None) -> dict:
+    """
+    Stop the migration: ingestion stops writing to the target, then `cleanup(target)`
+    runs under the lock (used to drop what was re-embedded so far).
+    """
+    with migration_lock():
+        state = load_state()
+        target = state.get(FileFormat.TARGET.value)
+        state[FileFormat.TARGET.value] = None
+        _save_state(state)
+        if target and cleanup:
+            cleanup(target)
+    return state
+
+
+def cutover(pending: Optional[Callable[[str, str], list]] = None) -> dict:
+    """
+    Make the target version active. `pending(active, target)` is checked under the same
+    lock as the swap, so no re-embedding, abort or restart can slip in between; the
+    cutover is refused with MigrationPending when it returns any asset.
+    The old version is kept as `previous` only so deletions still reach its vectors: it
+    receives no new chunks, so going back to it is a new migration, not a cut-back.
+    """
+    with migration_lock():
+        state = load_state()
+        target = state.get(FileFormat.TARGET.value)
+        if not target:
+            raise ValueError("No embedding migration in progress")
+        missing = pending(state[FileFormat.ACTIVE.value], target) if pending else []
+        if missing:
+            raise MigrationPending(target, len(missing))
+        state[FileFormat.PREVIOUS.value] = state[FileFormat.ACTIVE.value]
+        state[FileFormat.ACTIVE.value] = target
+        state[FileFormat.TARGET.value] = None
+        _save_state(state)
+    return state
+
+
+def load_progress() -> dict:
+    path = EMBEDDING_SETTINGS.PROGRESS_FILE
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_progress(**fields):
+    write_json_atomic(
+        EMBEDDING_SETTINGS.PROGRESS_FILE,
+        {**fields, FileFormat.UPDATED_AT.value: datetime.utcnow().isoformat() + "Z"},
+        indent=2,
+    )
@@ -6,56 +6,114 @@ from app.constant import FileFormat, FileType
 
 logger = logging.getLogger("file-parser")
 
-# Helper: Chunk a text file into word-based chunks for efficient embedding
-# Yields one chunk at a time
+# Helper: Split a stream of text units (lines, pages, paragraphs) into word-based chunks
+# Yields one chunk at a time; consecutive chunks share overlap_words words
+
+
+def units_to_chunks(units, chunk_size_words=2000, overlap_words=0):
+    overlap_words = min(overlap_words, chunk_size_words - 1)
+    step = chunk_size_words - overlap_words
+    buffer = []
+    fresh = 0  # Words at the end of the buffer not yet part of any emitted chunk
+    for unit in units:
+        words = (unit or "").split()
+        if not words:
+            continue
+        buffer.extend(words)
+        fresh += len(words)
+        while len(buffer) >= chunk_size_words:
+            yield " ".join(buffer[:chunk_size_words])
+            buffer = buffer[step:]
+            fresh = max(0, len(buffer) - overlap_words)
+    if fresh:
+        yield " ".join(buffer)
+
+
+# Helpers: Extract the text units of a file, one at a time
+# on_page(parsed, total) is called after each unit (total is unknown for text files)
 
 
-def text_file_chunks(file_path, chunk_size_words=2000):
+def text_file_units(file_path, on_page=None):
     with open(file_path, "r", encoding="utf-8") as f:
-        buffer = []
-        for line in f:
-            words = line.split()
-            buffer.extend(words)
-            while len(buffer) >= chunk_size_words:
-                yield " ".join(buffer[:chunk_size_words])
-                buffer = buffer[chunk_size_words:]
-        if buffer:
-            yield " ".join(buffer)
-
-
-# Helper: Chunk a PDF file into word-based chunks
-# Yields one chunk at a time
+        for line_no, line in enumerate(f, start=1):
+            yield line
+            if on_page:
+                on_page(line_no, None)
 
 
-def pdf_file_chunks(file_path, chunk_size_words=2000):
+def pdf_file_units(file_path, on_page=None):
     with pdfplumber.open(file_path) as pdf:
-        buffer = []
-        for page in pdf.pages:
-            text = page.extract_text() or ""
-            words = text.split()
-            buffer.extend(words)
-            while len(buffer) >= chunk_size_words:
-                yield " ".join(buffer[:chunk_size_words])
-                buffer = buffer[chunk_size_words:]
-        if buffer:
-            yield " ".join(buffer)
-
-
-# Helper: Chunk a DOCX file into word-based chunks
-# Yields one chunk at a time
+        total = len(pdf.pages)
+        for page_no, page in enumerate(pdf.pages, start=1):
+            yield page.extract_text() or ""
+            if on_page:
+                on_page(page_no, total)
 
 
-def docx_file_chunks(file_path, chunk_size_words=2000):
+def docx_file_units(file_path, on_page=None):
     doc = DocxDocument(file_path)
-    buffer = []
-    for para in doc.paragraphs:
-        words = para.text.split()
-        buffer.extend(words)
-        while len(buffer) >= chunk_size_words:
-            yield " ".join(buffer[:chunk_size_words])
-            buffer = buffer[chunk_size_words:]
-    if buffer:
-        yield " ".join(buffer)
+    paragraphs = doc.paragraphs
+    total = len(paragraphs)
+    for para_no, para in enumerate(paragraphs, start=1):
+        yield para.text
+        if on_page:
+            on_page(para_no, total)
+
+
+# Map file types to their unit extractors
+UNIT_EXTRACTORS = {
+    FileType.PDF.value: pdf_file_units,
+    FileType.TXT.value: text_file_units,
+    FileType.DOCX.value: docx_file_units,
+}
+
+
+# Helpers: Extract the units of one part of a file (split ingestion)
+# Concatenating the parts in order gives the same units as the whole-file extractor
+
+
+def pdf_page_range_units(file_path, start, end):
+    # Pages [start, end); end=None reads to the last page
+    with pdfplumber.open(file_path) as pdf:
+        for page in pdf.pages[start:end]:
+            yield page.extract_text() or ""
+
+
+def text_byte_range_units(file_path, start, end):
+    # Lines that begin in bytes [start, end); a line straddling `start` belongs to the previous part.
+    # end=None reads to the end of the file
+    with open(file_path, "rb") as f:
+        if start:
+            f.seek(start - 1)
+            f.readline()
+        while end is None or f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            yield line.decode("utf-8")
+
+
+# Map splittable file types to their range extractors (PDF: page ranges, TXT: byte ranges)
+UNIT_RANGE_EXTRACTORS = {
+    FileType.PDF.value: pdf_page_range_units,
+    FileType.TXT.value: text_byte_range_units,
+}
+
+
+# Helpers: Chunk a file into word-based chunks for efficient embedding
+# Yields one chunk at a time
+
+
+def text_file_chunks(file_path, chunk_size_words=2000, on_page=None):
+    return units_to_chunks(text_file_units(file_path, on_page), chunk_size_words)
+
+
+def pdf_file_chunks(file_path, chunk_size_words=2000, on_page=None):
+    return units_to_chunks(pdf_file_units(file_path, on_page), chunk_size_words)
+
+
+def docx_file_chunks(file_path, chunk_size_words=2000, on_page=None):
+    return units_to_chunks(docx_file_units(file_path, on_page), chunk_size_words)
 
 
 class FileParser:
@@ -100,7 +158,7 @@ class FileParser:
                     texts = [page.extract_text() for page in pdf.pages]
                 return "\n".join([t for t in texts if t])
             except Exception as e:
-                logger.error(f"PDF extraction error: {e}")
+                logger.error("PDF extraction error: %s", e)
                 raise RuntimeError("Failed to extract text from PDF.")
         # DOCX extraction
         elif ext == FileType.DOCX.value:
@@ -109,7 +167,7 @@ class FileParser:
                 texts = [p.text for p in doc.paragraphs]
                 return "\n".join([t for t in texts if t])
             except Exception as e:
-                logger.error(f"DOCX extraction error: {e}")
+                logger.error("DOCX extraction error: %s", e)
                 raise RuntimeError("Failed to extract text from DOCX.")
         # TXT extraction
         elif ext == FileType.TXT.value:
@@ -117,7 +175,7 @@ class FileParser:
                 with open(file_path, "r", encoding="utf-8") as f:
                     return f.read()
             except Exception as e:
-                logger.error(f"TXT extraction error: {e}")
+                logger.error("TXT extraction error: %s", e)
                 raise RuntimeError("Failed to extract text from TXT.")
         else:
             raise ValueError(f"Unsupported file format: {ext}")
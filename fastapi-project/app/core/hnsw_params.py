@@ -0,0 +1,113 @@
+"""
+HNSW index parameters per collection.
+
+Chroma (0.4) reads the space, M, construction_ef and search_ef of a collection's HNSW
+index from the collection metadata once, when the index segment is created; later metadata
+changes do not reach an existing index. Defaults come from HNSW_SETTINGS; the params file
+written by app.scripts.tune_hnsw overrides them per collection name, or per version base
+name for every shard of that version. k (chunks per asset search) is kept alongside, since
+a tuned search_ef only guarantees its recall for the k it was measured at.
+
+New collections are created with their parameters. Existing ones take changed index
+parameters only when compaction rebuilds them (POST /api/chroma/compact or the daily beat
+task); a changed k applies to the next search. The space of an existing collection is
+never changed.
+"""
+import os
+import json
+import time
+from typing import Dict, Optional
+from app.constant import CHAT_SETTINGS, HNSW_SETTINGS, FileFormat, HnswParam
+from app.core.atomic_write import write_json_atomic
+
+# Parameters Chroma itself falls back to when a collection's metadata has none
+_CHROMA_DEFAULTS = {
+    HnswParam.SPACE: "l2",
+    HnswParam.M: 16,
+    HnswParam.CONSTRUCTION_EF: 100,
+    HnswParam.SEARCH_EF: 10,
+}
+_INDEX_PARAMS = (HnswParam.SPACE, HnswParam.M, HnswParam.CONSTRUCTION_EF, HnswParam.SEARCH_EF)
+
+_cache = {"mtime": None, "checked": None, "tuned": {}}
+
+
+def defaults() -> Dict[str, object]:
+    return {
+        HnswParam.SPACE.value: HNSW_SETTINGS.SPACE,
+        HnswParam.M.value: HNSW_SETTINGS.M,
+        HnswParam.CONSTRUCTION_EF.value: HNSW_SETTINGS.CONSTRUCTION_EF,
+        HnswParam.SEARCH_EF.value: HNSW_SETTINGS.SEARCH_EF,
+        HnswParam.K.value: CHAT_SETTINGS.RETRIEVAL_K,
+    }
+
+
+def load_tuned() -> Dict[str, dict]:
+    """
+    Return {collection or base name: params} from the params file, re-read only when it changed
+    (checked at most every HNSW_SETTINGS.RELOAD_INTERVAL seconds, since searches ask for k).
+    """
+    now = time.monotonic()
+    if _cache["checked"] is not None and now - _cache["checked"] < HNSW_SETTINGS.RELOAD_INTERVAL:
+        return _cache["tuned"]
+    _cache["checked"] = now
+    path = HNSW_SETTINGS.PARAMS_FILE
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        _cache["mtime"], _cache["tuned"] = None, {}
+        return {}
+    if _cache["mtime"] != mtime:
+        with open(path, "r") as f:
+            _cache["tuned"] = json.load(f).get(FileFormat.COLLECTIONS.value, {})
+        _cache["mtime"] = mtime
+    return _cache["tuned"]
+
+
+def save_tuned(updates: Dict[str, dict]):
+    """
+    Merge {collection name: params (and tuning stats)} into the params file (atomic rewrite).
+    """
+    _cache["checked"] = None
+    tuned = dict(load_tuned())
+    tuned.update(updates)
+    write_json_atomic(HNSW_SETTINGS.PARAMS_FILE, {FileFormat.COLLECTIONS.value: tuned}, indent=2)
+    _cache["checked"] = None
+
+
+def params_for(name: str, base_name: Optional[str] = None) -> Dict[str, object]:
+    """
+    Effective parameters of a collection: defaults, then the base name's entry, then its own.
+    """
+    tuned = load_tuned()
+    params = defaults()
+    for key in (base_name, name):
+        entry = tuned.get(key) if key else None
+        if entry:
+            params.update({p.value: entry[p.value] for p in HnswParam if p.value in entry})
+    return params
+
+
+def index_metadata(params: Dict[str, object]) -> Dict[str, object]:
+    """
+    Chroma collection metadata ("hnsw:*" keys) for creating a collection with these parameters.
+    """
+    return {p.metadata_key: params[p.value] for p in _INDEX_PARAMS}
+
+
+def rebuild_metadata(metadata: Optional[dict], params: Dict[str, object]) -> Dict[str, object]:
+    """
+    Metadata for rebuilding an existing collection: its other metadata and space are kept,
+    M, construction_ef and search_ef come from params.
+    """
+    metadata = dict(metadata or {})
+    space = metadata.get(HnswParam.SPACE.metadata_key, _CHROMA_DEFAULTS[HnswParam.SPACE])
+    metadata.update(index_metadata(params))
+    metadata[HnswParam.SPACE.metadata_key] = space
+    return metadata
+
+
+def space_of(collection) -> str:
+    return (collection.metadata or {}).get(
+        HnswParam.SPACE.metadata_key, _CHROMA_DEFAULTS[HnswParam.SPACE]
+    )
@@ -0,0 +1,284 @@
+"""
+Size-aware scheduling of ingestion jobs.
+
+Every job is classified when it is enqueued: small single-file uploads are interactive,
+large or long files are bulk, the rest is standard. Each class has its own Celery queue
+(SCHEDULING_SETTINGS.QUEUES) served by its own workers, so a 400-page PDF never sits in
+front of a 1-page upload. Within a queue, tenants are kept fair with broker priorities:
+a tenant's n-th outstanding job gets priority n, so one tenant's backfill interleaves with
+everyone else's first job instead of running ahead of it.
+
+In Celery mode job records, per-tenant counters and queue wait samples live in Redis;
+the workers record each job's wait through the task_prerun/task_postrun signals.
+The embedded executor applies the same classes in-process (see app.embedded_executor).
+"""
+import os
+import math
+import time
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import redis
+from app.constant import (
+    SCHEDULING_SETTINGS,
+    SHARD_SETTINGS,
+    FileFormat,
+    FileType,
+    IngestClass,
+)
+
+logger = logging.getLogger("ingest-scheduler")
+
+# Classes in priority order (highest first)
+CLASS_ORDER = [IngestClass.INTERACTIVE, IngestClass.STANDARD, IngestClass.BULK]
+
+# Tasks whose class does not depend on the file; anything else not listed is unclassified
+TASK_CLASSES = {
+    "app.document_tasks.reindex_asset_task": IngestClass.BULK,
+    "app.document_tasks.summarize_asset_task": IngestClass.STANDARD,
+}
+
+# States after which a Celery task will not run again. Not IGNORED: a split ingestion
+# replaces its task and finishes under the same task id (see app.document_tasks)
+_FINAL_STATES = {"SUCCESS", "FAILURE", "REVOKED"}
+
+_redis = None
+
+
+def _get_redis():
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(SCHEDULING_SETTINGS.REDIS_URL, decode_responses=True)
+    return _redis
+
+
+def _key(*parts) -> str:
+    return SCHEDULING_SETTINGS.KEY_PREFIX + ":".join(parts)
+
+
+@dataclass
+class IngestJob:
+    ingest_class: IngestClass
+    tenant_id: str = SHARD_SETTINGS.DEFAULT_TENANT
+    file_size: Optional[int] = None
+    pages: Optional[int] = None
+    priority: int = 0
+    enqueued_at: float = 0.0
+
+    @property
+    def queue(self) -> str:
+        return queue_name(self.ingest_class)
+
+
+def queue_name(ingest_class: IngestClass) -> str:
+    return SCHEDULING_SETTINGS.QUEUES[IngestClass(ingest_class).value]
+
+
+def _pdf_pages(file_path: str) -> int:
+    # Read the page tree's /Count instead of walking every page
+    import pdfplumber
+    from pdfminer.pdftypes import resolve1
+
+    with pdfplumber.open(file_path) as pdf:
+        return int(resolve1(resolve1(pdf.doc.catalog["Pages"])["Count"]))
+
+
+def estimate_pages(file_path: str, file_type: str, file_size: int) -> int:
+    """
+    Page count of a PDF, or an estimate from the file size for other types
+    (and for PDFs whose page tree cannot be read).
+    """
+    if file_type == FileType.PDF.value:
+        try:
+            return _pdf_pages(file_path)
+        except Exception as e:
+            logger.debug("No page count for %s: %s", file_path, e)
+    bytes_per_page = SCHEDULING_SETTINGS.BYTES_PER_PAGE.get(file_type, 10 * 1024)
+    return max(1, math.ceil(file_size / bytes_per_page))
+
+
+def classify(file_path: str, tenant_id: Optional[str] = None, interactive: bool = True) -> IngestJob:
+    """
+    Classify an ingestion job by file size, page count and type.
+    interactive=False (folder ingestion, backfills) caps the class at standard.
+    Unreadable paths are classified as standard; ingestion reports the real error.
+    """
+    tenant_id = tenant_id or SHARD_SETTINGS.DEFAULT_TENANT
+    try:
+        file_size = os.path.getsize(file_path)
+    except OSError:
+        return IngestJob(IngestClass.STANDARD, tenant_id)
+    file_type = os.path.splitext(file_path)[1].lower().lstrip(".")
+    pages = estimate_pages(file_path, file_type, file_size)
+    if file_size >= SCHEDULING_SETTINGS.BULK_MIN_BYTES or pages >= SCHEDULING_SETTINGS.BULK_MIN_PAGES:
+        ingest_class = IngestClass.BULK
+    elif (
+        interactive
+        and file_size <= SCHEDULING_SETTINGS.INTERACTIVE_MAX_BYTES
+        and pages <= SCHEDULING_SETTINGS.INTERACTIVE_MAX_PAGES
+    ):
+        ingest_class = IngestClass.INTERACTIVE
+    else:
+        ingest_class = IngestClass.STANDARD
+    return IngestJob(ingest_class, tenant_id, file_size, pages)
+
+
+def job_for_task(name: str, tenant_id: Optional[str] = None) -> Optional[IngestJob]:
+    """
+    The fixed class of a non-ingestion task (re-indexing, summaries), or None.
+    """
+    if name not in TASK_CLASSES:
+        return None
+    return IngestJob(TASK_CLASSES[name], tenant_id or SHARD_SETTINGS.DEFAULT_TENANT)
+
+
+def worker_split(total: int, minimum: int = 1) -> Dict[str, int]:
+    """
+    Split `total` workers between the classes by WORKER_SHARES (largest remainder),
+    giving every class at least `minimum`.
+    """
+    shares = SCHEDULING_SETTINGS.WORKER_SHARES
+    weight = sum(shares.values()) or 1.0
+    exact = {c.value: total * shares.get(c.value, 0) / weight for c in CLASS_ORDER}
+    split = {c: max(minimum, int(n)) for c, n in exact.items()}
+    for c in sorted(exact, key=lambda c: exact[c] - int(exact[c]), reverse=True):
+        if sum(split.values()) >= total:
+            break
+        split[c] += 1
+    return split
+
+
+def wait_summary(waits: List[float]) -> dict:
+    """
+    Count and p50/p95/max of a list of timings, in their own unit (queue waits in
+    seconds, warm-up first hits in milliseconds).
+    """
+    if not waits:
+        return {"count": 0, "p50": None, "p95": None, "max": None}
+    ordered = sorted(waits)
+
+    def pct(p):
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 3)
+
+    return {"count": len(ordered), "p50": pct(0.5), "p95": pct(0.95), "max": round(ordered[-1], 3)}
+
+
+def admit(task_id: str, job: IngestJob) -> IngestJob:
+    """
+    Celery mode: record a job about to be queued and set its class and priority.
+    A tenant with TENANT_INTERACTIVE_LIMIT interactive jobs outstanding is moved to
+    standard; the priority is the number of the tenant's jobs already outstanding in
+    the queue. Best-effort: without Redis the job is queued as classified, at priority 0.
+    """
+    try:
+        client = _get_redis()
+        outstanding = client.hincrby(_key("outstanding", job.queue), job.tenant_id, 1)
+        if (
+            job.ingest_class == IngestClass.INTERACTIVE
+            and outstanding > SCHEDULING_SETTINGS.TENANT_INTERACTIVE_LIMIT
+        ):
+            client.hincrby(_key("outstanding", job.queue), job.tenant_id, -1)
+            job.ingest_class = IngestClass.STANDARD
+            outstanding = client.hincrby(_key("outstanding", job.queue), job.tenant_id, 1)
+        job.priority = min(SCHEDULING_SETTINGS.PRIORITY_LEVELS - 1, outstanding - 1)
+        job.enqueued_at = time.time()
+        pipe = client.pipeline()
+        pipe.expire(_key("outstanding", job.queue), SCHEDULING_SETTINGS.JOB_TTL)
+        pipe.hset(
+            _key("job", task_id),
+            mapping={
+                FileFormat.QUEUE.value: job.queue,
+                FileFormat.TENANT_ID.value: job.tenant_id,
+                FileFormat.CREATED_AT.value: job.enqueued_at,
+            },
+        )
+        pipe.expire(_key("job", task_id), SCHEDULING_SETTINGS.JOB_TTL)
+        pipe.hincrby(_key("queued"), job.queue, 1)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("Could not record ingestion job %s: %s", task_id, e)
+    return job
+
+
+def record_started(task_id: str):
+    """
+    Celery task_prerun: record how long a scheduled job waited in its queue (first start only).
+    """
+    try:
+        client = _get_redis()
+        record = client.hgetall(_key("job", task_id))
+        if not record or FileFormat.STARTED_AT.value in record:
+            return
+        now = time.time()
+        queue = record[FileFormat.QUEUE.value]
+        pipe = client.pipeline()
+        pipe.hset(_key("job", task_id), FileFormat.STARTED_AT.value, now)
+        pipe.lpush(_key("waits", queue), now - float(record[FileFormat.CREATED_AT.value]))
+        pipe.ltrim(_key("waits", queue), 0, SCHEDULING_SETTINGS.WAIT_SAMPLES - 1)
+        pipe.hincrby(_key("queued"), queue, -1)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("Could not record start of job %s: %s", task_id, e)
+
+
+def record_finished(task_id: str, state: Optional[str]):
+    """
+    Celery task_postrun: release the tenant's slot once the job will not run again.
+    """
+    if state not in _FINAL_STATES:
+        return
+    try:
+        client = _get_redis()
+        record = client.hgetall(_key("job", task_id))
+        if not record or not client.delete(_key("job", task_id)):
+            return
+        client.hincrby(
+            _key("outstanding", record[FileFormat.QUEUE.value]), record[FileFormat.TENANT_ID.value], -1
+        )
+    except redis.RedisError as e:
+        logger.warning("Could not record end of job %s: %s", task_id, e)
+
+
+def record_discarded(task_id: str):
+    """
+    Celery task_revoked/task_failure: release the job's tenant slot, and its place in the
+    queue if it never started, when it ends without a task_postrun (revoked while queued,
+    terminated, or failed before running). Whoever deletes the job record releases it, so
+    a job is never released twice.
+    """
+    try:
+        client = _get_redis()
+        record = client.hgetall(_key("job", task_id))
+        if not record or not client.delete(_key("job", task_id)):
+            return
+        queue = record[FileFormat.QUEUE.value]
+        pipe = client.pipeline()
+        pipe.hincrby(_key("outstanding", queue), record[FileFormat.TENANT_ID.value], -1)
+        if FileFormat.STARTED_AT.value not in record:
+            pipe.hincrby(_key("queued"), queue, -1)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("Could not record discarded job %s: %s", task_id, e)
+
+
+def queue_stats() -> dict:
+    """
+    Celery mode: per queue, the jobs waiting and running, outstanding jobs per tenant
+    and recent wait times.
+    """
+    client = _get_redis()
+    queued = client.hgetall(_key("queued"))
+    stats = {}
+    for ingest_class in CLASS_ORDER:
+        queue = queue_name(ingest_class)
+        waits = [float(w) for w in client.lrange(_key("waits", queue), 0, -1)]
+        tenants = {t: int(n) for t, n in client.hgetall(_key("outstanding", queue)).items() if int(n) > 0}
+        waiting = max(0, int(queued.get(queue, 0)))
+        stats[queue] = {
+            FileFormat.INGEST_CLASS.value: ingest_class.value,
+            FileFormat.QUEUED.value: waiting,
+            FileFormat.RUNNING.value: max(0, sum(tenants.values()) - waiting),
+            FileFormat.OUTSTANDING.value: tenants,
+            FileFormat.WAIT_SECONDS.value: wait_summary(waits),
+        }
+    return stats
@@ -0,0 +1,195 @@
+"""
+Shared OpenAI transport and request hedging.
+
+Every ChatOpenAI client in the process shares one keep-alive httpx pool with explicit
+timeouts. Calls are hedged: if the primary request has produced nothing by the hedge
+deadline (a high percentile of recent time-to-first-token), a backup request is sent to
+the fallback model, the first to respond wins and the other is cancelled. Callers may pass
+`may_hedge(prompt)`, which admits the backup request (a second admission slot, the token
+quota) and returns a callable releasing it, or None to skip the hedge.
+"""
+import time
+import asyncio
+import logging
+from collections import deque
+import httpx
+from langchain_openai import ChatOpenAI
+from app.constant import LLM_SETTINGS
+from app.core.stub_llm import StubChatModel
+
+logger = logging.getLogger(__name__)
+
+shared_async_http_client = httpx.AsyncClient(
+    timeout=httpx.Timeout(
+        connect=LLM_SETTINGS.CONNECT_TIMEOUT,
+        read=LLM_SETTINGS.READ_TIMEOUT,
+        write=LLM_SETTINGS.WRITE_TIMEOUT,
+        pool=LLM_SETTINGS.POOL_TIMEOUT,
+    ),
+    limits=httpx.Limits(
+        max_connections=LLM_SETTINGS.MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_SETTINGS.MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=LLM_SETTINGS.KEEPALIVE_EXPIRY,
+    ),
+)
+
+
+def build_chat_model(model: str, **kwargs) -> ChatOpenAI:
+    """
+    ChatOpenAI bound to the shared pool, with explicit timeouts and few SDK retries.
+    With LLM_PROVIDER=stub, the deterministic offline model is returned instead.
+    """
+    if LLM_SETTINGS.PROVIDER == "stub":
+        return StubChatModel(model)
+    return ChatOpenAI(
+        model=model,
+        http_async_client=shared_async_http_client,
+        timeout=LLM_SETTINGS.READ_TIMEOUT,
+        max_retries=LLM_SETTINGS.MAX_RETRIES,
+        **kwargs,
+    )
+
+
+# LatencyTracker keeps a sliding window of first-response latencies for one call type.
+class LatencyTracker:
+    def __init__(self, window=LLM_SETTINGS.LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, p: float):
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+    def hedge_delay(self) -> float:
+        if len(self._samples) < LLM_SETTINGS.HEDGE_MIN_SAMPLES:
+            return LLM_SETTINGS.HEDGE_INITIAL_DELAY
+        delay = self.percentile(LLM_SETTINGS.HEDGE_PERCENTILE)
+        return min(LLM_SETTINGS.HEDGE_MAX_DELAY, max(LLM_SETTINGS.HEDGE_MIN_DELAY, delay))
+
+
+async def _first_chunk(llm, prompt):
+    # Open a stream and wait for its first chunk; returns (iterator, first_chunk, latency)
+    started = time.monotonic()
+    stream = llm.astream(prompt).__aiter__()
+    try:
+        first = await stream.__anext__()
+    except StopAsyncIteration:
+        first = None
+    except BaseException:
+        await stream.aclose()
+        raise
+    return stream, first, time.monotonic() - started
+
+
+async def _invoke(llm, prompt):
+    started = time.monotonic()
+    result = await llm.ainvoke(prompt)
+    return None, result, time.monotonic() - started
+
+
+async def _cancel(task):
+    # Cancel a losing attempt and release its connection
+    if not task.done():
+        task.cancel()
+    try:
+        stream, _, _ = await task
+    except BaseException:
+        return
+    if stream is not None:
+        await stream.aclose()
+
+
+async def _race(start, primary, backup, prompt, tracker, label, may_hedge=None):
+    """
+    Run `start(primary)`, hedging with `start(backup)` after the tracker's deadline
+    (if `may_hedge` admits the backup request).
+    Returns the first successful (stream, first, latency); raises if every attempt fails.
+    """
+    primary_task = asyncio.ensure_future(start(primary, prompt))
+    backup_task = None
+    release = None
+    delay = tracker.hedge_delay()
+    try:
+        done, _ = await asyncio.wait({primary_task}, timeout=delay)
+        if not done and backup is not None and may_hedge is not None:
+            release = await may_hedge(prompt)
+            if release is None:
+                logger.info("[HEDGE] %s: backup request not admitted, waiting on the primary", label)
+                backup = None
+        if done or backup is None:
+            result = await primary_task
+            tracker.record(result[2])
+            return result
+
+        logger.info("[HEDGE] %s: no response after %.2fs, sending backup request", label, delay)
+        backup_task = asyncio.ensure_future(start(backup, prompt))
+        pending = {primary_task, backup_task}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    error = task.exception()
+                    continue
+                for other in pending:
+                    await _cancel(other)
+                result = task.result()
+                # Record the latency the user saw: a backup's own latency plus the hedge delay
+                tracker.record(result[2] if task is primary_task else delay + result[2])
+                logger.info(
+                    "[HEDGE] %s: %s won", label, "primary" if task is primary_task else "backup"
+                )
+                return result
+        raise error
+    except BaseException:
+        for task in (primary_task, backup_task):
+            if task is not None:
+                await _cancel(task)
+        raise
+    finally:
+        # One request is left in flight (or none); the caller's own slot covers it
+        if release is not None:
+            release()
+
+
+# HedgedChatModel pairs a primary model with a backup (same or fallback model).
+class HedgedChatModel:
+    def __init__(self, primary: ChatOpenAI, backup: ChatOpenAI = None, label: str = "llm"):
+        self.primary = primary
+        self.backup = backup if LLM_SETTINGS.HEDGE_ENABLED else None
+        self.label = label
+        self.latency = LatencyTracker()
+
+    async def ainvoke(self, prompt, may_hedge=None):
+        _, result, _ = await _race(
+            _invoke, self.primary, self.backup, prompt, self.latency, self.label, may_hedge
+        )
+        return result
+
+    async def astream(self, prompt, may_hedge=None):
+        stream, first, _ = await _race(
+            _first_chunk, self.primary, self.backup, prompt, self.latency, self.label, may_hedge
+        )
+        if first is None:
+            return
+        try:
+            yield first
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
+
+
+def build_hedged_model(model: str, label: str, **kwargs) -> HedgedChatModel:
+    """
+    Primary on `model`, hedged to LLM_SETTINGS.FALLBACK_MODEL.
+    """
+    return HedgedChatModel(
+        build_chat_model(model, **kwargs),
+        build_chat_model(LLM_SETTINGS.FALLBACK_MODEL, **kwargs),
+        label=label,
+    )
@@ -0,0 +1,168 @@
+"""
+Process-wide logging, configured once per process (API, Celery worker child, embedded pool
+worker, script).
+
+Loggers only put records on a bounded queue; a QueueListener thread formats them (JSON by
+default) and writes them to stderr and the log file. Nothing on the event loop or in an
+ingestion batch waits on I/O or string formatting: messages use %-style arguments that
+are merged in the listener thread, and a full queue drops records (counted) instead of
+blocking. High-frequency messages are rate-limited per (logger, level, template).
+"""
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, WatchedFileHandler
+from app.constant import DIRECTORY, LOGGING_SETTINGS
+
+# Attributes every LogRecord has; anything else was passed via `extra=` and is emitted as a field
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_state = {"pid": None, "listener": None}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: ts, level, logger, message, process, thread, extra fields,
+    and exc_info (the formatted traceback) when present.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.utcfromtimestamp(record.created).isoformat(timespec="milliseconds") + "Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        if record.stack_info:
+            entry["stack_info"] = record.stack_info
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Let at most `burst` records per (logger, level, message template) through every `window`
+    seconds. The first record of the next window carries a `suppressed` count.
+    ERROR and above are never limited.
+    """
+
+    def __init__(self, burst: int, window: float, max_keys: int = 10000):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+        self.windows = {}  # key -> [window start, passed, suppressed]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.ERROR:
+            return True
+        key = (record.name, record.levelno, str(record.msg))
+        now = time.monotonic()
+        with self.lock:
+            state = self.windows.get(key)
+            if state is None or now - state[0] >= self.window:
+                if state is None and len(self.windows) >= self.max_keys:
+                    self.windows.clear()
+                if state and state[2]:
+                    record.suppressed = state[2]
+                state = self.windows[key] = [now, 0, 0]
+            if state[1] >= self.burst:
+                state[2] += 1
+                return False
+            state[1] += 1
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler that defers message formatting to the listener and never blocks:
+    records that do not fit in the queue are dropped and reported on the next record.
+    Arguments are formatted in the listener thread, so log values, not objects that
+    are mutated right after the call.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._exc_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Tracebacks reference live frames; render them now and keep msg/args for the listener
+        if record.exc_info:
+            record.exc_text = self._exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        if self.dropped:
+            record.dropped = self.dropped
+        try:
+            self.queue.put_nowait(record)
+            self.dropped = 0
+        except queue.Full:
+            self.dropped += 1
+
+
+def _output_handlers():
+    if LOGGING_SETTINGS.FORMAT == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s")
+    os.makedirs(DIRECTORY.LOGS.value, exist_ok=True)
+    handlers = [
+        logging.StreamHandler(),
+        # Plain appends (safe across worker processes); rotation is left to logrotate
+        WatchedFileHandler(os.path.join(DIRECTORY.LOGS.value, LOGGING_SETTINGS.FILE_NAME)),
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+
+def configure_logging():
+    """
+    Route the root logger (and uvicorn's loggers) through the queue. Idempotent per process;
+    a forked child (Celery prefork) gets its own queue and listener, since the parent's
+    listener thread does not survive the fork.
+    """
+    if _state["pid"] == os.getpid():
+        return
+    log_queue = queue.Queue(maxsize=LOGGING_SETTINGS.QUEUE_SIZE)
+    handler = NonBlockingQueueHandler(log_queue)
+    handler.addFilter(RateLimitFilter(LOGGING_SETTINGS.RATE_LIMIT_BURST, LOGGING_SETTINGS.RATE_LIMIT_WINDOW))
+    listener = QueueListener(log_queue, *_output_handlers(), respect_handler_level=True)
+    listener.start()
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(LOGGING_SETTINGS.LEVEL)
+    # uvicorn installs its own synchronous handlers; send its records through the queue too
+    for name in LOGGING_SETTINGS.ROUTED_LOGGERS:
+        routed = logging.getLogger(name)
+        routed.handlers = []
+        routed.propagate = True
+
+    _state["pid"], _state["listener"] = os.getpid(), listener
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """
+    Flush queued records and stop the listener thread (called at exit).
+    """
+    listener = _state["listener"]
+    if listener is not None and _state["pid"] == os.getpid():
+        _state["listener"] = None
+        listener.stop()
@@ -0,0 +1,320 @@
+"""
+Opt-in wall-clock sampling profiler for chat requests and ingestion tasks.
+
+A single daemon thread samples the stacks of every active profile at a fixed interval
+(sys._current_frames, no tracing hooks), so nothing is paid when profiling is off and the
+cost while on does not depend on how deep or busy the profiled code is. Two kinds of
+targets are supported:
+  * a thread (Celery / embedded ingestion tasks run synchronously on one thread);
+  * asyncio tasks (a request handler and the task that drives its streamed response).
+    While such a task is suspended its await chain is recorded with an `[awaiting]` leaf,
+    so time spent waiting on OpenAI or the thread pool shows up in the profile too.
+
+Profiles are written as folded stacks ("frame;frame;frame count"), readable by
+flamegraph.pl and speedscope, under DIRECTORY.PROFILES.
+"""
+import os
+import re
+import sys
+import time
+import uuid
+import random
+import asyncio
+import logging
+import threading
+import functools
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Optional
+from starlette.responses import StreamingResponse
+from app.constant import DIRECTORY, PROFILING_SETTINGS
+from app.core.atomic_write import write_atomic
+
+logger = logging.getLogger("profiler")
+
+_PROFILE_DIR = DIRECTORY.PROFILES.value
+PROFILE_SUFFIX = ".folded"
+# Profile ids are generated here; anything else is rejected by the download endpoint
+PROFILE_NAME = re.compile(r"^[\w.-]+\.folded$")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    # Definition line (not the current line) so samples of one function merge
+    path = os.path.join(*code.co_filename.split(os.sep)[-2:])
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+
+def _thread_stack(frame, root=None) -> List[str]:
+    """
+    Frames from the thread's outermost frame (or from `root`, when it is on the stack) to `frame`.
+    """
+    stack = []
+    while frame is not None and len(stack) < PROFILING_SETTINGS.MAX_DEPTH:
+        stack.append(_frame_label(frame))
+        if frame is root:
+            break
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _coro_frame(coro):
+    return getattr(coro, "cr_frame", None) or getattr(coro, "ag_frame", None) or getattr(coro, "gi_frame", None)
+
+
+def _await_stack(coro) -> List[str]:
+    """
+    Walk a suspended coroutine's await chain (coroutines, async generators, generators).
+    """
+    stack = []
+    while coro is not None and len(stack) < PROFILING_SETTINGS.MAX_DEPTH:
+        frame = _coro_frame(coro)
+        if frame is None:
+            break
+        stack.append(_frame_label(frame))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "ag_await", None) or getattr(coro, "gi_yieldfrom", None)
+    stack.append("[awaiting]")
+    return stack
+
+
+class Profile:
+    """
+    Samples collected for one request or task, written to a .folded file by finish().
+    """
+
+    def __init__(self, kind: str, label: str):
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        safe_label = re.sub(r"[^\w-]", "_", label)[:64]
+        self.profile_id = f"{kind}-{stamp}-{safe_label}-{uuid.uuid4().hex[:6]}{PROFILE_SUFFIX}"
+        self.samples = Counter()
+        self.started = time.monotonic()
+        self.thread_ids = set()
+        self.tasks = {}  # asyncio.Task -> (label, coroutine or async generator sampled in it)
+        self.loop = None
+        self.loop_thread_id = None
+        self.finished = False
+
+    def add_thread(self, thread_id: int):
+        self.thread_ids.add(thread_id)
+
+    def add_task(self, task: asyncio.Task, label: str, coro=None):
+        """
+        Sample `task` from `coro` down (default: the task's own coroutine). Starlette drives
+        a response body through async-generator `asend` objects, which hide the generator
+        from an await-chain walk, so the stream is registered with its generator instead.
+        """
+        if self.loop is None:
+            self.loop = task.get_loop()
+            self.loop_thread_id = threading.get_ident()
+        self.tasks[task] = (label, coro or task.get_coro())
+
+    def remove_task(self, task: asyncio.Task):
+        self.tasks.pop(task, None)
+
+    def sample(self, frames: dict):
+        for thread_id in self.thread_ids:
+            frame = frames.get(thread_id)
+            if frame is not None:
+                self.samples[";".join(_thread_stack(frame))] += 1
+        if not self.tasks:
+            return
+        # Reading another thread's running task is a plain dict lookup
+        running = asyncio.current_task(self.loop)
+        for task, (label, coro) in list(self.tasks.items()):
+            root = _coro_frame(coro)
+            if task.done() or root is None:
+                continue
+            if task is running and self.loop_thread_id in frames:
+                stack = _thread_stack(frames[self.loop_thread_id], root)
+            else:
+                stack = _await_stack(coro)
+            self.samples[";".join([label] + stack)] += 1
+
+    def expired(self) -> bool:
+        return time.monotonic() - self.started > PROFILING_SETTINGS.MAX_DURATION
+
+    def finish(self) -> Optional[str]:
+        """
+        Stop sampling and write the profile. Returns its path (None if nothing was sampled).
+        """
+        if self.finished:
+            return None
+        self.finished = True
+        _sampler.remove(self)
+        if not self.samples:
+            return None
+        path = os.path.join(_PROFILE_DIR, self.profile_id)
+        write_atomic(path, "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common()))
+        elapsed = time.monotonic() - self.started
+        logger.info("Profile %s: %d samples over %.2fs", self.profile_id, sum(self.samples.values()), elapsed)
+        _prune()
+        return path
+
+
+class _Sampler:
+    """
+    One background thread sampling every active profile; it exits when none are left.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.profiles = set()
+        self.thread = None
+
+    def add(self, profile: Profile):
+        with self.lock:
+            self.profiles.add(profile)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+                self.thread.start()
+
+    def remove(self, profile: Profile):
+        with self.lock:
+            self.profiles.discard(profile)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while True:
+            with self.lock:
+                if not self.profiles:
+                    self.thread = None
+                    return
+                profiles = list(self.profiles)
+            frames = sys._current_frames()
+            frames.pop(own_id, None)
+            for profile in profiles:
+                if profile.expired():
+                    logger.warning("Profile %s hit MAX_DURATION; sampling stopped", profile.profile_id)
+                    self.remove(profile)
+                    continue
+                try:
+                    profile.sample(frames)
+                except Exception as e:  # never let a bad frame kill the sampler
+                    logger.debug("Profile sample failed: %s", e)
+            del frames
+            time.sleep(PROFILING_SETTINGS.INTERVAL)
+
+
+_sampler = _Sampler()
+
+
+def _prune():
+    # Keep the newest MAX_FILES profiles
+    names = list_profiles()
+    for info in names[PROFILING_SETTINGS.MAX_FILES :]:
+        try:
+            os.remove(os.path.join(_PROFILE_DIR, info["profile_id"]))
+        except FileNotFoundError:
+            pass
+
+
+def list_profiles() -> List[dict]:
+    """
+    Stored profiles, newest first: [{"profile_id", "size", "created_at"}].
+    """
+    if not os.path.isdir(_PROFILE_DIR):
+        return []
+    out = []
+    for name in os.listdir(_PROFILE_DIR):
+        if not PROFILE_NAME.match(name):
+            continue
+        stat = os.stat(os.path.join(_PROFILE_DIR, name))
+        out.append(
+            {
+                "profile_id": name,
+                "size": stat.st_size,
+                "created_at": datetime.utcfromtimestamp(stat.st_mtime).isoformat() + "Z",
+                "mtime": stat.st_mtime,
+            }
+        )
+    out.sort(key=lambda p: p.pop("mtime"), reverse=True)
+    return out
+
+
+def profile_path(profile_id: str) -> Optional[str]:
+    """
+    Path of a stored profile, or None if the id is invalid or unknown.
+    """
+    if not PROFILE_NAME.match(profile_id):
+        return None
+    path = os.path.join(_PROFILE_DIR, profile_id)
+    return path if os.path.isfile(path) else None
+
+
+def _sampled(rate: float) -> bool:
+    return rate > 0 and random.random() < rate
+
+
+@contextmanager
+def profile_thread(kind: str, label: str, enabled: bool = False):
+    """
+    Profile the current thread for the duration of the block when `enabled` (or when
+    picked by PROFILING_SETTINGS.TASK_SAMPLE_RATE). Yields the Profile, or None.
+    """
+    if not (enabled or _sampled(PROFILING_SETTINGS.TASK_SAMPLE_RATE)):
+        yield None
+        return
+    profile = Profile(kind, label)
+    profile.add_thread(threading.get_ident())
+    _sampler.add(profile)
+    try:
+        yield profile
+    finally:
+        profile.finish()
+
+
+def _requested(request) -> bool:
+    value = request.headers.get(PROFILING_SETTINGS.HEADER)
+    if value is not None:
+        token = PROFILING_SETTINGS.TOKEN
+        return value == token if token else value.lower() in ("1", "true", "yes")
+    return _sampled(PROFILING_SETTINGS.REQUEST_SAMPLE_RATE)
+
+
+async def _profiled_stream(profile: Profile, body_iterator):
+    # Register whichever task drives the response body (Starlette runs it separately)
+    profile.add_task(asyncio.current_task(), "stream", body_iterator)
+    try:
+        async for chunk in body_iterator:
+            yield chunk
+    finally:
+        profile.finish()
+
+
+def profile_request(kind: str):
+    """
+    Endpoint decorator: profile the request when it carries the profiling header (or is
+    picked by PROFILING_SETTINGS.REQUEST_SAMPLE_RATE), including a streamed response body.
+    The profile id is returned in the response's profiling header. Place it below
+    @limiter.limit so the endpoint keeps its `request` argument.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            request = kwargs.get("request")
+            if request is None or not _requested(request):
+                return await func(*args, **kwargs)
+            profile = Profile(kind, request.url.path.strip("/").replace("/", "_"))
+            task = asyncio.current_task()
+            profile.add_task(task, "request")
+            _sampler.add(profile)
+            try:
+                response = await func(*args, **kwargs)
+            except BaseException:
+                profile.finish()
+                raise
+            # From here the request task only waits on the response; the stream is sampled instead
+            profile.remove_task(task)
+            if isinstance(response, StreamingResponse):
+                response.body_iterator = _profiled_stream(profile, response.body_iterator)
+                response.headers[PROFILING_SETTINGS.HEADER] = profile.profile_id
+            else:
+                profile.finish()
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,156 @@
+import json
+import time
+import asyncio
+import logging
+import redis
+import redis.asyncio as aioredis
+from app.constant import PROGRESS_SETTINGS, EXECUTION_SETTINGS, FileFormat, ProgressStage
+from app.task_queue import is_embedded
+
+logger = logging.getLogger("ingest-progress")
+
+# Stages after which no further events are published for a task
+TERMINAL_STAGES = {ProgressStage.SUCCESS.value, ProgressStage.FAILURE.value}
+
+# One connection pool per worker process, shared by all publishers
+_redis = None
+
+
+def _get_redis():
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(PROGRESS_SETTINGS.REDIS_URL)
+    return _redis
+
+
+def _channel(task_id: str) -> str:
+    return f"{PROGRESS_SETTINGS.CHANNEL_PREFIX}{task_id}"
+
+
+def _state_key(task_id: str) -> str:
+    return f"{PROGRESS_SETTINGS.STATE_PREFIX}{task_id}"
+
+
+# ProgressPublisher is used inside an ingestion task to push progress events for its task_id.
+class ProgressPublisher:
+    def __init__(self, task_id: str):
+        self.task_id = task_id
+        self.counters = {
+            FileFormat.PAGES_PARSED.value: 0,
+            FileFormat.PAGES_TOTAL.value: None,
+            FileFormat.CHUNKS_EMBEDDED.value: 0,
+            FileFormat.CHUNKS_STORED.value: 0,
+        }
+        self._last_publish = 0.0
+
+    def update(self, stage: ProgressStage, force: bool = False, **fields):
+        """
+        Merge counters/fields into the task state and publish an event.
+        Non-terminal events are throttled to one per PROGRESS_SETTINGS.MIN_INTERVAL
+        so per-page updates on large documents stay cheap.
+        """
+        self.counters.update(fields)
+        now = time.monotonic()
+        if (
+            not force
+            and stage.value not in TERMINAL_STAGES
+            and now - self._last_publish < PROGRESS_SETTINGS.MIN_INTERVAL
+        ):
+            return
+        self._last_publish = now
+        self._publish(stage)
+
+    def on_page(self, parsed: int, total=None):
+        """
+        Callback for the file_parser chunk helpers; records pages parsed so far.
+        """
+        self.update(
+            ProgressStage.PARSING,
+            **{
+                FileFormat.PAGES_PARSED.value: parsed,
+                FileFormat.PAGES_TOTAL.value: total,
+            },
+        )
+
+    def _publish(self, stage: ProgressStage):
+        event = {
+            FileFormat.TASK_ID.value: self.task_id,
+            FileFormat.STAGE.value: stage.value,
+            **self.counters,
+        }
+        if is_embedded():
+            # No Redis in embedded mode: the task table holds the latest event
+            from app.services.task_store import task_store
+
+            task_store.set_progress(self.task_id, event)
+            return
+        payload = json.dumps(event)
+        try:
+            client = _get_redis()
+            pipe = client.pipeline()
+            pipe.set(_state_key(self.task_id), payload, ex=PROGRESS_SETTINGS.STATE_TTL)
+            pipe.publish(_channel(self.task_id), payload)
+            pipe.execute()
+        except redis.RedisError as e:
+            # Progress is best-effort; never fail ingestion because of it
+            logger.warning("Could not publish progress for task %s: %s", self.task_id, e)
+
+
+async def _poll_progress(task_id: str):
+    # Embedded mode: poll the task table, yielding each new latest event
+    from app.services.task_store import task_store
+    from starlette.concurrency import run_in_threadpool
+
+    last, idle = None, 0.0
+    while True:
+        raw = await run_in_threadpool(task_store.get_progress, task_id)
+        if raw and raw != last:
+            last, idle = raw, 0.0
+            event = json.loads(raw)
+            yield event
+            if event.get(FileFormat.STAGE.value) in TERMINAL_STAGES:
+                return
+        elif idle >= PROGRESS_SETTINGS.KEEPALIVE:
+            idle = 0.0
+            yield None
+        await asyncio.sleep(EXECUTION_SETTINGS.PROGRESS_POLL_INTERVAL)
+        idle += EXECUTION_SETTINGS.PROGRESS_POLL_INTERVAL
+
+
+async def subscribe_progress(task_id: str):
+    """
+    Async generator of progress events for a task.
+    Yields the latest stored event first (if any), then live events until a terminal stage.
+    Yields None when no event arrived within PROGRESS_SETTINGS.KEEPALIVE seconds,
+    so callers can emit keep-alives and check for client disconnects.
+    """
+    if is_embedded():
+        async for event in _poll_progress(task_id):
+            yield event
+        return
+    client = aioredis.Redis.from_url(PROGRESS_SETTINGS.REDIS_URL)
+    pubsub = client.pubsub()
+    # Subscribe before reading the stored state so no event falls in between
+    await pubsub.subscribe(_channel(task_id))
+    try:
+        latest = await client.get(_state_key(task_id))
+        if latest:
+            event = json.loads(latest)
+            yield event
+            if event.get(FileFormat.STAGE.value) in TERMINAL_STAGES:
+                return
+        while True:
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=PROGRESS_SETTINGS.KEEPALIVE
+            )
+            if message is None:
+                yield None
+                continue
+            event = json.loads(message["data"])
+            yield event
+            if event.get(FileFormat.STAGE.value) in TERMINAL_STAGES:
+                return
+    finally:
+        await pubsub.unsubscribe(_channel(task_id))
+        await pubsub.aclose()
+        await client.aclose()
@@ -1,7 +1,8 @@
 import os
 from dotenv import load_dotenv
 import app.constant as constant
-from app.constant import FILE_SETTINGS, ChatEnum, OpenEnum
+from app.constant import FILE_SETTINGS, ChatEnum, OpenEnum, LLMLane
+from app.core.admission import llm_admission
 
 # Load environment variables from .env file
 load_dotenv()
@@ -10,7 +11,7 @@ os.environ[FILE_SETTINGS.OPENAI_API_KEY] = os.getenv(FILE_SETTINGS.OPENAI_API_KE
 
 # fastapi-project/app/core/rag_agent.py
 # This file contains the RAG agent logic for processing user queries against document contexts.
-from langchain_openai import ChatOpenAI
+from app.core.llm_client import build_hedged_model
 from langchain.prompts import ChatPromptTemplate
 import logging
 
@@ -37,27 +38,46 @@ response_prompt = ChatPromptTemplate.from_messages(
     ]
 )
 
-# Relevance Agent (non-streaming)
-relevance_llm = ChatOpenAI(model=OpenEnum.GPT_4.value, temperature=0)
-# Response Agent (streaming)
-response_llm = ChatOpenAI(model=OpenEnum.GPT_4.value, temperature=0.2, streaming=True)
+# Relevance Agent (non-streaming), hedged to the fallback model on stragglers
+relevance_llm = build_hedged_model(OpenEnum.GPT_4.value, "relevance", temperature=0)
+# Response Agent (streaming), hedged on time-to-first-token
+response_llm = build_hedged_model(
+    OpenEnum.GPT_4.value, "answer", temperature=0.2, streaming=True
+)
+
+
+def _hedge_admission(charge=None):
+    # A hedge's backup request needs a second slot, taken only if one is free right now,
+    # and (with `charge`) the caller's token quota for its prompt
+    async def may_hedge(prompt):
+        if not llm_admission.try_acquire():
+            return None
+        if charge is not None and not await charge(prompt):
+            llm_admission.release()
+            return None
+        return llm_admission.release
+
+    return may_hedge
 
 
-async def is_question_relevant(context, question):
+async def is_question_relevant(context, question, charge_hedge=None):
     prompt_str = relevance_prompt.format(context=context, question=question)
-    result = await relevance_llm.ainvoke(prompt_str)
+    async with llm_admission.slot(LLMLane.RELEVANCE):
+        result = await relevance_llm.ainvoke(prompt_str, may_hedge=_hedge_admission(charge_hedge))
     output = result.content.strip().lower()
-    logger.info(f"Relevance agent output: {output}")
+    logger.info("Relevance agent output: %s", output)
     if output.startswith(ChatEnum.RELEVANT.value):
         return True
     return False
 
 
-async def stream_rag_response(context, question):
+async def stream_rag_response(context, question, charge_hedge=None):
     prompt_str = response_prompt.format(
         context=context,
         question=question,
         custom_prompt=constant.custom_prompt,  # <-- inject here!
     )
-    async for chunk in response_llm.astream(prompt_str):
-        yield chunk.content or ""
+    # The slot is held for the whole stream, so the cap bounds concurrent upstream streams
+    async with llm_admission.slot(LLMLane.ANSWER):
+        async for chunk in response_llm.astream(prompt_str, may_hedge=_hedge_admission(charge_hedge)):
+            yield chunk.content or ""
@@ -0,0 +1,278 @@
+"""
+Shared rate-limit storage.
+
+- SQLiteStorage registers the sqlite:// scheme with the `limits` library, so slowapi's
+  request limits are shared by every uvicorn worker on a node (redis:// is supported
+  by `limits` natively for multi-node deployments).
+- Token buckets (SQLite, Redis or in-memory) back the LLM token quotas. Every update is
+  a single atomic read-refill-consume step, so concurrent workers never over-spend.
+
+SQLite rows that no longer matter (ended windows, buckets refilled to capacity) are
+deleted by the writes themselves, at most once per LIMITER_SETTINGS.PRUNE_INTERVAL.
+"""
+import math
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from limits.storage import Storage
+from app.constant import LIMITER_SETTINGS
+
+
+def _sqlite_path(uri: str) -> str:
+    # sqlite:///relative.db or sqlite:////absolute/path.db
+    return uri.split("://", 1)[1][1:] or "rate_limits.db"
+
+
+class _SQLiteConnections:
+    """
+    One connection per thread, in autocommit mode so callers control transactions.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def get(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+
+# SQLiteStorage is a fixed-window counter store for slowapi/limits ("sqlite:///path.db").
+class SQLiteStorage(Storage):
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri: str = None, wrap_exceptions: bool = False, **options):
+        self._connections = _SQLiteConnections(_sqlite_path(uri or "sqlite:///"))
+        self._connections.get().execute(
+            "CREATE TABLE IF NOT EXISTS rate_counters ("
+            "key TEXT PRIMARY KEY, value INTEGER NOT NULL, expiry REAL NOT NULL)"
+        )
+        self._connections.get().execute(
+            "CREATE INDEX IF NOT EXISTS rate_counters_expiry ON rate_counters (expiry)"
+        )
+        self._next_prune = 0.0
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        conn = self._connections.get()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if now >= self._next_prune:
+                # Ended windows count as zero anyway; without this every client ever seen stays
+                conn.execute("DELETE FROM rate_counters WHERE expiry <= ?", (now,))
+                self._next_prune = now + LIMITER_SETTINGS.PRUNE_INTERVAL
+            row = conn.execute(
+                "SELECT value, expiry FROM rate_counters WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                value, window_end = amount, now + expiry
+            else:
+                value, window_end = row[0] + amount, row[1]
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_counters (key, value, expiry) VALUES (?, ?, ?)",
+                (key, value, window_end),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return value
+
+    def get(self, key: str) -> int:
+        row = self._connections.get().execute(
+            "SELECT value FROM rate_counters WHERE key = ? AND expiry > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key: str) -> float:
+        row = self._connections.get().execute(
+            "SELECT expiry FROM rate_counters WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else time.time()
+
+    def check(self) -> bool:
+        try:
+            self._connections.get().execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        cursor = self._connections.get().execute("DELETE FROM rate_counters")
+        return cursor.rowcount
+
+    def clear(self, key: str) -> None:
+        self._connections.get().execute("DELETE FROM rate_counters WHERE key = ?", (key,))
+
+
+# --------------------
+# Token buckets for weighted (LLM token) quotas
+# --------------------
+class TokenBucket(ABC):
+    """
+    Base for token-bucket stores. Backends implement _apply() as one atomic
+    refill-then-update step per key.
+    """
+
+    def consume(self, key: str, cost: float, capacity: float, rate: float):
+        """
+        Refill the bucket for elapsed time, then take `cost` tokens if available.
+        Returns (allowed, retry_after_seconds).
+        """
+        return self._apply(key, cost, capacity, rate, False)
+
+    def adjust(self, key: str, delta: float, capacity: float, rate: float):
+        """
+        Add (refund) or remove (charge) tokens unconditionally; the balance may go negative.
+        """
+        self._apply(key, -delta, capacity, rate, True)
+
+    @abstractmethod
+    def _apply(self, key, cost, capacity, rate, force):
+        """
+        Atomically refill the bucket and take `cost` tokens (always when `force`).
+        Returns (allowed, retry_after_seconds).
+        """
+
+    @staticmethod
+    def _step(tokens, updated, now, cost, capacity, rate, force):
+        # Shared refill/consume arithmetic; cost is clamped so one request can always fit a full bucket
+        tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+        cost = min(cost, capacity) if not force else cost
+        if force or tokens >= cost:
+            return tokens - cost, True, 0.0
+        return tokens, False, (cost - tokens) / rate
+
+
+class MemoryTokenBucket(TokenBucket):
+    """
+    Per-process buckets; only correct with a single worker (development and tests).
+    """
+
+    def __init__(self, uri: str = None):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _apply(self, key, cost, capacity, rate, force):
+        with self._lock:
+            now = time.time()
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens, allowed, retry_after = self._step(tokens, updated, now, cost, capacity, rate, force)
+            self._buckets[key] = (tokens, now)
+        return allowed, retry_after
+
+
+class SQLiteTokenBucket(TokenBucket):
+    """
+    Buckets in a local SQLite file, shared by every process on the node.
+    BEGIN IMMEDIATE takes the write lock before reading, making each update atomic.
+    """
+
+    def __init__(self, uri: str):
+        self._connections = _SQLiteConnections(_sqlite_path(uri))
+        self._connections.get().execute(
+            "CREATE TABLE IF NOT EXISTS token_buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        self._next_prune = 0.0
+
+    def _apply(self, key, cost, capacity, rate, force):
+        conn = self._connections.get()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            if now >= self._next_prune:
+                # A bucket refilled to capacity is the same as no row (like the Redis key's EXPIRE)
+                conn.execute(
+                    "DELETE FROM token_buckets WHERE tokens + (? - updated) * ? >= ?", (now, rate, capacity)
+                )
+                self._next_prune = now + LIMITER_SETTINGS.PRUNE_INTERVAL
+            row = conn.execute(
+                "SELECT tokens, updated FROM token_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens, allowed, retry_after = self._step(tokens, updated, now, cost, capacity, rate, force)
+            conn.execute(
+                "INSERT OR REPLACE INTO token_buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                (key, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, retry_after
+
+
+# Atomic refill/consume in Redis; uses the server clock so every node agrees on time
+_REDIS_BUCKET_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local force = tonumber(ARGV[4])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+if force == 0 then cost = math.min(cost, capacity) end
+local allowed = 0
+local retry_after = 0
+if force == 1 or tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+return {allowed, tostring(retry_after)}
+"""
+
+
+class RedisTokenBucket(TokenBucket):
+    """
+    Buckets in Redis, shared across nodes. Each update is one Lua script call.
+    """
+
+    def __init__(self, uri: str):
+        import redis
+
+        self._redis = redis.Redis.from_url(uri)
+        self._script = self._redis.register_script(_REDIS_BUCKET_SCRIPT)
+
+    def _apply(self, key, cost, capacity, rate, force):
+        allowed, retry_after = self._script(
+            keys=[f"token-bucket:{key}"], args=[capacity, rate, cost, int(force)]
+        )
+        return bool(allowed), float(retry_after)
+
+
+# Token-bucket backends by URI scheme; register new stores here
+TOKEN_BUCKET_BACKENDS = {
+    "memory": MemoryTokenBucket,
+    "sqlite": SQLiteTokenBucket,
+    "redis": RedisTokenBucket,
+    "rediss": RedisTokenBucket,
+}
+
+
+def token_bucket_from_uri(uri: str) -> TokenBucket:
+    scheme = uri.split("://", 1)[0]
+    if scheme not in TOKEN_BUCKET_BACKENDS:
+        raise ValueError(f"Unsupported token bucket storage: '{scheme}'")
+    return TOKEN_BUCKET_BACKENDS[scheme](uri)
+
+
+def retry_after_header(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
@@ -0,0 +1,209 @@
+import re
+import zlib
+import sqlite3
+import hashlib
+import logging
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from app.constant import SHARD_SETTINGS, RETENTION_SETTINGS, ShardStrategy
+from app.core import hnsw_params
+from app.core.store_locks import collection_lock
+
+logger = logging.getLogger("shard-router")
+
+
+# RouteCatalog records which collection holds each asset (SQLite, safe across API and worker processes).
+# Lookups are cached until the database changes, so routes moved or deleted by another
+# process (migration, deletion) are picked up on the next lookup.
+class RouteCatalog:
+    def __init__(self, path=SHARD_SETTINGS.ROUTES_DB):
+        self.path = path
+        self._cache: Dict[str, str] = {}
+        self._stamp = None
+        self._execute(
+            "CREATE TABLE IF NOT EXISTS asset_routes ("
+            "asset_id TEXT PRIMARY KEY, collection TEXT NOT NULL, tenant_id TEXT)"
+        )
+
+    def _execute(self, sql: str, params=()):
+        # Short-lived connection per call: safe from any thread or process
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def _check_cache(self):
+        # SQLite bumps the file change counter in the header (bytes 24-27) on every commit
+        # (rollback-journal mode, the default used here); reading it is much cheaper than a query
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(24)
+                stamp = f.read(4)
+        except FileNotFoundError:
+            stamp = None
+        if stamp != self._stamp:
+            self._cache.clear()
+            self._stamp = stamp
+
+    def get(self, asset_id: str) -> Optional[str]:
+        self._check_cache()
+        if asset_id in self._cache:
+            return self._cache[asset_id]
+        rows = self._execute(
+            "SELECT collection FROM asset_routes WHERE asset_id = ?", (asset_id,)
+        )
+        row = rows[0] if rows else None
+        if row:
+            self._cache[asset_id] = row[0]
+            return row[0]
+        return None
+
+    def put(self, asset_id: str, collection: str, tenant_id: Optional[str] = None):
+        self._execute(
+            "INSERT OR REPLACE INTO asset_routes (asset_id, collection, tenant_id) VALUES (?, ?, ?)",
+            (asset_id, collection, tenant_id),
+        )
+        self._cache[asset_id] = collection
+
+    def delete(self, asset_id: str):
+        self._execute("DELETE FROM asset_routes WHERE asset_id = ?", (asset_id,))
+        self._cache.pop(asset_id, None)
+
+    def clear(self):
+        self._execute("DELETE FROM asset_routes")
+        self._cache.clear()
+
+
+def _slug(value: str) -> str:
+    """
+    Make a value safe for a Chroma collection name (3-63 chars of [a-zA-Z0-9._-]).
+    Short values of [a-z0-9-] are kept as they are. Any other value (upper case included)
+    gets a readable prefix plus "." and a hash of the exact value; conforming values never
+    contain ".", so distinct values never map to the same name.
+    """
+    slug = re.sub(r"[^a-z0-9-]", "-", value.lower()).strip("-")
+    if not slug or len(slug) > 40 or slug != value:
+        slug = f"{slug[:20].rstrip('-')}.{hashlib.sha1(value.encode()).hexdigest()[:12]}"
+    return slug
+
+
+# ShardRouter maps assets to collections according to SHARD_SETTINGS.STRATEGY.
+class ShardRouter:
+    def __init__(
+        self,
+        client,
+        base_name: str,
+        strategy: str = SHARD_SETTINGS.STRATEGY,
+        routes_db: str = SHARD_SETTINGS.ROUTES_DB,
+        lock_dir: Optional[str] = None,
+    ):
+        self.client = client
+        self.base_name = base_name
+        self.strategy = ShardStrategy(strategy)
+        self.catalog = RouteCatalog(routes_db)
+        self.lock_dir = lock_dir  # See app.core.store_locks; None disables write locking
+
+    def shard_name(self, asset_id: str, tenant_id: Optional[str] = None) -> str:
+        """
+        Compute the collection a new asset should be written to.
+        """
+        if self.strategy == ShardStrategy.TENANT:
+            return f"{self.base_name}_t_{_slug(tenant_id or SHARD_SETTINGS.DEFAULT_TENANT)}"
+        if self.strategy == ShardStrategy.ASSET_HASH:
+            bucket = zlib.crc32(asset_id.encode()) % SHARD_SETTINGS.HASH_BUCKETS
+            return f"{self.base_name}_b_{bucket:02d}"
+        if self.strategy == ShardStrategy.ASSET:
+            return f"{self.base_name}_a_{_slug(asset_id)}"
+        return self.base_name
+
+    def is_asset_collection(self, name: str) -> bool:
+        """
+        True for a collection of the asset strategy, which holds a single asset.
+        """
+        return name.startswith(f"{self.base_name}_a_")
+
+    @contextmanager
+    def write_lock(self, name: str):
+        """
+        Hold a collection's cross-process write lock (compaction holds it for a whole rebuild).
+        """
+        if not self.lock_dir:
+            yield
+            return
+        with collection_lock(self.lock_dir, name):
+            yield
+
+    @contextmanager
+    def writing(self, name: str):
+        """
+        Yield a collection for writing (created if missing), with its write lock held.
+        """
+        with self.write_lock(name):
+            yield self.get_collection(name, create=True)
+
+    def get_collection(self, name: str, create: bool = False):
+        """
+        Return a collection, or None if it does not exist. Only writers pass create=True;
+        reads never create collections. Not cached: compaction in another process may
+        replace a collection at any time.
+        """
+        try:
+            return self.client.get_collection(name)
+        except ValueError:
+            pass
+        # Missing while compaction swaps the rebuilt copy in: wait for the swap to finish
+        with self.write_lock(name):
+            try:
+                return self.client.get_collection(name)
+            except ValueError:
+                if not create:
+                    return None
+                # New collection: its index is built with the configured HNSW parameters
+                return self.client.create_collection(
+                    name, metadata=hnsw_params.index_metadata(self.params_for(name))
+                )
+
+    def params_for(self, name: str) -> dict:
+        """
+        HNSW parameters (and k) of one of this router's collections.
+        """
+        return hnsw_params.params_for(name, self.base_name)
+
+    def route_for_write(self, asset_id: str, tenant_id: Optional[str] = None) -> str:
+        """
+        Return the name of the collection an asset's chunks go to, recording the route on
+        first write. An asset that already has a route keeps it, so retries never split an asset.
+        """
+        name = self.catalog.get(asset_id)
+        if not name:
+            name = self.shard_name(asset_id, tenant_id)
+            self.catalog.put(asset_id, name, tenant_id)
+        return name
+
+    def route_of(self, asset_id: str) -> str:
+        """
+        Return the name of the collection holding an asset. Assets without a route
+        predate sharding and live in the base collection.
+        """
+        return self.catalog.get(asset_id) or self.base_name
+
+    def collection_for_asset(self, asset_id: str):
+        """
+        Return the collection holding an asset, or None if there is none (unknown asset).
+        """
+        return self.get_collection(self.route_of(asset_id))
+
+    def collections(self) -> List:
+        """
+        Return every shard collection (including the base one), for cross-shard listing.
+        """
+        names = [
+            c.name
+            for c in self.client.list_collections()
+            if (c.name == self.base_name or c.name.startswith(f"{self.base_name}_"))
+            and not c.name.endswith((RETENTION_SETTINGS.COMPACT_SUFFIX, RETENTION_SETTINGS.REPLACED_SUFFIX))
+        ]
+        collections = (self.get_collection(name) for name in sorted(names))
+        return [c for c in collections if c is not None]
@@ -0,0 +1,79 @@
+"""
+Cross-process locks on the Chroma store (API, Celery workers and scripts share one
+persist directory on a node).
+
+- Collection locks: held by writers for each write and by compaction for a whole rebuild,
+  so no write lands in a collection while it is being copied and swapped.
+- Client registrations: each process holds a lock file for as long as it has the store
+  open, so compaction can tell whether VACUUM would run under other clients.
+
+OS file locks (filelock) are released when their holder dies, so a crashed process never
+leaves a lock behind.
+"""
+import os
+import logging
+from contextlib import contextmanager
+from filelock import FileLock, Timeout
+from app.constant import RETENTION_SETTINGS
+
+logger = logging.getLogger("store-locks")
+
+_clients = {}  # persist directory -> this process's registration lock
+
+
+def lock_dir(persist_directory: str) -> str:
+    return os.path.join(os.path.abspath(persist_directory), RETENTION_SETTINGS.LOCK_DIR)
+
+
+@contextmanager
+def collection_lock(directory: str, name: str):
+    """
+    Exclusive lock on one collection, re-entrant within a thread.
+    """
+    os.makedirs(directory, exist_ok=True)
+    with FileLock(os.path.join(directory, f"{name}.lock"), is_singleton=True):
+        yield
+
+
+def _clients_dir(persist_directory: str) -> str:
+    return os.path.join(lock_dir(persist_directory), "clients")
+
+
+def register_client(persist_directory: str):
+    """
+    Record that this process has the store open, until it exits.
+    """
+    key = os.path.abspath(persist_directory)
+    if key in _clients:
+        return
+    directory = _clients_dir(persist_directory)
+    os.makedirs(directory, exist_ok=True)
+    lock = FileLock(os.path.join(directory, f"{os.getpid()}.lock"))
+    lock.acquire()
+    _clients[key] = lock
+
+
+def other_clients(persist_directory: str) -> int:
+    """
+    Count the other live processes with the store open; removes registrations of dead ones.
+    """
+    directory = _clients_dir(persist_directory)
+    if not os.path.isdir(directory):
+        return 0
+    count = 0
+    for name in os.listdir(directory):
+        if name == f"{os.getpid()}.lock":
+            continue
+        path = os.path.join(directory, name)
+        lock = FileLock(path)
+        try:
+            lock.acquire(timeout=0)
+        except Timeout:
+            count += 1
+            continue
+        lock.release()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    return count
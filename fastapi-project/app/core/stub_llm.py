@@ -0,0 +1,47 @@
+"""
+Deterministic offline chat model (LLM_PROVIDER=stub) for local runs and tests.
+
+It mirrors the small part of the LangChain chat-model interface the app uses
+(invoke / ainvoke / astream returning objects with `.content`) and answers from the
+prompt itself: relevance checks say "relevant", list requests get the first sentences
+as bullets, and everything else gets the first words of the last CONTEXT/TEXT section.
+"""
+import re
+import asyncio
+from dataclasses import dataclass
+from app.constant import LLM_SETTINGS
+
+_SECTION = re.compile(r"(?:CONTEXT|TEXT):\n(.*?)(?:\n\n(?:QUESTION|ANSWER):|\Z)", re.S)
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+
+@dataclass
+class StubMessage:
+    content: str
+
+
+class StubChatModel:
+    def __init__(self, model: str = "stub", **kwargs):
+        self.model_name = model
+
+    def _reply(self, prompt) -> str:
+        prompt = str(prompt)
+        if "respond with 'relevant'" in prompt:
+            return "relevant"
+        sections = _SECTION.findall(prompt)
+        text = " ".join((sections[-1] if sections else prompt).split())
+        if "one per line" in prompt:
+            sentences = [s for s in _SENTENCE.split(text) if s][: LLM_SETTINGS.STUB_LIST_ITEMS]
+            return "\n".join(f"- {' '.join(s.split()[:12])}" for s in sentences)
+        return " ".join(text.split()[: LLM_SETTINGS.STUB_MAX_WORDS])
+
+    def invoke(self, prompt, **kwargs) -> StubMessage:
+        return StubMessage(self._reply(prompt))
+
+    async def ainvoke(self, prompt, **kwargs) -> StubMessage:
+        return self.invoke(prompt)
+
+    async def astream(self, prompt, **kwargs):
+        for word in self._reply(prompt).split(" "):
+            await asyncio.sleep(LLM_SETTINGS.STUB_TOKEN_DELAY)
+            yield StubMessage(word + " ")
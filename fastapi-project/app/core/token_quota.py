@@ -0,0 +1,92 @@
+"""
+Per-client LLM token quotas.
+
+A message reserves its estimated cost (prompt tokens for the relevance and answer calls
+plus a completion allowance) before any OpenAI call is made, and the reservation is
+settled against the real answer length once the stream finishes.
+"""
+import asyncio
+import logging
+from functools import lru_cache
+from app.constant import LIMITER_SETTINGS
+from app.core.rate_limit import token_bucket_from_uri
+
+logger = logging.getLogger(__name__)
+
+token_bucket = token_bucket_from_uri(LIMITER_SETTINGS.STORAGE_URI)
+
+
+class TokenQuotaExceeded(Exception):
+    def __init__(self, client_key: str, cost: int, retry_after: float):
+        super().__init__(f"Token quota of {client_key} exceeded: needs {cost} tokens")
+        self.client_key = client_key
+        self.cost = cost
+        self.retry_after = retry_after
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(LIMITER_SETTINGS.TOKEN_ENCODING)
+    except Exception as e:
+        logger.warning("tiktoken unavailable, estimating tokens from length: %s", e)
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4 + 1  # ~4 characters per token for English text
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def estimate_message_cost(context: str, question: str) -> dict:
+    """
+    Estimate the tokens one send_message spends: the context and question go to both
+    the relevance and the answer call, and the answer is budgeted at
+    COMPLETION_TOKEN_ESTIMATE until its real length is known.
+    """
+    prompt = estimate_tokens(context) + estimate_tokens(question)
+    return {
+        "relevance": prompt,
+        "answer": prompt + LIMITER_SETTINGS.COMPLETION_TOKEN_ESTIMATE,
+    }
+
+
+def reserve_tokens(client_key: str, cost: int):
+    """
+    Take `cost` tokens from the client's bucket. Returns (allowed, retry_after_seconds).
+    """
+    return token_bucket.consume(
+        client_key,
+        cost,
+        LIMITER_SETTINGS.TOKEN_BUCKET_CAPACITY,
+        LIMITER_SETTINGS.TOKEN_REFILL_PER_SECOND,
+    )
+
+
+def settle_tokens(client_key: str, reserved: int, spent: int):
+    """
+    Refund (or charge) the difference between the reservation and the real spend.
+    """
+    delta = reserved - spent
+    if delta:
+        token_bucket.adjust(
+            client_key,
+            delta,
+            LIMITER_SETTINGS.TOKEN_BUCKET_CAPACITY,
+            LIMITER_SETTINGS.TOKEN_REFILL_PER_SECOND,
+        )
+
+
+async def reserve_hedge(client_key: str, prompt: str) -> bool:
+    """
+    Charge a hedge's backup request (its prompt again) to the client, in full.
+    False when the quota cannot cover it; the hedge is then skipped.
+    """
+    allowed, _ = await asyncio.to_thread(reserve_tokens, client_key, estimate_tokens(prompt))
+    return allowed
@@ -2,29 +2,258 @@
 Celery document processing task for RAG chatbot backend.
 Handles file validation, chunking, embedding, and storage in ChromaDB.
 
+run_ingestion holds the runner-independent logic, shared by the Celery task and the embedded executor.
+
 This task is designed to be robust, maintainable, and easy for new developers to understand and extend.
 """
 import logging
 from app.celery_app import celery_app
-from app.core.file_parser import FileParser
-from app.core.embedder import Embedder
+from app.core.file_parser import FileParser, units_to_chunks
+from app.core import ingest_scheduler
+from app.core.embedder import get_embedder
+from app.core.embedding_versions import active_version, write_versions, known_versions
 from app.core.db_client import ChromaDBClient
+from app.core.progress import ProgressPublisher
+from app.core.profiler import profile_thread
+from app.services.parse_cache import hash_file, iter_units, load_units, save_units
+from app.services.split_ingest import (
+    should_split,
+    parse_ranges,
+    chunk_ranges,
+    parse_range,
+    save_part_units,
+    load_part_units,
+    save_part_texts,
+    load_part_texts,
+    save_part_vectors,
+    load_part_vectors,
+    remove_spool,
+)
+from app.services.asset_summary import build_summary
+from app.task_queue import is_embedded, dispatch_task
+from app.services.ingest_checkpoint import (
+    load_checkpoint,
+    save_checkpoint,
+    clear_checkpoint,
+)
+from celery import chord, group
+from celery.exceptions import SoftTimeLimitExceeded
 import os
 import uuid
+import random
 from datetime import datetime
-from app.constant import FileType, FileFormat, FILE_SETTINGS
+from app.constant import (
+    FileFormat,
+    FILE_SETTINGS,
+    CELERY_SETTINGS,
+    EXECUTION_SETTINGS,
+    SUMMARY_SETTINGS,
+    ProgressStage,
+)
 
 # Set up logger for Celery tasks
 logger = logging.getLogger("celery-task")
 
-# Initialize embedder and database client once per worker process
-embedder = Embedder()
+# Initialize the active embedder and database client once per worker process
+get_embedder(active_version())
 chroma_client = ChromaDBClient()
-import app.core.file_parser as file_parser
+
+# Errors that will fail the same way on every attempt (bad path, unsupported or corrupt input)
+PERMANENT_ERRORS = (ValueError, FileNotFoundError)
+
+
+def stable_asset_id(task_id: str) -> str:
+    """
+    Derive the asset_id from the Celery task id.
+    Retries keep their task id, so every attempt writes to the same asset.
+    """
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"ingest:{task_id}"))
+
+
+def retry_countdown(exc: Exception, retries: int) -> int:
+    """
+    Backoff in seconds for a retryable error, chosen by error class.
+    Time-limit hits resume almost immediately from the checkpoint; errors that say when
+    to come back (LLM admission, token quota) wait at least that long; everything else
+    (broker, ChromaDB, I/O) backs off exponentially with jitter.
+    """
+    if isinstance(exc, SoftTimeLimitExceeded):
+        return CELERY_SETTINGS.RETRY_TIME_LIMIT_COUNTDOWN
+    base = CELERY_SETTINGS.RETRY_BACKOFF_BASE
+    retry_after = getattr(exc, "retry_after", None)
+    if retry_after is not None:
+        return int(retry_after + random.uniform(0, base)) + 1
+    return int(min(CELERY_SETTINGS.RETRY_BACKOFF_MAX, base * 2**retries + random.uniform(0, base)))
+
+
+class RetryIngestion(Exception):
+    """
+    Raised by run_ingestion when an attempt failed but should be retried after `countdown` seconds.
+    """
+
+    def __init__(self, exc: Exception, countdown: int, max_retries: int):
+        super().__init__(f"{exc}")
+        self.exc = exc
+        self.countdown = countdown
+        self.max_retries = max_retries
+
+
+def ingest_metadata(normalized_path, ext, content_hash, tenant_id=None, ingested_at=None):
+    """
+    Metadata stored with every chunk of an asset, for traceability and search.
+    """
+    statinfo = os.stat(normalized_path)
+    metadata = {
+        FileFormat.FILE_NAME.value: os.path.basename(normalized_path),
+        FileFormat.FILE_TYPE.value: ext,
+        FileFormat.CREATED_AT.value: f"{datetime.utcfromtimestamp(statinfo.st_ctime).isoformat()}Z",
+        FileFormat.FILE_SIZE.value: statinfo.st_size,
+        FileFormat.INGESTED_AT.value: ingested_at or datetime.utcnow().isoformat() + "Z",
+        FileFormat.CONTENT_HASH.value: content_hash,
+        FileFormat.FILE_PATH.value: normalized_path,
+    }
+    if tenant_id:
+        metadata[FileFormat.TENANT_ID.value] = tenant_id
+    return metadata
+
+
+def abandon_ingestion(asset_id, progress, error):
+    """
+    Give up on an asset: remove its partial chunks, checkpoint and split spool, and report failure.
+    """
+    for version in known_versions():
+        chroma_client.delete_asset(asset_id, version=version)
+    clear_checkpoint(asset_id)
+    remove_spool(asset_id)
+    progress.update(ProgressStage.FAILURE, force=True, **{FileFormat.ERROR.value: error})
+
+
+def run_ingestion(task_id, file_path, content_hash=None, tenant_id=None, retries=0, max_retries=3):
+    """
+    One ingestion attempt for `task_id`, independent of the task runner (Celery or embedded).
+    Returns the asset_id. Raises RetryIngestion when the attempt should be retried;
+    permanent errors and exhausted retries remove partial chunks and re-raise.
+    """
+    progress = ProgressPublisher(task_id)
+    # Stable across retries of this task, so checkpoints and chunk ids line up
+    asset_id = stable_asset_id(task_id)
+    checkpoint = load_checkpoint(asset_id) or {}
+    committed = checkpoint.get(FileFormat.COMMITTED_CHUNKS.value, 0)
+    committed_at_start = committed
+    try:
+        logger.info(
+            "Processing document: %s (asset_id=%s, resume_from=%d)", file_path, asset_id, committed
+        )
+        progress.update(ProgressStage.STARTED, force=True)
+        # Validate the file path and get extension
+        normalized_path, ext = FileParser.validate_path(file_path)
+
+        # The content hash keys the parse cache, so re-indexing never needs the original file
+        content_hash = content_hash or hash_file(normalized_path)
+        metadata = ingest_metadata(
+            normalized_path, ext, content_hash, tenant_id, checkpoint.get(FileFormat.INGESTED_AT.value)
+        )
+
+        # Vectors go to the active embedding version, and to the target one during a migration
+        versions = write_versions()
+        embedder = get_embedder(versions[0])
+
+        # Drop any chunks past the checkpoint (a batch that was written but never recorded)
+        for version in versions:
+            chroma_client.delete_asset(asset_id, from_idx=committed, version=version)
+
+        chunk_size = FILE_SETTINGS.CHUNK_SIZE_WORDS  # Number of words per chunk; adjust for your model
+
+        chunks = []
+
+        def commit_batch():
+            # Embed the pending batch in one call, store it, then record it so a retry resumes after it
+            nonlocal committed, chunks
+            if not chunks:
+                return
+            embeddings = embedder.encode(chunks)  # float32 (n, dim), converted once at the store
+            progress.update(
+                ProgressStage.EMBEDDING,
+                **{FileFormat.CHUNKS_EMBEDDED.value: committed + len(chunks)},
+            )
+            progress.update(ProgressStage.STORING)
+            chroma_client.store(
+                asset_id,
+                embeddings,
+                chunks,
+                metadata,
+                start_idx=committed,
+                tenant_id=tenant_id,
+                version=versions[0],
+            )
+            for version in versions[1:]:
+                # Dual-write: embed the same chunks with the target version's model
+                chroma_client.store(
+                    asset_id,
+                    get_embedder(version).encode(chunks),
+                    chunks,
+                    metadata,
+                    start_idx=committed,
+                    tenant_id=tenant_id,
+                    version=version,
+                )
+            committed += len(chunks)
+            save_checkpoint(
+                asset_id,
+                committed,
+                **{
+                    FileFormat.TASK_ID.value: task_id,
+                    FileFormat.FILE_PATH.value: normalized_path,
+                    FileFormat.INGESTED_AT.value: metadata[FileFormat.INGESTED_AT.value],
+                },
+            )
+            progress.update(
+                ProgressStage.STORING, **{FileFormat.CHUNKS_STORED.value: committed}
+            )
+            chunks = []
+
+        # Chunk the document (parsed text comes from the cache when this content was seen before)
+        # and embed it batch by batch; chunks before the checkpoint are skipped
+        units = iter_units(normalized_path, ext, content_hash, on_page=progress.on_page)
+        for idx, chunk in enumerate(
+            units_to_chunks(units, chunk_size, FILE_SETTINGS.CHUNK_OVERLAP)
+        ):
+            if idx < committed:
+                continue
+            chunks.append(chunk)
+            if len(chunks) >= CELERY_SETTINGS.CHECKPOINT_BATCH_SIZE:
+                commit_batch()
+        commit_batch()
+
+        clear_checkpoint(asset_id)
+        progress.update(
+            ProgressStage.SUCCESS,
+            **{
+                FileFormat.CHUNKS_STORED.value: committed,
+                FileFormat.ASSET_ID.value: asset_id,
+            },
+        )
+        logger.info("Document processed and stored with asset_id: %s", asset_id)
+        if SUMMARY_SETTINGS.ENABLED:
+            queue_summary(asset_id)
+        return asset_id
+    except Exception as e:
+        logger.error("Error processing document: %s", e)
+        permanent = isinstance(e, PERMANENT_ERRORS)
+        if isinstance(e, SoftTimeLimitExceeded) and committed > committed_at_start:
+            # The attempt made progress before the time limit; don't count it against the budget,
+            # up to a hard cap so a file that never finishes cannot retry forever
+            max_retries = min(retries + 1, CELERY_SETTINGS.MAX_TOTAL_RETRIES)
+        if permanent or retries >= max_retries:
+            # Give up: remove partial chunks so no orphaned asset is left behind
+            abandon_ingestion(asset_id, progress, str(e))
+            raise
+        progress.update(ProgressStage.RETRY, force=True, **{FileFormat.ERROR.value: str(e)})
+        raise RetryIngestion(e, retry_countdown(e, retries), max_retries)
 
 
 @celery_app.task(bind=True, max_retries=3, default_retry_delay=60)
-def process_document_task(self, file_path):
+def process_document_task(self, file_path, content_hash=None, tenant_id=None, profile=False):
     """
     Celery task to process a document for RAG ingestion.
     Steps:
@@ -32,55 +261,443 @@ def process_document_task(self, file_path):
         2. Extract file metadata.
         3. Chunk the file using the appropriate parser.
         4. Generate embeddings for each chunk.
-        5. Store embeddings, chunks, and metadata in ChromaDB.
+        5. Store embeddings, chunks, and metadata in ChromaDB in checkpointed batches.
+    Progress (pages parsed, chunks embedded, chunks stored) is published
+    per task_id and can be followed via /api/documents/progress/{task_id}.
+    Ingestion is idempotent across retries: the asset_id is derived from the task id,
+    chunk ids are deterministic, and a retry skips embedding chunks already committed.
     Args:
         self: Celery task instance (for retries).
         file_path (str): Path to the document to process.
+        content_hash (str, optional): SHA-256 of the file, when computed at upload time.
+        tenant_id (str, optional): Tenant owning the document; used for collection sharding.
+        profile (bool, optional): Record a sampling profile of each attempt (see /api/profiles).
     Returns:
         str: Asset ID of the stored document in ChromaDB.
     Raises:
-        Retries on failure, logs errors.
+        Retries transient failures with backoff per error class; permanent errors
+        and exhausted retries remove partial chunks and re-raise.
+    Files above SPLIT_SETTINGS thresholds are instead replaced by a split ingestion
+    (see split_ingestion), whose commit step returns the asset ID under the same task id.
     """
+    if not self.request.retries:
+        # Very large files fan out to parse/embed subtasks; the last one finishes under this task id
+        queue = (self.request.delivery_info or {}).get("routing_key")
+        try:
+            split = split_ingestion(self.request.id, file_path, content_hash, tenant_id, profile, queue)
+        except Exception as e:
+            # Nothing is stored yet; the retry runs as a single-task ingestion, which applies
+            # the usual retry budget and removes partial data if it finally fails
+            logger.warning("Could not plan split ingestion of %s: %s", file_path, e)
+            remove_spool(stable_asset_id(self.request.id))
+            countdown = 0 if isinstance(e, PERMANENT_ERRORS) else retry_countdown(e, 0)
+            raise self.retry(exc=e, countdown=countdown)
+        if split is not None:
+            return self.replace(split)
+    try:
+        with profile_thread("ingest", self.request.id, enabled=profile):
+            return run_ingestion(
+                self.request.id, file_path, content_hash, tenant_id, self.request.retries, self.max_retries
+            )
+    except RetryIngestion as r:
+        raise self.retry(exc=r.exc, countdown=r.countdown, max_retries=r.max_retries)
+
+
+def process_document_embedded(
+    task_id, file_path, content_hash=None, tenant_id=None, profile=False,
+    retries=0, max_retries=EXECUTION_SETTINGS.MAX_RETRIES,
+):
+    """
+    One ingestion attempt in the embedded executor (no Celery), with the same backoff
+    and retry budget as the Celery task: a transient failure raises RetryIngestion and
+    the executor runs the task again once its countdown has passed, like apply_async.
+    """
+    with profile_thread("ingest", task_id, enabled=profile):
+        return run_ingestion(task_id, file_path, content_hash, tenant_id, retries, max_retries)
+
+
+# --------------------
+# Split ingestion: very large files are parsed and embedded by parallel subtasks
+# parse_part_task x N -> plan_embed_task -> embed_part_task x M -> commit_split_task
+# Parts are spooled to split_spool/<asset_id>/ and committed in chunk order by one task,
+# so ChromaDB has a single writer and chunk_idx matches what run_ingestion would produce.
+# --------------------
+
+
+def split_ingestion(task_id, file_path, content_hash=None, tenant_id=None, profile=False, queue=None):
+    """
+    Celery signature that ingests a very large file with parallel subtasks, or None when
+    the file should go through run_ingestion (embedded mode, small or invalid file, or an
+    attempt that already committed chunks). Subtasks run on `queue` (the job's queue).
+    """
+    if is_embedded():
+        return None
+    asset_id = stable_asset_id(task_id)
     try:
-        logger.info(f"Processing document: {file_path}")
-        # Validate the file path and get extension
         normalized_path, ext = FileParser.validate_path(file_path)
+        if load_checkpoint(asset_id) or not should_split(normalized_path, ext):
+            return None
+    except (ValueError, OSError):
+        return None
+    content_hash = content_hash or hash_file(normalized_path)
+    job = {
+        FileFormat.TASK_ID.value: task_id,
+        FileFormat.ASSET_ID.value: asset_id,
+        FileFormat.FILE_PATH.value: normalized_path,
+        FileFormat.FILE_TYPE.value: ext,
+        FileFormat.CONTENT_HASH.value: content_hash,
+        FileFormat.TENANT_ID.value: tenant_id,
+        FileFormat.METADATA.value: ingest_metadata(normalized_path, ext, content_hash, tenant_id),
+        # Resolved once, so every part embeds with the same models
+        FileFormat.VERSIONS.value: write_versions(),
+        FileFormat.QUEUE.value: queue,
+        FileFormat.PROFILE.value: profile,
+    }
+    ProgressPublisher(task_id).update(ProgressStage.STARTED, force=True)
+    cached = load_units(content_hash)
+    if cached is not None:
+        logger.info(
+            "Split ingestion of %s (asset_id=%s) from the parse cache", normalized_path, asset_id
+        )
+        workflow = embed_phase(job, cached)
+    else:
+        ranges = parse_ranges(normalized_path, ext)
+        logger.info(
+            "Split ingestion of %s (asset_id=%s): %d parse parts", normalized_path, asset_id, len(ranges)
+        )
+        workflow = chord(
+            group(
+                parse_part_task.si(job, part, part_range).set(queue=queue)
+                for part, part_range in enumerate(ranges)
+            ),
+            plan_embed_task.s(job).set(queue=queue),
+        )
+    # Runs (old-style, with the task id) if any part or the commit finally fails
+    workflow.link_error(abort_split_task.s())
+    return workflow
+
+
+def embed_phase(job, units):
+    """
+    Chunk `units` once, spool each embed part's chunk texts, and return the chord of embed
+    subtasks followed by the ordered commit.
+    """
+    chunks = list(units_to_chunks(units, FILE_SETTINGS.CHUNK_SIZE_WORDS, FILE_SETTINGS.CHUNK_OVERLAP))
+    if not chunks:
+        raise ValueError("No text found for embedding.")
+    ranges = chunk_ranges(len(chunks))
+    for part, (start, end) in enumerate(ranges):
+        save_part_texts(job[FileFormat.ASSET_ID.value], part, chunks[start:end])
+    job = {**job, FileFormat.UNITS.value: len(units)}
+    queue = job[FileFormat.QUEUE.value]
+    return chord(
+        group(embed_part_task.si(job, part).set(queue=queue) for part in range(len(ranges))),
+        commit_split_task.s(job).set(queue=queue),
+    )
+
+
+def _split_part(task, job, stage, part, work):
+    # Run one part with the usual retry policy; permanent errors fail the whole split
+    task_id = job[FileFormat.TASK_ID.value]
+    try:
+        with profile_thread("ingest", f"{task_id}.{stage}{part}", enabled=job[FileFormat.PROFILE.value]):
+            return work()
+    except PERMANENT_ERRORS:
+        raise
+    except Exception as e:
+        logger.warning("Split %s part %d of task %s failed: %s", stage, part, task_id, e)
+        raise task.retry(exc=e, countdown=retry_countdown(e, task.request.retries))
+
+
+@celery_app.task(bind=True, max_retries=3)
+def parse_part_task(self, job, part, part_range):
+    """
+    Parse one page/byte range of a split ingestion and spool its text units.
+    Returns the number of units.
+    """
+
+    def work():
+        units = parse_range(
+            job[FileFormat.FILE_PATH.value], job[FileFormat.FILE_TYPE.value], part_range
+        )
+        save_part_units(job[FileFormat.ASSET_ID.value], part, units)
+        return len(units)
+
+    return _split_part(self, job, "parse", part, work)
+
+
+@celery_app.task(bind=True, max_retries=3)
+def plan_embed_task(self, unit_counts, job):
+    """
+    Join the parsed parts in order, cache the text, and fan out the embed subtasks.
+    """
+
+    def work():
+        asset_id = job[FileFormat.ASSET_ID.value]
+        units = [unit for part in range(len(unit_counts)) for unit in load_part_units(asset_id, part)]
+        # The whole text goes to the parse cache, so re-indexing reuses it
+        save_units(job[FileFormat.CONTENT_HASH.value], job[FileFormat.FILE_TYPE.value], units)
+        ProgressPublisher(job[FileFormat.TASK_ID.value]).update(
+            ProgressStage.PARSING,
+            force=True,
+            **{FileFormat.PAGES_PARSED.value: len(units), FileFormat.PAGES_TOTAL.value: len(units)},
+        )
+        return embed_phase(job, units)
+
+    return self.replace(_split_part(self, job, "plan", 0, work))
 
-        # Gather file metadata for traceability and search
-        statinfo = os.stat(normalized_path)
-        metadata = {
-            FileFormat.FILE_NAME.value: os.path.basename(normalized_path),
-            FileFormat.FILE_TYPE.value: ext,
-            FileFormat.CREATED_AT.value: f"{datetime.utcfromtimestamp(statinfo.st_ctime).isoformat()}Z",
-            FileFormat.FILE_SIZE.value: statinfo.st_size,
+
+@celery_app.task(bind=True, max_retries=3)
+def embed_part_task(self, job, part):
+    """
+    Embed one spooled chunk range of a split ingestion with every write version and spool
+    the vectors. Returns the number of chunks.
+    """
+
+    def work():
+        chunks = load_part_texts(job[FileFormat.ASSET_ID.value], part)
+        vectors = {
+            version: get_embedder(version).encode(chunks) for version in job[FileFormat.VERSIONS.value]
         }
+        save_part_vectors(job[FileFormat.ASSET_ID.value], part, chunks, vectors)
+        return len(chunks)
 
-        # Generate a unique asset ID for this document
-        asset_id = str(uuid.uuid4())
+    return _split_part(self, job, "embed", part, work)
 
-        # Map file extensions to their chunking functions
-        chunkers = {
-            FileType.PDF.value: file_parser.pdf_file_chunks,
-            FileType.TXT.value: file_parser.text_file_chunks,
-            FileType.DOCX.value: file_parser.docx_file_chunks,
+
+@celery_app.task(bind=True, max_retries=3)
+def commit_split_task(self, chunk_counts, job):
+    """
+    Store the embedded parts of a split ingestion in chunk order, checkpointing after each
+    part so a retry resumes after the last one stored. Returns the asset ID; runs under
+    the original task id, so /documents/status reports it like a single-task ingestion.
+    """
+    task_id = job[FileFormat.TASK_ID.value]
+    asset_id = job[FileFormat.ASSET_ID.value]
+    metadata = job[FileFormat.METADATA.value]
+    versions = job[FileFormat.VERSIONS.value]
+    progress = ProgressPublisher(task_id)
+    progress.counters.update(
+        {
+            FileFormat.PAGES_PARSED.value: job[FileFormat.UNITS.value],
+            FileFormat.PAGES_TOTAL.value: job[FileFormat.UNITS.value],
+            FileFormat.CHUNKS_EMBEDDED.value: sum(chunk_counts),
         }
-        chunk_size = FILE_SETTINGS.CHUNK_SIZE_WORDS  # Number of words per chunk; adjust for your model
+    )
+    committed = (load_checkpoint(asset_id) or {}).get(FileFormat.COMMITTED_CHUNKS.value, 0)
+    try:
+        # Drop any chunks past the checkpoint (a part that was written but never recorded)
+        for version in versions:
+            chroma_client.delete_asset(asset_id, from_idx=committed, version=version)
+        start = 0
+        for part, count in enumerate(chunk_counts):
+            if start + count <= committed:
+                start += count
+                continue
+            chunks, vectors = load_part_vectors(asset_id, part, versions)
+            for version in versions:
+                chroma_client.store(
+                    asset_id,
+                    vectors[version],
+                    chunks,
+                    metadata,
+                    start_idx=start,
+                    tenant_id=job[FileFormat.TENANT_ID.value],
+                    version=version,
+                )
+            start += count
+            save_checkpoint(
+                asset_id,
+                start,
+                **{
+                    FileFormat.TASK_ID.value: task_id,
+                    FileFormat.FILE_PATH.value: job[FileFormat.FILE_PATH.value],
+                    FileFormat.INGESTED_AT.value: metadata[FileFormat.INGESTED_AT.value],
+                },
+            )
+            progress.update(ProgressStage.STORING, **{FileFormat.CHUNKS_STORED.value: start})
+    except Exception as e:
+        logger.error("Error committing split ingestion of asset_id=%s: %s", asset_id, e)
+        if isinstance(e, PERMANENT_ERRORS) or self.request.retries >= self.max_retries:
+            abandon_ingestion(asset_id, progress, str(e))
+            raise
+        progress.update(ProgressStage.RETRY, force=True, **{FileFormat.ERROR.value: str(e)})
+        raise self.retry(exc=e, countdown=retry_countdown(e, self.request.retries))
+    clear_checkpoint(asset_id)
+    remove_spool(asset_id)
+    progress.update(
+        ProgressStage.SUCCESS,
+        **{FileFormat.CHUNKS_STORED.value: start, FileFormat.ASSET_ID.value: asset_id},
+    )
+    logger.info(
+        "Document processed and stored with asset_id: %s (%d split parts)", asset_id, len(chunk_counts)
+    )
+    if SUMMARY_SETTINGS.ENABLED:
+        queue_summary(asset_id)
+    return asset_id
 
-        chunks = []
-        embeddings = []
 
-        # Chunk the document and embed each chunk
-        for chunk in chunkers[ext](normalized_path, chunk_size_words=chunk_size):
-            emb = embedder.model.encode([chunk])[0]  # Numpy vector for the chunk
-            # Optionally: Store each embedding+chunk as you go for streaming ingestion
-            chunks.append(chunk)
-            embeddings.append(emb.tolist())
+@celery_app.task
+def abort_split_task(task_id):
+    """
+    Error callback of a split ingestion: clean up after a part or the commit finally failed.
+    A failed part means the chord body never runs under the original task id, so no
+    task_postrun/task_failure releases the job's scheduling counters: release them here.
+    """
+    asset_id = stable_asset_id(task_id)
+    logger.error("Split ingestion of asset_id=%s failed; removing partial data", asset_id)
+    abandon_ingestion(asset_id, ProgressPublisher(task_id), "Split ingestion failed")
+    ingest_scheduler.record_discarded(task_id)
 
-        # Store all embeddings, chunks, and metadata in ChromaDB
-        chroma_client.store(asset_id, embeddings, chunks, metadata)
-        logger.info(f"Document processed and stored with asset_id: {asset_id}")
-        return asset_id
+
+def _reindex_asset(asset_id):
+    """
+    Re-chunk and re-embed a stored asset with the current chunking settings and model.
+    Text comes from the parse cache (keyed by the content hash in the asset's metadata);
+    the original file is parsed only if the cache has no entry. New chunks overwrite the
+    old ids in place and any surplus old chunks are deleted, so the asset stays searchable.
+    Returns {"asset_id", "chunks"}.
+    """
+    metadata = chroma_client.asset_metadata(asset_id)
+    if not metadata:
+        raise ValueError(f"Asset not found: {asset_id}")
+    content_hash = metadata.get(FileFormat.CONTENT_HASH.value)
+    file_type = metadata[FileFormat.FILE_TYPE.value]
+    units = load_units(content_hash) if content_hash else None
+    if units is None:
+        # Cache miss (or asset predates the cache): parse the original once and cache it
+        source = metadata.get(FileFormat.FILE_PATH.value)
+        if not source or not os.path.exists(source):
+            raise FileNotFoundError(f"No cached text or source file for asset {asset_id}")
+        content_hash = content_hash or hash_file(source)
+        units = iter_units(source, file_type, content_hash)
+
+    base_metadata = {
+        key: value
+        for key, value in metadata.items()
+        if key
+        not in (
+            FileFormat.CHUNK_IDX.value,
+            FileFormat.ASSET_ID.value,
+            FileFormat.EMBEDDING_VERSION.value,
+        )
+    }
+    base_metadata[FileFormat.CONTENT_HASH.value] = content_hash
+    tenant_id = metadata.get(FileFormat.TENANT_ID.value)
+    versions = write_versions()
+
+    stored = 0
+    batch = []
+
+    def flush():
+        nonlocal stored, batch
+        if not batch:
+            return
+        for version in versions:
+            chroma_client.store(
+                asset_id,
+                get_embedder(version).encode(batch),
+                batch,
+                base_metadata,
+                start_idx=stored,
+                tenant_id=tenant_id,
+                version=version,
+            )
+        stored += len(batch)
+        batch = []
+
+    for chunk in units_to_chunks(units, FILE_SETTINGS.CHUNK_SIZE_WORDS, FILE_SETTINGS.CHUNK_OVERLAP):
+        batch.append(chunk)
+        if len(batch) >= CELERY_SETTINGS.CHECKPOINT_BATCH_SIZE:
+            flush()
+    flush()
+    if not stored:
+        raise ValueError(f"No text found for asset {asset_id}")
+    # Drop old chunks beyond the new chunk count
+    for version in versions:
+        chroma_client.delete_asset(asset_id, from_idx=stored, version=version)
+    logger.info("Re-indexed asset_id=%s into %d chunks", asset_id, stored)
+    return {FileFormat.ASSET_ID.value: asset_id, FileFormat.CHUNKS_STORED.value: stored}
+
+
+def reindex_asset(asset_id, retries=0, max_retries=EXECUTION_SETTINGS.MAX_RETRIES):
+    """
+    One re-index attempt. Raises RetryIngestion for transient errors; a missing asset or
+    source (PERMANENT_ERRORS) fails at once. Re-running is safe: chunks are overwritten in place.
+    """
+    try:
+        return _reindex_asset(asset_id)
+    except PERMANENT_ERRORS:
+        raise
+    except Exception as e:
+        if retries >= max_retries:
+            raise
+        logger.warning("Re-index of asset_id=%s failed, retrying: %s", asset_id, e)
+        raise RetryIngestion(e, retry_countdown(e, retries), max_retries)
+
+
+@celery_app.task(bind=True, max_retries=3)
+def reindex_asset_task(self, asset_id):
+    """
+    Celery task wrapper for reindex_asset (see POST /documents/reindex).
+    """
+    try:
+        return reindex_asset(asset_id, self.request.retries, self.max_retries)
+    except RetryIngestion as r:
+        raise self.retry(exc=r.exc, countdown=r.countdown, max_retries=r.max_retries)
+
+
+def reindex_asset_embedded(task_id, asset_id, retries=0, max_retries=EXECUTION_SETTINGS.MAX_RETRIES):
+    """
+    reindex_asset_task for the embedded executor, retried by it like ingestion.
+    """
+    return reindex_asset(asset_id, retries, max_retries)
+
+
+def summarize_asset(asset_id, retries=0, max_retries=SUMMARY_SETTINGS.MAX_RETRIES):
+    """
+    One summary attempt. Returns the summary record, or None when the asset no longer
+    exists (deleted after ingestion; nothing to retry). Raises RetryIngestion for
+    transient errors, including a saturated LLM lane or an exhausted token quota.
+    """
+    try:
+        record = build_summary(asset_id)
+    except PERMANENT_ERRORS:
+        raise
+    except Exception as e:
+        if retries >= max_retries:
+            raise
+        logger.warning("Summary of asset_id=%s failed, retrying: %s", asset_id, e)
+        raise RetryIngestion(e, retry_countdown(e, retries), max_retries)
+    if record is None:
+        logger.info("Asset %s is gone; skipping its summary", asset_id)
+    return record
+
+
+@celery_app.task(bind=True, max_retries=SUMMARY_SETTINGS.MAX_RETRIES)
+def summarize_asset_task(self, asset_id):
+    """
+    Build the precomputed summary of a stored asset (see app.services.asset_summary).
+    """
+    try:
+        return summarize_asset(asset_id, self.request.retries, self.max_retries)
+    except RetryIngestion as r:
+        raise self.retry(exc=r.exc, countdown=r.countdown, max_retries=r.max_retries)
+
+
+def summarize_asset_embedded(task_id, asset_id, retries=0, max_retries=SUMMARY_SETTINGS.MAX_RETRIES):
+    """
+    summarize_asset_task for the embedded executor, retried by it like ingestion.
+    """
+    return summarize_asset(asset_id, retries, max_retries)
+
+
+def queue_summary(asset_id):
+    """
+    Queue the summary of a freshly ingested asset as its own task (in both execution
+    modes), so a failed or slow summary never fails or holds up ingestion.
+    """
+    try:
+        dispatch_task(summarize_asset_task, asset_id)
     except Exception as e:
-        logger.error(f"Error processing document: {e}")
-        # Retry the task with exponential backoff
-        raise self.retry(exc=e, countdown=60)
+        logger.warning("Could not queue the summary of asset_id=%s: %s", asset_id, e)
@@ -0,0 +1,309 @@
+"""
+Embedded task executor for single-node deployments (EXECUTION_MODE=embedded).
+
+Runs the same tasks as the Celery workers in a local process pool, with state, results
+and progress kept in the SQLite task table instead of Redis. Task ids are uuid4 strings
+like Celery's, so the API contract does not change. Tasks left unfinished by a crashed
+API process are taken over and re-run at startup (ingestion resumes from its checkpoint),
+and the Celery beat schedule is run by a lightweight in-process scheduler. A task that
+asks for a retry gives its worker back and is queued again once its countdown has passed,
+like Celery's retry with a countdown.
+
+Tasks are not handed to the pool in arrival order: the Dispatcher keeps one queue per
+ingestion class (see app.core.ingest_scheduler), takes tenants in turn within each, and
+starts a task only when a worker is free. Interactive jobs go first and always find their
+share of the pool free; bulk jobs never hold more than their share.
+"""
+import os
+import time
+import uuid
+import asyncio
+import logging
+import threading
+import importlib
+import multiprocessing
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from starlette.concurrency import run_in_threadpool
+from app.constant import EXECUTION_SETTINGS, SCHEDULING_SETTINGS, FileFormat, FileStatus, IngestClass
+from app.services.task_store import task_store
+from app.core.logging_config import configure_logging
+from app.core import ingest_scheduler
+from app.core.ingest_scheduler import CLASS_ORDER, IngestJob
+
+logger = logging.getLogger("embedded-executor")
+
+# Tasks that need their task id (and retries) outside Celery; others call task.run()
+BOUND_RUNNERS = {
+    "app.document_tasks.process_document_task": "app.document_tasks.process_document_embedded",
+    "app.document_tasks.summarize_asset_task": "app.document_tasks.summarize_asset_embedded",
+    "app.document_tasks.reindex_asset_task": "app.document_tasks.reindex_asset_embedded",
+}
+
+_executor = None
+# True inside pool worker processes, which queue follow-up tasks for the API process to run
+_pool_worker = False
+
+
+def _import(path: str):
+    module_name, attr = path.rsplit(".", 1)
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def _run_task(task_id: str, name: str, args, kwargs, retries=0, max_retries=None):
+    """
+    Pool worker entry point: run one task and record its outcome in the task table.
+    Returns (retries, max_retries, countdown) when the task is to be run again later.
+    """
+    from app.document_tasks import RetryIngestion
+
+    task_store.set_state(task_id, FileStatus.STARTED)
+    try:
+        if name in BOUND_RUNNERS:
+            budget = {"max_retries": max_retries} if max_retries is not None else {}
+            result = _import(BOUND_RUNNERS[name])(task_id, *args, retries=retries, **budget, **kwargs)
+        else:
+            result = _import(name).run(*args, **kwargs)
+    except RetryIngestion as r:
+        logger.warning("Task %s[%s] will retry in %ss: %s", name, task_id, r.countdown, r.exc)
+        task_store.set_state(task_id, FileStatus.RETRY, error=str(r.exc), retries=retries + 1)
+        return retries + 1, r.max_retries, r.countdown
+    except Exception as e:
+        logger.error("Task %s[%s] failed: %s", name, task_id, e)
+        task_store.set_state(task_id, FileStatus.FAILURE, error=str(e))
+        return None
+    task_store.set_state(task_id, FileStatus.SUCCESS, result=result)
+    return None
+
+
+def _warm_worker():
+    global _pool_worker
+    _pool_worker = True
+    # Spawned workers start with unconfigured logging
+    configure_logging()
+    # Import task modules once per worker (loads the embedding model up front)
+    for path in BOUND_RUNNERS.values():
+        _import(path)
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn: CUDA and the ChromaDB client must not be inherited through fork
+        _executor = ProcessPoolExecutor(
+            max_workers=EXECUTION_SETTINGS.WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_worker,
+        )
+    return _executor
+
+
+# Dispatcher holds queued tasks per class and tenant and feeds the pool one free worker at a time.
+class Dispatcher:
+    def __init__(self, workers=EXECUTION_SETTINGS.WORKERS):
+        self.workers = workers
+        split = ingest_scheduler.worker_split(workers, minimum=0)
+        # Workers only interactive jobs may use, and the most bulk jobs may hold at once
+        self.reserved = min(workers - 1, max(1, split[IngestClass.INTERACTIVE.value]))
+        self.bulk_limit = max(1, min(split[IngestClass.BULK.value], workers - self.reserved))
+        self.closed = False
+        self._lock = threading.Lock()
+        self._pending = {c: OrderedDict() for c in CLASS_ORDER}  # class -> tenant -> deque
+        self._running = {c: 0 for c in CLASS_ORDER}
+        self._outstanding = {}  # (class, tenant) -> tasks queued or running
+        self._waits = {c: deque(maxlen=SCHEDULING_SETTINGS.WAIT_SAMPLES) for c in CLASS_ORDER}
+
+    def push(self, task_id: str, name: str, args, kwargs, job: IngestJob, retries=0, max_retries=None):
+        with self._lock:
+            if (
+                job.ingest_class == IngestClass.INTERACTIVE
+                and self._outstanding.get((job.ingest_class, job.tenant_id), 0)
+                >= SCHEDULING_SETTINGS.TENANT_INTERACTIVE_LIMIT
+            ):
+                job.ingest_class = IngestClass.STANDARD
+            key = (job.ingest_class, job.tenant_id)
+            self._outstanding[key] = self._outstanding.get(key, 0) + 1
+            job.enqueued_at = time.monotonic()
+            tenants = self._pending[job.ingest_class]
+            tenants.setdefault(job.tenant_id, deque()).append(
+                (task_id, name, args, kwargs, job, retries, max_retries)
+            )
+        self._pump()
+
+    def _may_start(self, ingest_class: IngestClass) -> bool:
+        running = sum(self._running.values())
+        if running >= self.workers:
+            return False
+        if ingest_class == IngestClass.INTERACTIVE:
+            return True
+        if running - self._running[IngestClass.INTERACTIVE] >= self.workers - self.reserved:
+            return False
+        return ingest_class != IngestClass.BULK or self._running[IngestClass.BULK] < self.bulk_limit
+
+    def _next(self):
+        # Highest class allowed to start; within it, the tenant whose turn it is
+        for ingest_class in CLASS_ORDER:
+            tenants = self._pending[ingest_class]
+            if tenants and self._may_start(ingest_class):
+                tenant_id, queued = next(iter(tenants.items()))
+                item = queued.popleft()
+                # Move the tenant to the back of the line (or drop it once empty)
+                del tenants[tenant_id]
+                if queued:
+                    tenants[tenant_id] = queued
+                return item
+        return None
+
+    def _pump(self):
+        while True:
+            with self._lock:
+                item = None if self.closed else self._next()
+                if item is None:
+                    return
+                task_id, name, args, kwargs, job, retries, max_retries = item
+                self._running[job.ingest_class] += 1
+                self._waits[job.ingest_class].append(time.monotonic() - job.enqueued_at)
+            future = get_executor().submit(_run_task, task_id, name, args, kwargs, retries, max_retries)
+            future.add_done_callback(lambda f, item=item: self._done(item, f))
+
+    def _done(self, item, future):
+        task_id, name, args, kwargs, job = item[:5]
+        with self._lock:
+            self._running[job.ingest_class] -= 1
+            key = (job.ingest_class, job.tenant_id)
+            self._outstanding[key] -= 1
+            if not self._outstanding[key]:
+                del self._outstanding[key]
+        retry = None if future.cancelled() or future.exception() else future.result()
+        if retry is not None:
+            # The worker is free meanwhile; the task stays RETRY until it is queued again
+            retries, max_retries, countdown = retry
+            timer = threading.Timer(
+                countdown, self.push, (task_id, name, args, kwargs, job, retries, max_retries)
+            )
+            timer.daemon = True
+            timer.start()
+        self._pump()
+
+    def stats(self) -> dict:
+        """
+        Per queue: tasks waiting and running, outstanding tasks per tenant and recent wait times.
+        """
+        workers = {IngestClass.INTERACTIVE: self.reserved, IngestClass.BULK: self.bulk_limit}
+        with self._lock:
+            stats = {}
+            for ingest_class in CLASS_ORDER:
+                stats[ingest_scheduler.queue_name(ingest_class)] = {
+                    FileFormat.INGEST_CLASS.value: ingest_class.value,
+                    FileFormat.QUEUED.value: sum(len(q) for q in self._pending[ingest_class].values()),
+                    FileFormat.RUNNING.value: self._running[ingest_class],
+                    FileFormat.WORKERS.value: workers.get(ingest_class),
+                    FileFormat.OUTSTANDING.value: {
+                        tenant: n for (c, tenant), n in self._outstanding.items() if c == ingest_class
+                    },
+                    FileFormat.WAIT_SECONDS.value: ingest_scheduler.wait_summary(
+                        list(self._waits[ingest_class])
+                    ),
+                }
+            return stats
+
+
+_dispatcher = None
+
+
+def get_dispatcher() -> Dispatcher:
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = Dispatcher()
+    return _dispatcher
+
+
+def _default_job(name: str, args, kwargs) -> IngestJob:
+    # Recovered ingestion is classified again (never as interactive); maintenance runs as bulk
+    tenant_id = kwargs.get(FileFormat.TENANT_ID.value)
+    job = ingest_scheduler.job_for_task(name, tenant_id)
+    if job is None and name in BOUND_RUNNERS and args:
+        job = ingest_scheduler.classify(args[0], tenant_id, interactive=False)
+    return job or IngestJob(IngestClass.BULK)
+
+
+def submit(name: str, args=(), kwargs=None, job: IngestJob = None) -> str:
+    """
+    Record a task as PENDING and queue it for the process pool. Returns its task id.
+    Called from a pool worker (a follow-up task), the task is recorded without an owner
+    and an API process adopts it on its next scheduler tick (see recover_unfinished).
+    """
+    task_id = str(uuid.uuid4())
+    kwargs = kwargs or {}
+    if _pool_worker:
+        task_store.create(task_id, name, list(args), kwargs, owner=None)
+        return task_id
+    task_store.create(task_id, name, list(args), kwargs, owner=os.getpid())
+    get_dispatcher().push(task_id, name, list(args), kwargs, job or _default_job(name, args, kwargs))
+    return task_id
+
+
+def _pid_alive(pid) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def recover_unfinished() -> int:
+    """
+    Re-queue tasks whose owning API process is gone, and unowned tasks queued by pool
+    workers. Returns the number re-queued.
+    """
+    recovered = 0
+    for task_id, name, args, kwargs, owner, retries in task_store.unfinished():
+        if owner == os.getpid() or _pid_alive(owner):
+            continue
+        if task_store.claim(task_id, owner, os.getpid()):
+            logger.info("Recovering unfinished task %s[%s]", name, task_id)
+            get_dispatcher().push(task_id, name, args, kwargs, _default_job(name, args, kwargs), retries)
+            recovered += 1
+    return recovered
+
+
+def _schedule_tick():
+    from app.celery_app import celery_app
+
+    recover_unfinished()
+    now = time.time()
+    for entry, spec in celery_app.conf.beat_schedule.items():
+        if task_store.claim_schedule(entry, spec["schedule"], now):
+            task_id = submit(spec["task"])
+            logger.info("Scheduled %s[%s] (%s)", spec["task"], task_id, entry)
+
+
+async def run_schedule():
+    """
+    Submit the Celery beat schedule's periodic tasks when due. Each occurrence is
+    claimed in the task table, so several API processes never run it twice.
+    Also adopts follow-up tasks queued by pool workers. Each tick runs in the
+    threadpool (the task table is SQLite), and a failed tick is logged and retried
+    on the next one.
+    """
+    while True:
+        try:
+            await run_in_threadpool(_schedule_tick)
+        except Exception as e:
+            logger.error("Scheduler tick failed: %s", e, exc_info=True)
+        await asyncio.sleep(EXECUTION_SETTINGS.SCHEDULER_TICK)
+
+
+def shutdown():
+    global _executor, _dispatcher
+    if _dispatcher is not None:
+        # Stop feeding the pool; queued tasks stay PENDING and are recovered on the next start
+        _dispatcher.closed = True
+        _dispatcher = None
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -1,4 +1,7 @@
 from slowapi import Limiter
 from slowapi.util import get_remote_address
+from app.constant import LIMITER_SETTINGS
+import app.core.rate_limit  # noqa: F401  registers the sqlite:// storage scheme with `limits`
 
-limiter = Limiter(key_func=get_remote_address)
+# Shared storage so every worker/pod enforces the same limits (sqlite:// per node, redis:// across nodes)
+limiter = Limiter(key_func=get_remote_address, storage_uri=LIMITER_SETTINGS.STORAGE_URI)
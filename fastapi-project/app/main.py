@@ -1,8 +1,14 @@
+from app.core.logging_config import configure_logging
+
+# Configure logging before anything else is imported so import-time records are queued too
+configure_logging()
+
 from fastapi import FastAPI
 from app.api.endpoints.document import router as document_router
 
 # from app.api import api_router
 from app.api.endpoints.chat import router as chat_router
+from app.api.endpoints.profiling import router as profiling_router
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
@@ -24,6 +30,52 @@ app.add_middleware(
 )
 app.include_router(document_router, prefix="/api", tags=["Documents"])
 app.include_router(chat_router, prefix="/api", tags=["Chat"])
+app.include_router(profiling_router, prefix="/api", tags=["Profiling"])
 
 # Serve static files from the correct directory
 app.mount("/static", StaticFiles(directory="app/static", html=True), name="static")
+
+from app.task_queue import is_embedded
+
+
+# Embedded mode: start the local process pool, recover unfinished tasks and run the beat schedule
+@app.on_event("startup")
+async def start_embedded_executor():
+    if not is_embedded():
+        return
+    import asyncio
+    from app import embedded_executor
+
+    embedded_executor.get_executor()
+    embedded_executor.recover_unfinished()
+    app.state.scheduler = asyncio.create_task(embedded_executor.run_schedule())
+
+
+@app.on_event("shutdown")
+async def stop_embedded_executor():
+    if not is_embedded():
+        return
+    from app import embedded_executor
+
+    app.state.scheduler.cancel()
+    embedded_executor.shutdown()
+
+
+# Warm the embedding model and the most recently active assets, now and periodically
+@app.on_event("startup")
+async def start_warmup():
+    from app.constant import WARMUP_SETTINGS
+
+    if not WARMUP_SETTINGS.ENABLED:
+        return
+    import asyncio
+    from app.services import warmup
+    from app.api.endpoints.chat import chroma_client
+
+    app.state.warmup = asyncio.create_task(warmup.run_warmup(chroma_client))
+
+
+@app.on_event("shutdown")
+async def stop_warmup():
+    if getattr(app.state, "warmup", None):
+        app.state.warmup.cancel()
@@ -0,0 +1,61 @@
+"""
+Celery maintenance tasks: idle thread/asset eviction, vector index compaction,
+cold chat-history archival and re-embedding into a new embedding version.
+Scheduled by Celery beat (see celery_app.conf.beat_schedule) and also callable on demand.
+"""
+import logging
+from app.celery_app import celery_app
+from app.services.retention import reap_idle, chroma_client
+from app.services.history import archive_idle_histories
+from app.services.embedding_migration import reembed_pending
+from app.core.embedding_versions import target_version
+from app.task_queue import is_embedded
+from app.constant import EMBEDDING_SETTINGS, FileFormat
+
+logger = logging.getLogger("celery-maintenance")
+
+
+@celery_app.task
+def reap_idle_task():
+    """
+    Evict threads and assets idle longer than RETENTION_SETTINGS TTLs.
+    Returns {"threads": [...], "assets": [...]} with the evicted ids.
+    """
+    return reap_idle()
+
+
+@celery_app.task
+def compact_index_task():
+    """
+    Rebuild the ChromaDB collection to drop deleted vectors and vacuum storage.
+    Returns the record count and storage bytes before/after/reclaimed.
+    """
+    report = chroma_client.compact()
+    logger.info("Index compaction report: %s", report)
+    return report
+
+
+@celery_app.task
+def archive_histories_task():
+    """
+    Pack chat histories idle longer than HISTORY_SETTINGS.ARCHIVE_AFTER into compressed shards.
+    Returns the number of threads archived.
+    """
+    archived = archive_idle_histories()
+    logger.info("Archived %d idle chat histories", archived)
+    return archived
+
+
+@celery_app.task
+def reembed_task():
+    """
+    Re-embed assets into the target embedding version (see POST /embeddings/migrate).
+    Under Celery each run stops after EMBEDDING_SETTINGS.REEMBED_TIME_BUDGET seconds and
+    re-queues itself, staying under the task time limit; the embedded executor runs to the end.
+    Returns the progress report.
+    """
+    budget = None if is_embedded() else EMBEDDING_SETTINGS.REEMBED_TIME_BUDGET
+    report = reembed_pending(budget)
+    if report[FileFormat.PENDING_ASSETS.value] and target_version() and not is_embedded():
+        reembed_task.apply_async(countdown=1)
+    return report
@@ -1,9 +1,10 @@
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel
 
 
 class StartChatRequest(BaseModel):
-    asset_id: str
+    asset_id: Optional[str] = None
+    asset_ids: Optional[List[str]] = None  # Multi-document thread
 
 
 class StartChatResponse(BaseModel):
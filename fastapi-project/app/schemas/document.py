@@ -4,6 +4,8 @@ from pydantic import BaseModel
 
 class DocumentProcessRequest(BaseModel):
     file_path: str
+    tenant_id: Optional[str] = None
+    profile: bool = False  # Record a sampling profile of the ingestion task
 
 
 class DocumentProcessResponse(BaseModel):
@@ -11,6 +13,24 @@ class DocumentProcessResponse(BaseModel):
     task_id: Optional[str] = None
 
 
+class DocumentUploadResponse(BaseModel):
+    task_id: str
+    file_name: str
+    file_size: int
+    content_hash: str
+    asset_id: Optional[str] = None
+
+
+class DocumentReindexRequest(BaseModel):
+    # Omit to re-index every stored asset
+    asset_ids: Optional[List[str]] = None
+
+
+class EmbeddingMigrationRequest(BaseModel):
+    # Embedding version to migrate to (a key of EMBEDDING_SETTINGS.MODELS)
+    version: str
+
+
 class DocumentChunkInfo(BaseModel):
     chunk_id: str
     chunk_idx: int
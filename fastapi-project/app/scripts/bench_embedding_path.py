@@ -0,0 +1,176 @@
+"""
+Benchmark the ingestion vector path: legacy (one encode call and one .tolist() per chunk,
+a `metadata | {...}` merge per chunk) against the current one (batch encode into a float32
+array, one conversion per batch at the ChromaDB boundary, one metadata template per batch).
+
+Only the path up to the upsert arguments is measured, not ChromaDB itself. Time is taken
+with perf_counter; peak Python allocations are taken in a separate tracemalloc run. Tensor
+and model buffers are allocated outside Python and invisible to tracemalloc, so --rss also
+runs each path in a fresh process and reports how far it raised the peak resident set
+over the loaded model (Linux only).
+
+The speedup comes from encoding a batch per call instead of a chunk per call; the float32
+hand-off does not lower the peak (the nested lists chromadb 0.4 requires dominate it).
+
+    python -m app.scripts.bench_embedding_path --chunks 2000 --rss
+    python -m app.scripts.bench_embedding_path --synthetic   # no model: conversion/metadata cost only
+"""
+import time
+import argparse
+import tracemalloc
+import multiprocessing
+import numpy as np
+from app.constant import CELERY_SETTINGS, EMBEDDING_SETTINGS, FileFormat
+from app.core.db_client import as_chroma_embeddings
+
+
+class _SyntheticModel:
+    # Stands in for SentenceTransformer.encode: float32 rows, fixed cost per call
+    def __init__(self, dim):
+        self.dim = dim
+        self.rng = np.random.default_rng(0)
+
+    def encode(self, texts, **kwargs):
+        return self.rng.standard_normal((len(texts), self.dim), dtype=np.float32)
+
+
+def _metadata():
+    return {
+        FileFormat.FILE_NAME.value: "manual.pdf",
+        FileFormat.FILE_TYPE.value: "pdf",
+        FileFormat.CREATED_AT.value: "2024-01-01T00:00:00Z",
+        FileFormat.FILE_SIZE.value: 123456,
+        FileFormat.INGESTED_AT.value: "2024-01-01T00:00:00Z",
+        FileFormat.CONTENT_HASH.value: "0" * 64,
+        FileFormat.FILE_PATH.value: "uploads/manual.pdf",
+    }
+
+
+def legacy_path(model, chunks, batch_size):
+    metadata = _metadata()
+    out = 0
+    for start in range(0, len(chunks), batch_size):
+        batch = chunks[start : start + batch_size]
+        embeddings = [model.encode([chunk])[0].tolist() for chunk in batch]
+        metadatas = [
+            metadata
+            | {
+                FileFormat.CHUNK_IDX.value: i,
+                FileFormat.ASSET_ID.value: "asset",
+                FileFormat.EMBEDDING_VERSION.value: "v1",
+            }
+            for i in range(start, start + len(batch))
+        ]
+        out += len(embeddings) + len(metadatas)
+    return out
+
+
+def current_path(model, chunks, batch_size):
+    metadata = _metadata()
+    out = 0
+    for start in range(0, len(chunks), batch_size):
+        batch = chunks[start : start + batch_size]
+        vectors = np.ascontiguousarray(
+            model.encode(batch, batch_size=EMBEDDING_SETTINGS.ENCODE_BATCH_SIZE), dtype=np.float32
+        )
+        template = {
+            **metadata,
+            FileFormat.ASSET_ID.value: "asset",
+            FileFormat.EMBEDDING_VERSION.value: "v1",
+        }
+        chunk_idx = FileFormat.CHUNK_IDX.value
+        metadatas = [{**template, chunk_idx: i} for i in range(start, start + len(batch))]
+        embeddings = as_chroma_embeddings(vectors)
+        out += len(embeddings) + len(metadatas)
+    return out
+
+
+def _measure(fn, model, chunks, batch_size, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(model, chunks, batch_size)
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    fn(model, chunks, batch_size)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def _load_model(synthetic, dim):
+    if synthetic:
+        return _SyntheticModel(dim)
+    from app.core.embedder import get_embedder
+    from app.core.embedding_versions import active_version
+
+    return get_embedder(active_version()).model
+
+
+def _proc_status_kib(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise KeyError(field)
+
+
+def _rss_child(name, synthetic, dim, chunks, batch_size, queue):
+    model = _load_model(synthetic, dim)
+    model.encode(chunks[:1])  # Warm up lazily allocated buffers
+    # Reset the peak (VmHWM) to the current RSS, so imports and model loading don't count
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+    before = _proc_status_kib("VmRSS")
+    PATHS[name](model, chunks, batch_size)
+    queue.put(_proc_status_kib("VmHWM") - before)
+
+
+def _measure_rss(name, args, chunks):
+    # Fresh process per path, so one path's high-water mark never hides the other's
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    child = ctx.Process(
+        target=_rss_child, args=(name, args.synthetic, args.dim, chunks, args.batch_size, queue)
+    )
+    child.start()
+    grown = queue.get()
+    child.join()
+    return grown * 1024
+
+
+PATHS = {"legacy": legacy_path, "current": current_path}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the encoder-to-store vector path.")
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=200, help="Words per synthetic chunk")
+    parser.add_argument("--batch-size", type=int, default=CELERY_SETTINGS.CHECKPOINT_BATCH_SIZE)
+    parser.add_argument("--dim", type=int, default=384, help="Vector size in --synthetic mode")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--synthetic", action="store_true", help="Skip the real model")
+    parser.add_argument("--rss", action="store_true", help="Also measure peak RSS growth per path")
+    args = parser.parse_args()
+
+    model = _load_model(args.synthetic, args.dim)
+    chunks = [" ".join(f"word{i}_{j}" for j in range(args.words)) for i in range(args.chunks)]
+
+    results = {}
+    for name, fn in PATHS.items():
+        results[name] = _measure(fn, model, chunks, args.batch_size, args.repeat)
+        seconds, peak = results[name]
+        line = f"{name:8s} {seconds * 1000:10.1f} ms  peak {peak / 1024 / 1024:8.2f} MiB"
+        if args.rss:
+            line += f"  rss +{_measure_rss(name, args, chunks) / 1024 / 1024:8.2f} MiB"
+        print(line)
+    (legacy_s, legacy_peak), (current_s, current_peak) = results["legacy"], results["current"]
+    change = 100 * (current_peak / legacy_peak - 1)
+    print(
+        f"speedup {legacy_s / current_s:.2f}x, "
+        f"peak allocations {abs(change):.0f}% {'higher' if change > 0 else 'lower'}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark the chat history cold tier: hot JSON files against the archive they are packed into.
+
+Histories are synthetic conversations whose messages are English sentences taken from the
+standard library's docstrings (a user question, then an answer of several sentences).
+Sentences recur across histories, the way passages of the same documents recur in the
+answers of a RAG chat; how much they recur in production decides how far the ratio moves.
+
+Sizes are reported both as bytes written and as disk space allocated: every hot history
+is its own small file and takes at least one filesystem block, which the archive does not.
+The histories are archived over --runs archiver runs, so blocks are also topped up across
+runs the way they are in production.
+
+    python -m app.scripts.bench_history_archive --histories 20000 --runs 4
+"""
+import os
+import re
+import json
+import time
+import zlib
+import uuid
+import random
+import inspect
+import argparse
+import tempfile
+import importlib
+from datetime import datetime, timedelta
+
+_CORPUS_MODULES = [
+    "os", "json", "collections", "asyncio", "argparse", "logging", "email", "http.client",
+    "unittest", "typing", "subprocess", "threading", "decimal", "datetime", "pathlib",
+]
+
+
+def _sentences():
+    sentences = []
+    for module_name in _CORPUS_MODULES:
+        for _, obj in inspect.getmembers(importlib.import_module(module_name)):
+            doc = inspect.getdoc(obj)
+            if doc:
+                for sentence in re.split(r"(?<=[.!?])\s+", doc.replace("\n", " ")):
+                    if 30 < len(sentence) < 300:
+                        sentences.append(sentence)
+    return list(dict.fromkeys(sentences))
+
+
+def _history(rng, sentences, messages):
+    ts = datetime(2025, 1, 1) + timedelta(seconds=rng.randint(0, 10**7))
+    history = []
+    for i in range(messages):
+        ts += timedelta(seconds=rng.randint(5, 600), microseconds=rng.randint(0, 999999))
+        if i % 2 == 0:
+            message, sender = rng.choice(sentences), "user"
+        else:
+            message, sender = " ".join(rng.sample(sentences, rng.randint(2, 6))), "agent"
+        history.append({"message": message, "sender": sender, "timestamp": ts.isoformat() + "Z"})
+    return history
+
+
+def _sizes(root, select):
+    apparent = allocated = 0
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            if select(path):
+                st = os.stat(path)
+                apparent += st.st_size
+                allocated += st.st_blocks * 512
+    return apparent, allocated
+
+
+def _mib(n):
+    return f"{n / 2**20:8.2f} MiB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure chat history archive size and read time.")
+    parser.add_argument("--histories", type=int, default=20000)
+    parser.add_argument("--runs", type=int, default=4, help="Archiver runs the histories are spread over")
+    parser.add_argument("--reads", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    sentences = _sentences()
+    workdir = tempfile.mkdtemp(prefix="bench-history-")
+    os.chdir(workdir)
+    # The history modules resolve their directories against the working directory
+    from app.services import history, history_archive
+
+    os.makedirs(history._HISTORY_DIR, exist_ok=True)
+
+    histories = {
+        str(uuid.UUID(int=rng.getrandbits(128), version=4)): _history(rng, sentences, rng.choice([2, 4, 6, 8, 12]))
+        for _ in range(args.histories)
+    }
+    thread_ids = list(histories)
+    per_run = -(-len(thread_ids) // args.runs)
+
+    hot_apparent = hot_allocated = legacy = 0
+    archive_seconds = 0.0
+    for run in range(args.runs):
+        for thread_id in thread_ids[run * per_run : (run + 1) * per_run]:
+            path = history._history_file(thread_id)
+            with open(path, "w") as f:
+                json.dump(histories[thread_id], f)
+            with open(path, "rb") as f:
+                raw = f.read()
+            st = os.stat(path)
+            hot_apparent += st.st_size
+            hot_allocated += st.st_blocks * 512
+            c = zlib.compressobj(9, zdict=history_archive._ZDICT_V1)
+            legacy += len(c.compress(raw) + c.flush())
+        started = time.perf_counter()
+        history.archive_idle_histories(max_idle_seconds=-1)
+        archive_seconds += time.perf_counter() - started
+
+    archive_apparent, archive_allocated = _sizes(history_archive._ARCHIVE_DIR, lambda p: not p.endswith(".lock"))
+    samples = rng.sample(thread_ids, min(args.reads, len(thread_ids)))
+    started = time.perf_counter()
+    for thread_id in samples:
+        assert json.loads(history_archive.read_archived(thread_id)) == histories[thread_id]
+    read_ms = (time.perf_counter() - started) / len(samples) * 1000
+
+    print(f"histories: {len(histories)} over {args.runs} archiver runs, {len(sentences)} distinct sentences")
+    print(f"hot JSON           written {_mib(hot_apparent)}   allocated {_mib(hot_allocated)}")
+    print(f"per-history zlib   written {_mib(legacy)}   (previous codec, without its index)")
+    print(f"archive            written {_mib(archive_apparent)}   allocated {_mib(archive_allocated)}")
+    print(f"ratio              written {hot_apparent / archive_apparent:5.1f}x      allocated {hot_allocated / archive_allocated:5.1f}x")
+    print(f"archiving: {archive_seconds:.1f} s total, read: {read_ms:.2f} ms per history")
+
+
+if __name__ == "__main__":
+    main()
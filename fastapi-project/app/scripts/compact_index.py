@@ -0,0 +1,32 @@
+"""
+Compact the vector index offline, including the VACUUM of Chroma's SQLite store.
+
+Usage:
+    python -m app.scripts.compact_index
+
+Run with the API and workers stopped: the scheduled compaction rebuilds collections while
+the app is running but skips VACUUM whenever another process has the store open.
+"""
+import argparse
+from app.constant import FileFormat
+from app.core.db_client import ChromaDBClient
+from app.core.logging_config import configure_logging
+from app.core.store_locks import other_clients
+
+
+def main():
+    argparse.ArgumentParser(description="Compact the vector index and vacuum its store.").parse_args()
+    configure_logging()
+    db = ChromaDBClient()
+    others = other_clients(db.persist_directory)
+    if others:
+        print(f"{others} other processes have the store open; stop them to vacuum")
+    report = db.compact()
+    print(
+        f"records: {report[FileFormat.RECORDS.value]}, vacuumed: {report[FileFormat.VACUUMED.value]}, "
+        f"bytes: {report[FileFormat.BYTES_BEFORE.value]} -> {report[FileFormat.BYTES_AFTER.value]}"
+    )
+
+
+if __name__ == "__main__":
+    main()
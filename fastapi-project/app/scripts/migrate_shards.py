@@ -0,0 +1,116 @@
+"""
+Move chunks from the single legacy `documents` collection into shard collections.
+
+Usage:
+    python -m app.scripts.migrate_shards [--strategy asset_hash] [--batch-size 500] [--dry-run]
+
+Assets move one at a time: all of an asset's records are upserted into its target shard
+(in batches), then its route is recorded, and only then are its records deleted from the
+base collection. Until its route switches an asset is read from the base collection in
+full, and afterwards from its shard in full, so retrieval never sees part of an asset.
+An interrupted run can simply be restarted.
+"""
+import argparse
+import logging
+from collections import defaultdict
+from app.constant import FileFormat, SHARD_SETTINGS, ShardStrategy
+from app.core.db_client import ChromaDBClient
+from app.core.logging_config import configure_logging
+from app.core.shard_router import ShardRouter
+
+logger = logging.getLogger("shard-migration")
+
+
+def _base_assets(base, batch_size: int) -> dict:
+    # {asset_id: tenant_id} of every asset with records in the base collection
+    assets = {}
+    total = base.count()
+    # Bounded by count(): Chroma 0.4 misbehaves when a page comes back empty
+    for offset in range(0, total, batch_size):
+        page = base.get(limit=batch_size, offset=offset, include=[FileFormat.METADATAS.value])
+        for metadata in page.get(FileFormat.METADATAS.value) or []:
+            asset_id = metadata.get(FileFormat.ASSET_ID.value)
+            if asset_id and asset_id not in assets:
+                assets[asset_id] = metadata.get(FileFormat.TENANT_ID.value)
+    return assets
+
+
+def _move_asset(db, router, asset_id: str, tenant_id, target: str, batch_size: int) -> int:
+    """
+    Copy every record of one asset to `target`, switch its route, then remove it from the
+    base collection. Returns the number of records moved.
+    """
+    base = db.collection  # Re-fetched per asset: compaction may have replaced it
+    ids = base.get(where={FileFormat.ASSET_ID.value: asset_id}, include=[])[FileFormat.IDS.value]
+    for start in range(0, len(ids), batch_size):
+        page = base.get(
+            ids=ids[start : start + batch_size],
+            include=[
+                FileFormat.EMBEDDINGS.value,
+                FileFormat.DOCUMENTS.value,
+                FileFormat.METADATAS.value,
+            ],
+        )
+        with router.writing(target) as collection:
+            collection.upsert(
+                ids=page[FileFormat.IDS.value],
+                embeddings=page[FileFormat.EMBEDDINGS.value],
+                documents=page[FileFormat.DOCUMENTS.value],
+                metadatas=page[FileFormat.METADATAS.value],
+            )
+    # The asset is complete in its shard: readers switch over now
+    router.catalog.put(asset_id, target, tenant_id)
+    with router.writing(base.name) as current:
+        current.delete(ids=ids)
+    return len(ids)
+
+
+def migrate(strategy: str, batch_size: int, dry_run: bool = False) -> dict:
+    """
+    Migrate every asset of the base collection to the shard chosen by `strategy`.
+    Returns {collection_name: records_moved}.
+    """
+    db = ChromaDBClient()
+    router = ShardRouter(
+        db.client, db.router.base_name, strategy, routes_db=db.router.catalog.path, lock_dir=db.router.lock_dir
+    )
+    moved = defaultdict(int)
+    base = db.collection
+    for asset_id, tenant_id in _base_assets(base, batch_size).items():
+        target = router.shard_name(asset_id, tenant_id)
+        if target == base.name:
+            continue
+        if dry_run:
+            records = base.get(where={FileFormat.ASSET_ID.value: asset_id}, include=[])
+            moved[target] += len(records[FileFormat.IDS.value])
+            continue
+        moved[target] += _move_asset(db, router, asset_id, tenant_id, target, batch_size)
+        logger.info("Migrated asset %s to %s", asset_id, target)
+    return dict(moved)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate the documents collection into shards.")
+    parser.add_argument(
+        "--strategy",
+        default=SHARD_SETTINGS.STRATEGY,
+        choices=[s.value for s in ShardStrategy],
+    )
+    parser.add_argument("--batch-size", type=int, default=SHARD_SETTINGS.MIGRATE_BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    configure_logging()
+    if args.strategy != SHARD_SETTINGS.STRATEGY:
+        logger.warning(
+            "Migrating with strategy '%s' but new writes use '%s'; set CHROMA_SHARD_STRATEGY to match.",
+            args.strategy,
+            SHARD_SETTINGS.STRATEGY,
+        )
+    moved = migrate(args.strategy, args.batch_size, args.dry_run)
+    for name, count in sorted(moved.items()):
+        print(f"{name}: {count} records{' (dry run)' if args.dry_run else ''}")
+    print(f"total: {sum(moved.values())} records")
+
+
+if __name__ == "__main__":
+    main()
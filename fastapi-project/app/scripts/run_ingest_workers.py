@@ -0,0 +1,67 @@
+"""
+Start one Celery worker per ingestion queue, sized by SCHEDULING_SETTINGS.WORKER_SHARES.
+
+Usage:
+    python -m app.scripts.run_ingest_workers [--concurrency 8] [--pool threads] [--maintenance 1] [--dry-run]
+
+Each class gets dedicated workers (at least one), so bulk backfills can only ever occupy
+their own share and interactive uploads always find a free worker. Stops all workers
+when interrupted.
+"""
+import sys
+import argparse
+import subprocess
+from app.constant import SCHEDULING_SETTINGS
+from app.core.ingest_scheduler import CLASS_ORDER, worker_split
+
+
+def worker_commands(concurrency: int, pool: str, maintenance: int, loglevel: str) -> list:
+    base = [sys.executable, "-m", "celery", "-A", "app.celery_app.celery_app", "worker"]
+    common = [f"--pool={pool}", f"--loglevel={loglevel}"]
+    split = worker_split(concurrency)
+    commands = [
+        base
+        + [
+            "-Q",
+            SCHEDULING_SETTINGS.QUEUES[ingest_class.value],
+            f"--concurrency={split[ingest_class.value]}",
+            "-n",
+            f"{ingest_class.value}@%h",
+        ]
+        + common
+        for ingest_class in CLASS_ORDER
+    ]
+    if maintenance:
+        commands.append(
+            base + ["-Q", "maintenance", f"--concurrency={maintenance}", "-n", "maintenance@%h"] + common
+        )
+    return commands
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Start Celery workers for the ingestion queues.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Ingestion workers in total")
+    parser.add_argument("--pool", default="prefork", help="Celery pool (threads on Windows)")
+    parser.add_argument("--maintenance", type=int, default=1, help="Maintenance workers (0: none)")
+    parser.add_argument("--loglevel", default="info")
+    parser.add_argument("--dry-run", action="store_true", help="Print the commands only")
+    args = parser.parse_args()
+
+    commands = worker_commands(args.concurrency, args.pool, args.maintenance, args.loglevel)
+    for command in commands:
+        print(" ".join(command[1:]))
+    if args.dry_run:
+        return
+    workers = [subprocess.Popen(command) for command in commands]
+    try:
+        for worker in workers:
+            worker.wait()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+Tune HNSW index parameters per collection against real user questions.
+
+Usage:
+    python -m app.scripts.tune_hnsw [--target-recall 0.95] [--questions 200] [--k 4]
+                                    [--collection NAME] [--m 8,16,32] [--construction-ef 64,100,200]
+                                    [--search-ef 10,20,40,80] [--dry-run]
+
+Questions are sampled from chat histories (hot and archived, without rehydrating them),
+embedded with the embedding version's model and searched within their thread's assets,
+as retrieval does. For every collection with enough queries, an index of its vectors is
+built with hnswlib (the library Chroma uses) for each (M, construction_ef) of the grid and
+searched with each search_ef; recall@k is measured against exact search along with the
+per-query latency. The cheapest setting that meets the target recall (lowest mean latency,
+then the smallest graph) is written to HNSW_SETTINGS.PARAMS_FILE for that collection.
+
+Chroma reads index parameters only when a collection's index is created, so new
+parameters (search_ef included) reach an existing collection when it is next compacted
+(POST /api/chroma/compact or the daily beat task); a new k applies to the next search.
+"""
+import time
+import random
+import argparse
+import logging
+from datetime import datetime
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+import hnswlib
+import numpy as np
+from app.constant import HNSW_SETTINGS, RETENTION_SETTINGS, FileFormat, HnswParam
+from app.core import hnsw_params
+from app.core.db_client import ChromaDBClient
+from app.core.embedder import get_embedder
+from app.core.embedding_versions import active_version
+from app.core.logging_config import configure_logging
+from app.services.chat_manager import all_thread_assets
+from app.services.history import peek_history
+
+logger = logging.getLogger("hnsw-tuning")
+
+
+def sample_questions(limit: int, seed: int = 0) -> List[Tuple[str, List[str]]]:
+    """
+    Up to `limit` distinct (question, asset_ids) pairs from users' chat messages.
+    """
+    questions = set()
+    for thread_id, asset_ids in all_thread_assets().items():
+        asset_ids = tuple(a for a in asset_ids if a)
+        if not asset_ids:
+            continue
+        for message in peek_history(thread_id):
+            text = (message.get("message") or "").strip()
+            if message.get("sender") == "user" and text:
+                questions.add((text, asset_ids))
+    questions = sorted(questions)
+    random.Random(seed).shuffle(questions)
+    return [(text, list(asset_ids)) for text, asset_ids in questions[:limit]]
+
+
+def load_vectors(collection) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    All vectors of a collection as one float32 array, and {asset_id: row labels}.
+    """
+    batch = RETENTION_SETTINGS.COMPACT_BATCH_SIZE
+    vectors, assets = [], []
+    total = collection.count()
+    # Bounded by count(): Chroma 0.4 returns every vector when an embeddings page comes back empty
+    while len(assets) < total:
+        page = collection.get(
+            limit=batch,
+            offset=len(assets),
+            include=[FileFormat.EMBEDDINGS.value, FileFormat.METADATAS.value],
+        )
+        if not page.get(FileFormat.IDS.value):
+            break
+        vectors.append(np.asarray(page[FileFormat.EMBEDDINGS.value], dtype=np.float32))
+        assets.extend(m.get(FileFormat.ASSET_ID.value) for m in page[FileFormat.METADATAS.value])
+    labels = defaultdict(list)
+    for label, asset_id in enumerate(assets):
+        labels[asset_id].append(label)
+    matrix = np.concatenate(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+    return matrix, {asset_id: np.asarray(rows) for asset_id, rows in labels.items()}
+
+
+def _distances(space: str, vectors: np.ndarray, query: np.ndarray) -> np.ndarray:
+    # Same distances as hnswlib: squared L2, 1 - inner product, 1 - cosine similarity
+    if space == "l2":
+        diff = vectors - query
+        return np.einsum("ij,ij->i", diff, diff)
+    if space == "cosine":
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+    return 1.0 - vectors @ query
+
+
+def exact_neighbours(space, vectors, rows, query, k) -> set:
+    distances = _distances(space, vectors[rows], query)
+    return set(rows[np.argsort(distances, kind="stable")[:k]].tolist())
+
+
+def measure(index, queries, k: int) -> dict:
+    """
+    recall@k and per-query latency of an index over (vector, allowed labels, exact neighbours).
+    """
+    recalls, latencies = [], []
+    for vector, allowed, truth in queries:
+        top = min(k, len(allowed))
+        start = time.perf_counter()
+        try:
+            found, _ = index.knn_query(vector, k=top, num_threads=1, filter=allowed.__contains__)
+            hits = len(truth & set(found[0].tolist()))
+        except RuntimeError:
+            # Fewer than k reachable under the filter (Chroma raises the same way)
+            hits = 0
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(hits / top)
+    latencies.sort()
+    return {
+        FileFormat.RECALL.value: round(float(np.mean(recalls)), 4),
+        FileFormat.MEAN_MS.value: round(float(np.mean(latencies)), 4),
+        FileFormat.P95_MS.value: round(latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))], 4),
+    }
+
+
+def tune_collection(collection, queries, params: dict, grid: dict, target: float) -> Tuple[Optional[dict], list]:
+    """
+    Measure every grid point on one collection. Returns (cheapest point meeting the
+    target or None, all measured points).
+    """
+    space = hnsw_params.space_of(collection)
+    k = params[HnswParam.K.value]
+    vectors, labels = load_vectors(collection)
+    prepared = []
+    for vector, asset_id in queries:
+        rows = labels.get(asset_id)
+        if rows is None or vector.shape[0] != vectors.shape[1]:
+            continue
+        truth = exact_neighbours(space, vectors, rows, vector, min(k, len(rows)))
+        prepared.append((vector, set(rows.tolist()), truth))
+    if len(prepared) < HNSW_SETTINGS.MIN_QUERIES:
+        logger.info("Skipping %s: %d usable queries", collection.name, len(prepared))
+        return None, []
+
+    # The collection's current setting is always measured, as the baseline
+    m_values = sorted(set(grid[HnswParam.M]) | {params[HnswParam.M.value]})
+    cef_values = sorted(set(grid[HnswParam.CONSTRUCTION_EF]) | {params[HnswParam.CONSTRUCTION_EF.value]})
+    ef_values = sorted(set(grid[HnswParam.SEARCH_EF]) | {params[HnswParam.SEARCH_EF.value]})
+    points = []
+    for m in m_values:
+        for construction_ef in cef_values:
+            index = hnswlib.Index(space=space, dim=vectors.shape[1])
+            index.init_index(max_elements=len(vectors), ef_construction=construction_ef, M=m)
+            index.add_items(vectors, np.arange(len(vectors)))
+            for search_ef in ef_values:
+                index.set_ef(search_ef)
+                points.append(
+                    {
+                        HnswParam.SPACE.value: space,
+                        HnswParam.M.value: m,
+                        HnswParam.CONSTRUCTION_EF.value: construction_ef,
+                        HnswParam.SEARCH_EF.value: search_ef,
+                        HnswParam.K.value: k,
+                        FileFormat.QUERIES.value: len(prepared),
+                        **measure(index, prepared, k),
+                    }
+                )
+    passing = [p for p in points if p[FileFormat.RECALL.value] >= target]
+    best = min(
+        passing,
+        key=lambda p: (
+            p[FileFormat.MEAN_MS.value],
+            p[HnswParam.M.value],
+            p[HnswParam.CONSTRUCTION_EF.value],
+            p[HnswParam.SEARCH_EF.value],
+        ),
+        default=None,
+    )
+    return best, points
+
+
+def tune(
+    version: str,
+    target: float,
+    questions: int,
+    grid: dict,
+    k: Optional[int] = None,
+    names: Optional[List[str]] = None,
+    dry_run: bool = False,
+) -> Dict[str, dict]:
+    """
+    Tune every collection of `version` that the sampled questions search.
+    Returns {collection name: chosen params and stats}.
+    """
+    db = ChromaDBClient()
+    router = db.router_for(version)
+    sampled = sample_questions(questions)
+    if not sampled:
+        logger.warning("No user questions found in chat histories; nothing to tune")
+        return {}
+    vectors = get_embedder(version).encode([text for text, _ in sampled])
+    queries = defaultdict(list)
+    for vector, (_, asset_ids) in zip(vectors, sampled):
+        for asset_id in asset_ids:
+            queries[router.catalog.get(asset_id) or router.base_name].append((vector, asset_id))
+
+    chosen = {}
+    for name, collection_queries in sorted(queries.items()):
+        if names and name not in names:
+            continue
+        collection = router.get_collection(name)
+        if collection is None:
+            continue
+        params = router.params_for(name)
+        if k:
+            params[HnswParam.K.value] = k
+        best, points = tune_collection(collection, collection_queries, params, grid, target)
+        current = next(
+            (
+                p
+                for p in points
+                if all(p[key.value] == params[key.value] for key in grid)
+            ),
+            None,
+        )
+        for point in points:
+            print(
+                f"{name}: M={point[HnswParam.M.value]} construction_ef={point[HnswParam.CONSTRUCTION_EF.value]} "
+                f"search_ef={point[HnswParam.SEARCH_EF.value]} recall={point[FileFormat.RECALL.value]:.3f} "
+                f"mean={point[FileFormat.MEAN_MS.value]:.3f}ms p95={point[FileFormat.P95_MS.value]:.3f}ms"
+                f"{' <- current' if point is current else ''}{' <- chosen' if point is best else ''}"
+            )
+        if points and best is None:
+            best_recall = max(p[FileFormat.RECALL.value] for p in points)
+            logger.warning(
+                "%s: no setting reaches recall %.3f (best %.3f); left unchanged", name, target, best_recall
+            )
+        if best is not None:
+            chosen[name] = {**best, FileFormat.TUNED_AT.value: datetime.utcnow().isoformat() + "Z"}
+    if chosen and not dry_run:
+        hnsw_params.save_tuned(chosen)
+    return chosen
+
+
+def _ints(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune HNSW parameters per collection.")
+    parser.add_argument("--version", default=None, help="Embedding version (default: active)")
+    parser.add_argument("--target-recall", type=float, default=HNSW_SETTINGS.TARGET_RECALL)
+    parser.add_argument("--questions", type=int, default=HNSW_SETTINGS.SAMPLE_QUESTIONS)
+    parser.add_argument("--k", type=int, default=None, help="Tune for this k (default: each collection's)")
+    parser.add_argument("--collection", action="append", help="Only these collections (repeatable)")
+    parser.add_argument("--m", type=_ints, default=list(HNSW_SETTINGS.GRID_M))
+    parser.add_argument("--construction-ef", type=_ints, default=list(HNSW_SETTINGS.GRID_CONSTRUCTION_EF))
+    parser.add_argument("--search-ef", type=_ints, default=list(HNSW_SETTINGS.GRID_SEARCH_EF))
+    parser.add_argument("--dry-run", action="store_true", help="Measure only; do not write the params file")
+    args = parser.parse_args()
+    configure_logging()
+    grid = {
+        HnswParam.M: args.m,
+        HnswParam.CONSTRUCTION_EF: args.construction_ef,
+        HnswParam.SEARCH_EF: args.search_ef,
+    }
+    chosen = tune(
+        args.version or active_version(),
+        args.target_recall,
+        args.questions,
+        grid,
+        k=args.k,
+        names=args.collection,
+        dry_run=args.dry_run,
+    )
+    for name, params in sorted(chosen.items()):
+        print(
+            f"{name}: M={params[HnswParam.M.value]} construction_ef={params[HnswParam.CONSTRUCTION_EF.value]} "
+            f"search_ef={params[HnswParam.SEARCH_EF.value]} k={params[HnswParam.K.value]} "
+            f"(recall {params[FileFormat.RECALL.value]:.3f}, mean {params[FileFormat.MEAN_MS.value]:.3f}ms)"
+            f"{' (dry run)' if args.dry_run else ''}"
+        )
+    if chosen and not args.dry_run:
+        print(f"Written to {HNSW_SETTINGS.PARAMS_FILE}; compact to rebuild indexes with the new parameters")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Precomputed asset summaries for whole-document questions.
+
+After ingestion (SUMMARY_SETTINGS.ENABLED) each asset gets a hierarchical map-reduce
+summary: consecutive chunks are summarized a section at a time (at most MAP_MAX_CALLS
+map calls per asset), the partial summaries are merged REDUCE_FANIN at a time, level by
+level, until one is left, and a key-topic outline is extracted from it. The result is kept
+next to the asset in asset_summaries/<asset_id>.json, so "summarize this document" is
+answered from disk instead of two LLM calls over two chunks.
+
+Every call takes a slot of the summary lane of llm_admission (the lowest priority) and is
+charged to the tenant's token quota, so summaries never crowd out interactive chat.
+"""
+import os
+import re
+import json
+import math
+import time
+import logging
+from datetime import datetime
+from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+import app.constant as constant
+from app.constant import DIRECTORY, FileFormat, LLMLane, SHARD_SETTINGS, SUMMARY_SETTINGS
+from app.core.db_client import ChromaDBClient
+from app.core.llm_client import build_chat_model
+from app.core.admission import admitted_call
+from app.core.token_quota import TokenQuotaExceeded, estimate_tokens, reserve_tokens, settle_tokens
+from app.core.atomic_write import write_json_atomic
+
+logger = logging.getLogger("asset-summary")
+
+_SUMMARY_DIR = DIRECTORY.ASSET_SUMMARIES.value
+# Leading bullet or numbering on a topic line ("- ", "* ", "1. ", "2) ")
+_BULLET = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*")
+_OVERVIEW = [
+    re.compile(pattern.format(subject=SUMMARY_SETTINGS.OVERVIEW_SUBJECT))
+    for pattern in SUMMARY_SETTINGS.OVERVIEW_PATTERNS
+]
+
+chroma_client = ChromaDBClient()
+_llm = None
+
+
+def _model():
+    # Plain (not hedged) model: summaries run in workers, where latency does not matter
+    global _llm
+    if _llm is None:
+        _llm = build_chat_model(SUMMARY_SETTINGS.MODEL, temperature=0)
+    return _llm
+
+
+def _reserve(quota_key: str, cost: int):
+    # Wait for the tenant's quota up to MAX_QUOTA_WAIT; beyond that the task is retried later
+    deadline = time.monotonic() + SUMMARY_SETTINGS.MAX_QUOTA_WAIT
+    while True:
+        allowed, retry_after = reserve_tokens(quota_key, cost)
+        if allowed:
+            return
+        if time.monotonic() + retry_after > deadline:
+            raise TokenQuotaExceeded(quota_key, cost, retry_after)
+        time.sleep(retry_after)
+
+
+def _complete(quota_key: str, template: str, **fields) -> str:
+    prompt = template.format(**fields)
+    prompt_tokens = estimate_tokens(prompt)
+    reserved = prompt_tokens + SUMMARY_SETTINGS.COMPLETION_TOKEN_ESTIMATE
+    _reserve(quota_key, reserved)
+    spent = 0
+    try:
+        text = admitted_call(LLMLane.SUMMARY, _model().invoke, prompt).content.strip()
+        spent = prompt_tokens + estimate_tokens(text)
+        return text
+    finally:
+        settle_tokens(quota_key, reserved, spent)
+
+
+def _summary_file(asset_id: str) -> str:
+    return os.path.join(_SUMMARY_DIR, f"{asset_id}.json")
+
+
+def map_sections(chunks: List[str]) -> List[str]:
+    """
+    Group consecutive chunks into at most MAP_MAX_CALLS sections of MAP_CHUNKS_PER_CALL to
+    MAP_MAX_CHUNKS_PER_CALL chunks. Documents too long for that are summarized from evenly
+    spaced sections.
+    """
+    per_call = max(
+        SUMMARY_SETTINGS.MAP_CHUNKS_PER_CALL,
+        min(SUMMARY_SETTINGS.MAP_MAX_CHUNKS_PER_CALL, math.ceil(len(chunks) / SUMMARY_SETTINGS.MAP_MAX_CALLS)),
+    )
+    sections = ["\n\n".join(chunks[i : i + per_call]) for i in range(0, len(chunks), per_call)]
+    if len(sections) > SUMMARY_SETTINGS.MAP_MAX_CALLS:
+        step = len(sections) / SUMMARY_SETTINGS.MAP_MAX_CALLS
+        sections = [sections[int(i * step)] for i in range(SUMMARY_SETTINGS.MAP_MAX_CALLS)]
+    return sections
+
+
+def _map(quota_key: str, file_name: str, chunks: List[str]) -> List[str]:
+    sections = map_sections(chunks)
+    # A single-section document is summarized straight to the final length
+    max_words = SUMMARY_SETTINGS.SUMMARY_MAX_WORDS if len(sections) == 1 else SUMMARY_SETTINGS.MAP_MAX_WORDS
+    with ThreadPoolExecutor(max_workers=SUMMARY_SETTINGS.MAP_CONCURRENCY) as pool:
+        return list(
+            pool.map(
+                lambda text: _complete(
+                    quota_key, constant.summary_map_prompt, file_name=file_name, max_words=max_words, text=text
+                ),
+                sections,
+            )
+        )
+
+
+def _reduce(quota_key: str, file_name: str, summaries: List[str]) -> str:
+    fanin = SUMMARY_SETTINGS.REDUCE_FANIN
+    while len(summaries) > 1:
+        groups = [summaries[i : i + fanin] for i in range(0, len(summaries), fanin)]
+        with ThreadPoolExecutor(max_workers=SUMMARY_SETTINGS.MAP_CONCURRENCY) as pool:
+            summaries = list(
+                pool.map(
+                    lambda group: _complete(
+                        quota_key,
+                        constant.summary_reduce_prompt,
+                        file_name=file_name,
+                        max_words=SUMMARY_SETTINGS.SUMMARY_MAX_WORDS,
+                        text="\n\n".join(group),
+                    ),
+                    groups,
+                )
+            )
+    return summaries[0]
+
+
+def _parse_topics(text: str) -> List[str]:
+    topics = [_BULLET.sub("", line).strip() for line in text.splitlines()]
+    return [t for t in topics if t][: SUMMARY_SETTINGS.MAX_TOPICS]
+
+
+def build_summary(asset_id: str) -> Optional[dict]:
+    """
+    Summarize a stored asset from its chunks and save the result.
+    Returns {"asset_id", "file_name", "summary", "topics", ...}, or None if the asset is unknown.
+    Raises AdmissionRejected or TokenQuotaExceeded when the LLM budget is exhausted.
+    """
+    metadata = chroma_client.asset_metadata(asset_id)
+    chunks = chroma_client.asset_chunks(asset_id) if metadata else []
+    if not chunks:
+        return None
+    file_name = metadata.get(FileFormat.FILE_NAME.value, "")
+    tenant_id = metadata.get(FileFormat.TENANT_ID.value) or SHARD_SETTINGS.DEFAULT_TENANT
+    quota_key = f"{SUMMARY_SETTINGS.QUOTA_KEY_PREFIX}{tenant_id}"
+    summary = _reduce(quota_key, file_name, _map(quota_key, file_name, chunks))
+    topics = _parse_topics(
+        _complete(
+            quota_key,
+            constant.summary_topics_prompt,
+            file_name=file_name,
+            max_topics=SUMMARY_SETTINGS.MAX_TOPICS,
+            text=summary,
+        )
+    )
+    record = {
+        FileFormat.ASSET_ID.value: asset_id,
+        FileFormat.FILE_NAME.value: file_name,
+        FileFormat.SUMMARY.value: summary,
+        FileFormat.TOPICS.value: topics,
+        FileFormat.MODEL.value: SUMMARY_SETTINGS.MODEL,
+        FileFormat.CHUNKS.value: len(chunks),
+        FileFormat.CONTENT_HASH.value: metadata.get(FileFormat.CONTENT_HASH.value),
+        FileFormat.CREATED_AT.value: datetime.utcnow().isoformat() + "Z",
+    }
+    write_json_atomic(_summary_file(asset_id), record)
+    logger.info("Summarized asset_id=%s from %d chunks (%d topics)", asset_id, len(chunks), len(topics))
+    return record
+
+
+def load_summary(asset_id: str) -> Optional[dict]:
+    path = _summary_file(asset_id)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def remove_summary(asset_id: str):
+    path = _summary_file(asset_id)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _normalize(message: str) -> str:
+    text = " ".join(message.lower().replace("\u2019", "'").split())
+    text = text.rstrip("?.! ")
+    for polite in ("please ", "pls "):
+        if text.startswith(polite):
+            text = text[len(polite) :]
+    for polite in (" please", " pls", ","):
+        if text.endswith(polite):
+            text = text[: -len(polite)]
+    return text.strip()
+
+
+def is_overview_question(message: str) -> bool:
+    """
+    True only when the whole message asks about the document as a whole ("summarize this",
+    "what is this document about"). Anything naming something specific ("summarize
+    section 3", "what does the summary say about revenue") goes through retrieval.
+    """
+    text = _normalize(message)
+    return any(pattern.fullmatch(text) for pattern in _OVERVIEW)
+
+
+def overview_answer(asset_ids: List[str]) -> Optional[str]:
+    """
+    Answer built from the precomputed summaries of every asset, or None if any is missing.
+    """
+    records = [load_summary(asset_id) for asset_id in asset_ids]
+    if not records or not all(records):
+        return None
+    parts = []
+    for record in records:
+        section = record[FileFormat.SUMMARY.value]
+        if record[FileFormat.TOPICS.value]:
+            section += "\n\nKey topics:\n" + "\n".join(f"- {t}" for t in record[FileFormat.TOPICS.value])
+        if len(records) > 1:
+            section = f"{record[FileFormat.FILE_NAME.value]}\n{section}"
+        parts.append(section)
+    return "\n\n".join(parts)
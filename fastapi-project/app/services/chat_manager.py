@@ -3,25 +3,45 @@ from app.core.chroma import ChromaDBClient
 
 chroma_client = ChromaDBClient()
 from app.constant import DIRECTORY, FileFormat
+from app.core.atomic_write import write_json_atomic
 from datetime import datetime
+from filelock import FileLock
 import os, json
 
 # Path to the thread-asset mapping JSON file
 _THREAD_DB = DIRECTORY.THREAD_ASSET_MAP.value
 
 
+# The API, the reaper (Celery or embedded worker) and the DELETE endpoints all rewrite the
+# map: every read-modify-write holds this lock, and writes replace the file atomically
+def _threads_lock():
+    return FileLock(os.path.abspath(_THREAD_DB + ".lock"), is_singleton=True)
+
+
+def _read_threads():
+    if not os.path.exists(_THREAD_DB):
+        return {}
+    with open(_THREAD_DB, "r") as f:
+        return json.load(f)
+
+
+def load_threads() -> dict:
+    """
+    Return the whole thread-asset map ({} if there is none yet).
+    """
+    with _threads_lock():
+        return _read_threads()
+
+
 def update_last_used(thread_id):
     """
     Update the 'last_used' timestamp for a chat thread.
     """
-    if not os.path.exists(_THREAD_DB):
-        return
-    with open(_THREAD_DB, "r") as f:
-        data = json.load(f)
-    if thread_id in data:
-        data[thread_id][FileFormat.LAST_USED.value] = datetime.utcnow().isoformat() + "Z"
-        with open(_THREAD_DB, "w") as f2:
-            json.dump(data, f2)
+    with _threads_lock():
+        data = _read_threads()
+        if thread_id in data:
+            data[thread_id][FileFormat.LAST_USED.value] = datetime.utcnow().isoformat() + "Z"
+            write_json_atomic(_THREAD_DB, data)
 
 
 def validate_asset_id(asset_id: str) -> bool:
@@ -31,21 +51,24 @@ def validate_asset_id(asset_id: str) -> bool:
     return chroma_client.asset_exists(asset_id)
 
 
-def create_chat_thread(asset_id: str) -> str:
+def create_chat_thread(asset_id: str = None, asset_ids: list = None) -> str:
     """
-    Create a new chat thread for the given asset_id and store its metadata.
+    Create a new chat thread for one asset (asset_id) or a set of assets (asset_ids)
+    and store its metadata. 'asset_id' keeps the first asset for older readers.
     Returns the new thread_id.
     """
+    asset_ids = list(dict.fromkeys(asset_ids or [asset_id]))
     thread_id = str(uuid.uuid4())
     now = datetime.utcnow().isoformat() + "Z"
-    if os.path.exists(_THREAD_DB):
-        with open(_THREAD_DB, "r") as f:
-            data = json.load(f)
-    else:
-        data = {}
-    data[thread_id] = {FileFormat.ASSET_ID.value: asset_id, FileFormat.CREATED_AT.value: now, FileFormat.LAST_USED.value: now}
-    with open(_THREAD_DB, "w") as f:
-        json.dump(data, f)
+    with _threads_lock():
+        data = _read_threads()
+        data[thread_id] = {
+            FileFormat.ASSET_ID.value: asset_ids[0],
+            FileFormat.ASSET_IDS.value: asset_ids,
+            FileFormat.CREATED_AT.value: now,
+            FileFormat.LAST_USED.value: now,
+        }
+        write_json_atomic(_THREAD_DB, data)
     return thread_id
 
 
@@ -55,14 +78,124 @@ def get_asset_id_for_thread(thread_id: str) -> str:
     """
     if not os.path.exists(_THREAD_DB):
         raise KeyError(f"Thread DB not found: {_THREAD_DB}")
-    with open(_THREAD_DB, "r") as f:
-        data = json.load(f)
+    data = load_threads()
     entry = data.get(thread_id)
     if isinstance(entry, dict):
         return entry.get(FileFormat.ASSET_ID.value)
     return entry  # fallback for old format
 
 
+def thread_asset_ids(entry) -> list:
+    """
+    Return the asset_ids of a thread-map entry, for single- and multi-asset threads
+    and the old plain-string format.
+    """
+    if isinstance(entry, dict):
+        return entry.get(FileFormat.ASSET_IDS.value) or [entry.get(FileFormat.ASSET_ID.value)]
+    return [entry] if entry else []
+
+
+def get_asset_ids_for_thread(thread_id: str) -> list:
+    """
+    Retrieve every asset_id a thread searches, from the thread-asset map.
+    """
+    if not os.path.exists(_THREAD_DB):
+        raise KeyError(f"Thread DB not found: {_THREAD_DB}")
+    data = load_threads()
+    return thread_asset_ids(data.get(thread_id))
+
+
+def parse_timestamp(value):
+    """
+    Parse a stored ISO timestamp ("...Z"); returns None if missing or malformed.
+    """
+    try:
+        return datetime.fromisoformat(value.rstrip("Z"))
+    except (AttributeError, ValueError):
+        return None
+
+
+def delete_thread(thread_id: str) -> bool:
+    """
+    Remove a thread from the thread-asset map. Returns False if it did not exist.
+    """
+    with _threads_lock():
+        data = _read_threads()
+        if thread_id not in data:
+            return False
+        del data[thread_id]
+        write_json_atomic(_THREAD_DB, data)
+    return True
+
+
+def threads_for_asset(asset_id: str) -> list:
+    """
+    Return the thread_ids that search an asset.
+    """
+    return [
+        tid
+        for tid, raw in load_threads().items()
+        if asset_id in thread_asset_ids(raw)
+    ]
+
+
+def detach_asset(thread_id: str, asset_id: str) -> list:
+    """
+    Remove an asset from a thread's asset set and return the assets left.
+    A thread left with no assets is not removed here; callers delete it.
+    """
+    with _threads_lock():
+        data = _read_threads()
+        entry = data.get(thread_id)
+        if not isinstance(entry, dict):
+            return []
+        remaining = [a for a in thread_asset_ids(entry) if a != asset_id]
+        if remaining:
+            entry[FileFormat.ASSET_ID.value] = remaining[0]
+            entry[FileFormat.ASSET_IDS.value] = remaining
+            write_json_atomic(_THREAD_DB, data)
+    return remaining
+
+
+def all_thread_assets() -> dict:
+    """
+    Return {thread_id: asset_ids} for every thread.
+    """
+    return {tid: thread_asset_ids(raw) for tid, raw in load_threads().items()}
+
+
+def find_idle_threads(max_idle_seconds: int, now: datetime = None) -> list:
+    """
+    Return thread_ids whose 'last_used' is older than max_idle_seconds.
+    """
+    now = now or datetime.utcnow()
+    idle = []
+    for tid, raw in load_threads().items():
+        if not isinstance(raw, dict):
+            continue
+        last_used = parse_timestamp(raw.get(FileFormat.LAST_USED.value))
+        if last_used and (now - last_used).total_seconds() > max_idle_seconds:
+            idle.append(tid)
+    return idle
+
+
+def asset_last_used() -> dict:
+    """
+    Return {asset_id: datetime} with the most recent 'last_used' across each asset's threads.
+    """
+    latest = {}
+    for raw in load_threads().values():
+        if not isinstance(raw, dict):
+            continue
+        last_used = parse_timestamp(raw.get(FileFormat.LAST_USED.value))
+        if not last_used:
+            continue
+        for asset_id in thread_asset_ids(raw):
+            if asset_id and (asset_id not in latest or last_used > latest[asset_id]):
+                latest[asset_id] = last_used
+    return latest
+
+
 # Local json-based DB for thread<>asset mapping
 class ChatThreadDB:
     @staticmethod
@@ -71,19 +204,18 @@ class ChatThreadDB:
         Save a new thread with its associated asset_id to the thread-asset map.
         """
         now = datetime.utcnow().isoformat() + "Z"
-        data = {}
-        if os.path.exists(_THREAD_DB):
+        with _threads_lock():
+            data = {}
             try:
-                data = json.load(open(_THREAD_DB, "r"))
+                data = _read_threads()
             except Exception:
                 pass
-        data[thread_id] = {
-            FileFormat.ASSET_ID.value: asset_id,
-            FileFormat.CREATED_AT.value: now,
-            FileFormat.LAST_USED.value: now,
-        }
-        with open(_THREAD_DB, "w") as f:
-            json.dump(data, f)
+            data[thread_id] = {
+                FileFormat.ASSET_ID.value: asset_id,
+                FileFormat.CREATED_AT.value: now,
+                FileFormat.LAST_USED.value: now,
+            }
+            write_json_atomic(_THREAD_DB, data)
 
     @staticmethod
     def read_thread(thread_id: str) -> str:
@@ -92,5 +224,4 @@ class ChatThreadDB:
         """
         if not os.path.exists(_THREAD_DB):
             raise KeyError(f"Thread DB not found: {_THREAD_DB}")
-        data = json.load(open(_THREAD_DB, "r"))
-        return data.get(thread_id)
+        return load_threads().get(thread_id)
@@ -69,6 +69,13 @@ def get_all_documents():
     return [StoredDocumentInfo(**doc) for doc in documents.values()]
 
 
+def list_asset_ids():
+    """
+    Return the ids of every stored asset (across all shard collections).
+    """
+    return list(chroma_client.list_assets())
+
+
 def list_chroma_files():
     """
     List all files and directories in the ChromaDB persistent directory (for debugging/ops).
@@ -0,0 +1,152 @@
+"""
+Background re-embedding into a new embedding version.
+
+Chunks are copied from the active version to the target version with their ids,
+documents and metadata unchanged; only the vectors are recomputed (from the stored chunk
+text, so no file is parsed again). An asset counts as migrated when both versions hold
+the same chunk ids, which makes the job safe to stop and resume at any point. That is only
+sound because a target never holds older vectors: its storage is emptied when a migration
+starts and when it is aborted.
+"""
+import time
+import logging
+from typing import Optional
+from app.constant import EMBEDDING_SETTINGS, FileFormat
+from app.core.db_client import ChromaDBClient, as_chroma_embeddings
+from app.core.embedder import get_embedder
+from app.core import embedding_versions
+from app.core.embedding_versions import (
+    active_version,
+    target_version,
+    model_name,
+    save_progress,
+    migration_lock,
+)
+
+logger = logging.getLogger("embedding-migration")
+
+chroma_client = ChromaDBClient()
+
+
+def _asset_records(asset_id: str, version: str, include=()):
+    collection = chroma_client.router_for(version).collection_for_asset(asset_id)
+    if collection is None:
+        return {FileFormat.IDS.value: [], **{key: [] for key in include}}
+    return collection.get(where={FileFormat.ASSET_ID.value: asset_id}, include=list(include))
+
+
+def pending_assets(source: str, target: str) -> list:
+    """
+    Return the asset ids of `source` whose chunks are not all present in `target`.
+    """
+    pending = []
+    for asset_id in chroma_client.list_assets(version=source):
+        src = _asset_records(asset_id, source)
+        dst = _asset_records(asset_id, target)
+        if set(src[FileFormat.IDS.value]) != set(dst[FileFormat.IDS.value]):
+            pending.append(asset_id)
+    return pending
+
+
+def _reembed_asset(asset_id: str, source: str, target: str) -> int:
+    """
+    Re-embed one asset's stored chunks with the target model. Returns chunks written.
+    """
+    records = _asset_records(
+        asset_id, source, include=(FileFormat.DOCUMENTS.value, FileFormat.METADATAS.value)
+    )
+    ids = records[FileFormat.IDS.value]
+    # Start clean so chunks dropped from the source (e.g. by a re-index) do not linger
+    chroma_client.delete_asset(asset_id, version=target)
+    if not ids:
+        return 0
+    tenant_id = records[FileFormat.METADATAS.value][0].get(FileFormat.TENANT_ID.value)
+    router = chroma_client.router_for(target)
+    name = router.route_for_write(asset_id, tenant_id)
+    embedder = get_embedder(target)
+    batch_size = EMBEDDING_SETTINGS.REEMBED_BATCH_SIZE
+    for start in range(0, len(ids), batch_size):
+        started = time.monotonic()
+        documents = records[FileFormat.DOCUMENTS.value][start : start + batch_size]
+        embeddings = as_chroma_embeddings(embedder.encode(documents))
+        with router.writing(name) as collection:
+            collection.upsert(
+                ids=ids[start : start + batch_size],
+                embeddings=embeddings,
+                documents=documents,
+                metadatas=[
+                    m | {FileFormat.EMBEDDING_VERSION.value: target}
+                    for m in records[FileFormat.METADATAS.value][start : start + batch_size]
+                ],
+            )
+        # Rate limit: never exceed REEMBED_CHUNKS_PER_SECOND on average
+        min_duration = len(documents) / EMBEDDING_SETTINGS.REEMBED_CHUNKS_PER_SECOND
+        elapsed = time.monotonic() - started
+        if elapsed < min_duration:
+            time.sleep(min_duration - elapsed)
+    return len(ids)
+
+
+def reembed_pending(time_budget: Optional[float] = None) -> dict:
+    """
+    Re-embed pending assets into the target version until done or `time_budget` seconds pass.
+    Returns the progress report ({"assets_total", "assets_done", "pending_assets", ...}).
+    """
+    source, target = active_version(), target_version()
+    if not target:
+        return {FileFormat.PENDING_ASSETS.value: 0}
+    deadline = time.monotonic() + time_budget if time_budget else None
+    pending = pending_assets(source, target)
+    total = len(chroma_client.list_assets(version=source))
+    done = total - len(pending)
+    chunks = 0
+
+    def report():
+        return {
+            FileFormat.ACTIVE.value: source,
+            FileFormat.TARGET.value: target,
+            FileFormat.MODEL.value: model_name(target),
+            FileFormat.ASSETS_TOTAL.value: total,
+            FileFormat.ASSETS_DONE.value: done,
+            FileFormat.PENDING_ASSETS.value: len(pending),
+            FileFormat.CHUNKS_REEMBEDDED.value: chunks,
+        }
+
+    for asset_id in list(pending):
+        if deadline and time.monotonic() > deadline:
+            break
+        # Held per asset, so an abort or cutover never lands while an asset is half-copied
+        with migration_lock():
+            if target_version() != target:
+                logger.warning("Migration to %s was aborted or cut over; stopping", target)
+                break
+            chunks += _reembed_asset(asset_id, source, target)
+        pending.remove(asset_id)
+        done += 1
+        save_progress(**report())
+    logger.info(
+        "Re-embedding %s -> %s: %d/%d assets, %d pending", source, target, done, total, len(pending)
+    )
+    return report()
+
+
+def start(version: str) -> dict:
+    """
+    Start migrating to `version`, with its storage emptied of vectors from any earlier attempt.
+    """
+    return embedding_versions.start_migration(version, prepare=chroma_client.drop_version)
+
+
+def abort() -> dict:
+    """
+    Abandon the migration and drop what was re-embedded into the target so far.
+    """
+    return embedding_versions.abort_migration(cleanup=chroma_client.drop_version)
+
+
+def cutover(force: bool = False) -> dict:
+    """
+    Switch retrieval to the target version; refused (MigrationPending) while assets are
+    pending unless `force`.
+    """
+    return embedding_versions.cutover(pending=None if force else pending_assets)
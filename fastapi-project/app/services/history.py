@@ -1,9 +1,14 @@
-import os, json
+import os, json, time
+from collections import defaultdict
 from datetime import datetime
 from app.models.chat import ChatMessage
-from app.constant import DIRECTORY
+from app.constant import DIRECTORY, HISTORY_SETTINGS
+from app.services import history_archive
+from app.core.conditional import file_version
+from app.core.atomic_write import write_json_atomic
 
 # Directory where chat histories are stored (one file per thread)
+# Idle histories are moved to compressed archive segments (see history_archive)
 _HISTORY_DIR = DIRECTORY.CHAT_HISTORIES.value
 os.makedirs(_HISTORY_DIR, exist_ok=True)
 
@@ -15,6 +20,10 @@ def _history_file(thread_id):
     return os.path.join(_HISTORY_DIR, f"{thread_id}.json")
 
 
+def _write_history(thread_id, history):
+    write_json_atomic(_history_file(thread_id), history)
+
+
 def add_message(thread_id, message, sender):
     """
     Add a message to the chat history for a thread.
@@ -24,17 +33,76 @@ def add_message(thread_id, message, sender):
     msg = ChatMessage(message=message, sender=sender, timestamp=ts).dict()
     history = get_history(thread_id)
     history.append(msg)
-    with open(_history_file(thread_id), "w") as f:
-        json.dump(history, f)
+    _write_history(thread_id, history)
 
 
 def get_history(thread_id):
     """
     Retrieve the chat history for a thread as a list of messages.
+    Hot histories are read from their JSON file; archived ones are decompressed
+    and rehydrated back into the hot tier on access.
     Returns an empty list if no history exists.
     """
     path = _history_file(thread_id)
     if os.path.exists(path):
         with open(path, "r") as f:
             return json.load(f)
-    return []
+    raw = history_archive.read_archived(thread_id)
+    if raw is None:
+        return []
+    history = json.loads(raw)
+    _write_history(thread_id, history)
+    history_archive.remove_archived(thread_id)
+    return history
+
+
+def peek_history(thread_id):
+    """
+    Read a thread's history without rehydrating it (for offline tools); [] if none.
+    """
+    path = _history_file(thread_id)
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return json.load(f)
+    raw = history_archive.read_archived(thread_id)
+    return json.loads(raw) if raw is not None else []
+
+
+def history_version(thread_id):
+    """
+    Version of a thread's hot history (changes on every write), or None when the
+    history is archived or missing. Never reads the history itself.
+    """
+    return file_version(_history_file(thread_id))
+
+
+def delete_history(thread_id):
+    """
+    Delete the chat history for a thread (hot file and archived copy).
+    Returns False if none existed.
+    """
+    deleted = history_archive.remove_archived(thread_id)
+    path = _history_file(thread_id)
+    if os.path.exists(path):
+        os.remove(path)
+        deleted = True
+    return deleted
+
+
+def archive_idle_histories(max_idle_seconds=HISTORY_SETTINGS.ARCHIVE_AFTER):
+    """
+    Move histories not written for max_idle_seconds into compressed archive shards.
+    Returns the number of threads archived.
+    """
+    cutoff = time.time() - max_idle_seconds
+    by_shard = defaultdict(dict)
+    with os.scandir(_HISTORY_DIR) as entries:
+        for entry in entries:
+            if not entry.is_file() or not entry.name.endswith(".json"):
+                continue
+            if entry.stat().st_mtime < cutoff:
+                thread_id = entry.name[: -len(".json")]
+                by_shard[history_archive.shard_of(thread_id)][thread_id] = entry.path
+    return sum(
+        history_archive.archive_shard(shard, paths) for shard, paths in by_shard.items()
+    )
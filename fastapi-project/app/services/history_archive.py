@@ -0,0 +1,271 @@
+"""
+Cold tier for chat histories.
+
+Idle histories are packed into compressed, append-only segment files spread over
+256 shard directories (by sha1 of the thread_id). Histories are concatenated into
+blocks of up to HISTORY_SETTINGS.BLOCK_BYTES and each block is compressed as one zstd
+frame, so text repeated across histories (the same document passages, greetings and
+boilerplate answers) is stored once per block instead of once per history.
+
+Each shard keeps an index.json with a table of blocks (segment, offset, length, codec,
+raw size) and, per thread, its block and its place in the decompressed block, so a single
+history is read back with one seek and one block decompression. Segments are never
+modified once written, and index.json is only ever replaced atomically, so readers need
+no lock. Index updates are serialized per shard with an OS file lock, so the archiver
+(Celery worker) and rehydration/deletion (API) never lose each other's writes.
+"""
+import os
+import json
+import time
+import uuid
+import zlib
+import hashlib
+import logging
+from contextlib import contextmanager
+import zstandard
+from filelock import FileLock
+from app.constant import DIRECTORY, HISTORY_SETTINGS
+from app.core.atomic_write import write_json_atomic
+
+logger = logging.getLogger("history-archive")
+
+_ARCHIVE_DIR = os.path.join(
+    DIRECTORY.CHAT_HISTORIES.value, DIRECTORY.HISTORY_ARCHIVE.value
+)
+_INDEX_FILE = "index.json"
+_LOCK_FILE = ".lock"
+_SEGMENT_EXT = ".seg"
+# Lock-free reads that find their segment rewritten away re-read the index this often
+_READ_ATTEMPTS = 3
+
+# Codec ids are stored per index entry; never change a codec in place, add a new one.
+# zd1 (one zlib stream per history with a preset dictionary) is read only: its entries
+# are repacked into zs1 blocks the next time their shard is archived.
+_ZDICT_V1 = (
+    b'[{"message": "", "sender": "user", "timestamp": "2025-01-01T00:00:00.000000Z"}, '
+    b'{"message": "", "sender": "agent", "timestamp": "2025-01-01T00:00:00.000000Z"}]'
+)
+CODEC_ZLIB_DICT_V1 = "zd1"
+CODEC_ZSTD_BLOCK_V1 = "zs1"
+
+
+def _compress(raw: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=HISTORY_SETTINGS.COMPRESSION_LEVEL).compress(raw)
+
+
+def _decompress(blob: bytes, codec: str) -> bytes:
+    if codec == CODEC_ZSTD_BLOCK_V1:
+        return zstandard.ZstdDecompressor().decompress(blob)
+    if codec == CODEC_ZLIB_DICT_V1:
+        d = zlib.decompressobj(zdict=_ZDICT_V1)
+        return d.decompress(blob) + d.flush()
+    raise ValueError(f"Unknown history codec: {codec}")
+
+
+def shard_of(thread_id: str) -> str:
+    return hashlib.sha1(thread_id.encode()).hexdigest()[: HISTORY_SETTINGS.SHARD_PREFIX_LEN]
+
+
+def _shard_dir(shard: str) -> str:
+    return os.path.join(_ARCHIVE_DIR, shard)
+
+
+@contextmanager
+def shard_lock(shard: str):
+    """
+    Exclusive lock on one shard across processes, re-entrant within a thread.
+    An OS file lock: released when its holder dies, and never broken while it lives.
+    """
+    shard_dir = _shard_dir(shard)
+    os.makedirs(shard_dir, exist_ok=True)
+    with FileLock(os.path.join(shard_dir, _LOCK_FILE), is_singleton=True):
+        yield shard_dir
+
+
+def _load_index(shard: str) -> dict:
+    """
+    {thread_id: [segment, offset, length, codec, start, size, block_size]} of one shard.
+    """
+    path = os.path.join(_shard_dir(shard), _INDEX_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        data = json.load(f)
+    if "threads" not in data:
+        # Flat index of the per-history codec: {thread_id: [segment, offset, length, codec]}
+        return {thread_id: entry + [None, None, None] for thread_id, entry in data.items()}
+    blocks = data["blocks"]
+    return {
+        thread_id: blocks[block][:4] + [start, size, blocks[block][4]]
+        for thread_id, (block, start, size) in data["threads"].items()
+    }
+
+
+def _save_index(shard: str, index: dict):
+    # Stored as a block table plus three numbers per thread, about half the size of
+    # repeating each block's location in every thread's entry
+    blocks, block_ids, threads = [], {}, {}
+    for thread_id, (segment, offset, length, codec, start, size, block_size) in index.items():
+        block = block_ids.setdefault((segment, offset), len(blocks))
+        if block == len(blocks):
+            blocks.append([segment, offset, length, codec, block_size])
+        threads[thread_id] = [block, start, size]
+    write_json_atomic(
+        os.path.join(_shard_dir(shard), _INDEX_FILE),
+        {"blocks": blocks, "threads": threads},
+        separators=(",", ":"),
+    )
+
+
+def _read_entry(shard_dir: str, entry: list, blocks: dict = None) -> bytes:
+    segment, offset, length, codec, start, size, _ = entry
+    key = (segment, offset)
+    block = blocks.get(key) if blocks is not None else None
+    if block is None:
+        with open(os.path.join(shard_dir, segment), "rb") as f:
+            f.seek(offset)
+            block = _decompress(f.read(length), codec)
+        if blocks is not None:
+            blocks[key] = block
+    if codec == CODEC_ZLIB_DICT_V1:
+        return block
+    return block[start : start + size]
+
+
+def read_archived(thread_id: str):
+    """
+    Return the raw JSON bytes of an archived history, or None if the thread is not archived.
+    Reads without the shard lock: if a rewrite removed the segment the index pointed at,
+    the (newer) index is read again, and the last attempt is made under the lock.
+    """
+    shard = shard_of(thread_id)
+    shard_dir = _shard_dir(shard)
+    for _ in range(_READ_ATTEMPTS):
+        entry = _load_index(shard).get(thread_id)
+        if not entry:
+            return None
+        try:
+            return _read_entry(shard_dir, entry)
+        except FileNotFoundError:
+            continue
+    with shard_lock(shard):
+        entry = _load_index(shard).get(thread_id)
+        return _read_entry(shard_dir, entry) if entry else None
+
+
+def remove_archived(thread_id: str) -> bool:
+    """
+    Drop a thread from its shard index (after rehydration or deletion).
+    The bytes stay in the segment until the shard is rewritten.
+    """
+    shard = shard_of(thread_id)
+    if not os.path.isdir(_shard_dir(shard)):
+        return False
+    with shard_lock(shard):
+        index = _load_index(shard)
+        if thread_id not in index:
+            return False
+        del index[thread_id]
+        _save_index(shard, index)
+    return True
+
+
+def _segments_to_repack(shard_dir: str, index: dict) -> set:
+    """
+    Segments whose live histories should be packed again with the new ones: those holding
+    less than BLOCK_BYTES of live history (blocks fill up across runs), those mostly dead
+    (less than MIN_LIVE_RATIO of their bytes still referenced) and those in the old codec.
+    """
+    live_bytes, live_raw, legacy = {}, {}, set()
+    for segment, _, length, codec, _, size, block_size in index.values():
+        if codec == CODEC_ZLIB_DICT_V1:
+            legacy.add(segment)
+            continue
+        # A history's share of its compressed block
+        live_bytes[segment] = live_bytes.get(segment, 0) + length * size / block_size
+        live_raw[segment] = live_raw.get(segment, 0) + size
+    repack = set(legacy)
+    for segment, live in live_bytes.items():
+        total = os.path.getsize(os.path.join(shard_dir, segment))
+        if live_raw[segment] < HISTORY_SETTINGS.BLOCK_BYTES or live / total < HISTORY_SETTINGS.MIN_LIVE_RATIO:
+            repack.add(segment)
+    return repack
+
+
+def _write_segment(shard_dir: str, histories: dict) -> dict:
+    """
+    Pack {thread_id: raw JSON bytes} into compressed blocks of one new segment.
+    Returns the index entries for them.
+    """
+    segment = f"{int(time.time())}-{uuid.uuid4().hex[:8]}{_SEGMENT_EXT}"
+    entries = {}
+    block, spans = bytearray(), []
+    with open(os.path.join(shard_dir, segment), "wb") as out:
+
+        def flush():
+            blob = _compress(bytes(block))
+            offset = out.tell()
+            out.write(blob)
+            for thread_id, start, size in spans:
+                entries[thread_id] = [segment, offset, len(blob), CODEC_ZSTD_BLOCK_V1, start, size, len(block)]
+
+        for thread_id, raw in histories.items():
+            if block and len(block) + len(raw) > HISTORY_SETTINGS.BLOCK_BYTES:
+                flush()
+                block, spans = bytearray(), []
+            spans.append((thread_id, len(block), len(raw)))
+            block += raw
+        flush()
+        out.flush()
+        os.fsync(out.fileno())
+    return entries
+
+
+def archive_shard(shard: str, paths: dict) -> int:
+    """
+    Pack hot history files ({thread_id: path}) into a new segment of the shard, together
+    with the live histories of its small, sparse or old-codec segments.
+    A hot file is only removed if it was not modified while being archived.
+    Returns the number of threads archived.
+    """
+    archived = 0
+    with shard_lock(shard) as shard_dir:
+        index = _load_index(shard)
+        histories, packed = {}, {}
+        blocks = {}
+        for segment in _segments_to_repack(shard_dir, index):
+            for thread_id, entry in index.items():
+                if entry[0] == segment:
+                    histories[thread_id] = _read_entry(shard_dir, entry, blocks)
+        for thread_id, path in paths.items():
+            try:
+                before = os.stat(path)
+                with open(path, "rb") as f:
+                    raw = f.read()
+                json.loads(raw)  # Never archive a torn or corrupt file
+            except (OSError, ValueError) as e:
+                logger.warning("Skipping history %s: %s", thread_id, e)
+                continue
+            histories[thread_id] = raw
+            packed[thread_id] = (path, before)
+        if not histories:
+            return 0
+        index.update(_write_segment(shard_dir, histories))
+        _save_index(shard, index)
+
+        # Remove hot copies only once the index pointing at the segment is durable
+        for thread_id, (path, before) in packed.items():
+            try:
+                now = os.stat(path)
+                if (now.st_mtime_ns, now.st_size) == (before.st_mtime_ns, before.st_size):
+                    os.remove(path)
+                    archived += 1
+            except FileNotFoundError:
+                pass
+
+        # Drop segments no index entry points at any more
+        referenced = {entry[0] for entry in index.values()}
+        for name in os.listdir(shard_dir):
+            if name.endswith(_SEGMENT_EXT) and name not in referenced:
+                os.remove(os.path.join(shard_dir, name))
+    return archived
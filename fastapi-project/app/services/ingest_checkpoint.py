@@ -0,0 +1,82 @@
+"""
+Ingestion checkpoints: how many chunks of an asset are already committed to ChromaDB.
+
+In Celery mode checkpoints live in Redis, so a retry that lands on a worker on another
+host resumes where the previous attempt stopped. Embedded mode runs on a single node
+without Redis and keeps one JSON file per asset in ingest_checkpoints/.
+"""
+import os, json
+from datetime import datetime
+import redis
+from app.constant import DIRECTORY, CELERY_SETTINGS, FileFormat
+from app.task_queue import is_embedded
+from app.core.atomic_write import write_json_atomic
+
+# Directory where embedded-mode checkpoints are stored (one file per asset_id)
+_CHECKPOINT_DIR = DIRECTORY.CHECKPOINTS.value
+
+# One connection pool per worker process
+_redis = None
+
+
+def _get_redis():
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(CELERY_SETTINGS.CHECKPOINT_REDIS_URL)
+    return _redis
+
+
+def _checkpoint_key(asset_id):
+    return f"{CELERY_SETTINGS.CHECKPOINT_PREFIX}{asset_id}"
+
+
+def _checkpoint_file(asset_id):
+    """
+    Get the file path for an asset's ingestion checkpoint (embedded mode).
+    """
+    return os.path.join(_CHECKPOINT_DIR, f"{asset_id}.json")
+
+
+def load_checkpoint(asset_id):
+    """
+    Return the checkpoint for an asset, or None if ingestion has not committed anything yet.
+    """
+    if not is_embedded():
+        raw = _get_redis().get(_checkpoint_key(asset_id))
+        return json.loads(raw) if raw else None
+    path = _checkpoint_file(asset_id)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_checkpoint(asset_id, committed_chunks, **fields):
+    """
+    Record that the first `committed_chunks` chunks of an asset are stored in ChromaDB.
+    A single Redis SET (or a temp file renamed into place) never leaves a torn checkpoint.
+    """
+    data = {
+        FileFormat.ASSET_ID.value: asset_id,
+        FileFormat.COMMITTED_CHUNKS.value: committed_chunks,
+        FileFormat.UPDATED_AT.value: datetime.utcnow().isoformat() + "Z",
+        **fields,
+    }
+    if not is_embedded():
+        _get_redis().set(
+            _checkpoint_key(asset_id), json.dumps(data), ex=CELERY_SETTINGS.CHECKPOINT_TTL
+        )
+        return
+    write_json_atomic(_checkpoint_file(asset_id), data)
+
+
+def clear_checkpoint(asset_id):
+    """
+    Remove an asset's checkpoint once ingestion has finished or been abandoned.
+    """
+    if not is_embedded():
+        _get_redis().delete(_checkpoint_key(asset_id))
+        return
+    path = _checkpoint_file(asset_id)
+    if os.path.exists(path):
+        os.remove(path)
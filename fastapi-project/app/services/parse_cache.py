@@ -0,0 +1,98 @@
+import os
+import json
+import zlib
+import hashlib
+import logging
+from typing import List, Optional
+from app.constant import DIRECTORY, FileFormat, PARSE_CACHE_SETTINGS
+from app.core.file_parser import UNIT_EXTRACTORS
+from app.core.atomic_write import write_atomic
+
+logger = logging.getLogger("parse-cache")
+
+# Directory where extracted text units are cached (one file per content hash)
+_CACHE_DIR = DIRECTORY.PARSE_CACHE.value
+
+
+def hash_file(path: str) -> str:
+    """
+    SHA-256 of a file, read in blocks (same hash as computed at upload time).
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(PARSE_CACHE_SETTINGS.HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cache_file(content_hash: str) -> str:
+    # Sharded by hash prefix so no directory grows too large
+    return os.path.join(
+        _CACHE_DIR,
+        content_hash[:2],
+        f"{content_hash}.v{PARSE_CACHE_SETTINGS.PARSER_VERSION}.json.z",
+    )
+
+
+def load_units(content_hash: str) -> Optional[List[str]]:
+    """
+    Return the cached text units (pages, paragraphs or lines) for a content hash, or None.
+    """
+    path = _cache_file(content_hash)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            data = json.loads(zlib.decompress(f.read()))
+        return data[FileFormat.UNITS.value]
+    except (OSError, zlib.error, ValueError, KeyError) as e:
+        # A corrupt entry is treated as a miss and re-parsed
+        logger.warning("Ignoring unreadable parse cache entry %s: %s", path, e)
+        return None
+
+
+def save_units(content_hash: str, file_type: str, units: List[str]):
+    """
+    Store text units as zlib-compressed JSON, atomically (temp file + rename).
+    """
+    path = _cache_file(content_hash)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    payload = json.dumps(
+        {
+            FileFormat.CONTENT_HASH.value: content_hash,
+            FileFormat.FILE_TYPE.value: file_type,
+            FileFormat.PARSER_VERSION.value: PARSE_CACHE_SETTINGS.PARSER_VERSION,
+            FileFormat.UNITS.value: units,
+        },
+        ensure_ascii=False,
+    ).encode("utf-8")
+    write_atomic(path, zlib.compress(payload, PARSE_CACHE_SETTINGS.COMPRESSION_LEVEL))
+
+
+def iter_units(file_path: str, file_type: str, content_hash: str, on_page=None):
+    """
+    Yield a file's text units from the cache, or parse the file and cache the units
+    once extraction completes. on_page(parsed, total) is reported either way.
+    """
+    cached = load_units(content_hash)
+    if cached is not None:
+        logger.info("Parse cache hit for %s (%d units)", content_hash, len(cached))
+        for n, unit in enumerate(cached, start=1):
+            yield unit
+            if on_page:
+                on_page(n, len(cached))
+        return
+    units = []
+    for unit in UNIT_EXTRACTORS[file_type](file_path, on_page=on_page):
+        units.append(unit)
+        yield unit
+    save_units(content_hash, file_type, units)
+
+
+def remove_units(content_hash: str):
+    """
+    Drop a content hash's cached units (e.g. when its last asset is deleted).
+    """
+    path = _cache_file(content_hash)
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,87 @@
+import logging
+from datetime import datetime
+from app.constant import FileFormat, RETENTION_SETTINGS
+from app.core.db_client import ChromaDBClient
+from app.core.embedding_versions import known_versions
+from app.services.chat_manager import (
+    delete_thread,
+    threads_for_asset,
+    detach_asset,
+    find_idle_threads,
+    asset_last_used,
+    parse_timestamp,
+)
+from app.services.history import delete_history
+from app.services.parse_cache import remove_units
+from app.services.asset_summary import remove_summary
+
+logger = logging.getLogger("retention")
+
+chroma_client = ChromaDBClient()
+
+
+def remove_thread(thread_id: str) -> bool:
+    """
+    Delete a chat thread and its history. Returns False if the thread did not exist.
+    """
+    existed = delete_thread(thread_id)
+    delete_history(thread_id)
+    return existed
+
+
+def remove_asset(asset_id: str) -> bool:
+    """
+    Delete an asset's chunks from ChromaDB (and its cached parsed text). Threads that only search this asset are
+    deleted with their history; multi-asset threads just drop it from their set.
+    Returns False if the asset did not exist.
+    """
+    metadata = chroma_client.asset_metadata(asset_id)
+    if not metadata:
+        return False
+    for thread_id in threads_for_asset(asset_id):
+        if not detach_asset(thread_id, asset_id):
+            remove_thread(thread_id)
+    # Every version that may hold its vectors (active, migration target, pre-cutover)
+    for version in known_versions():
+        chroma_client.delete_asset(asset_id, version=version)
+    # Drop the cached parsed text unless another asset was ingested from the same content
+    content_hash = metadata.get(FileFormat.CONTENT_HASH.value)
+    if content_hash and not chroma_client.content_hash_in_use(content_hash):
+        remove_units(content_hash)
+    remove_summary(asset_id)
+    logger.info("Removed asset %s", asset_id)
+    return True
+
+
+def reap_idle(
+    thread_ttl: int = RETENTION_SETTINGS.THREAD_TTL,
+    asset_ttl: int = RETENTION_SETTINGS.ASSET_TTL,
+    now: datetime = None,
+) -> dict:
+    """
+    Evict threads idle longer than thread_ttl and assets idle longer than asset_ttl.
+    An asset's idle time is measured from the latest 'last_used' of its threads,
+    or from its ingestion time if it never had a thread. Assets without either
+    timestamp (ingested before ingested_at was recorded) are never evicted.
+    Returns the evicted thread and asset ids.
+    """
+    now = now or datetime.utcnow()
+    # Read asset activity before threads are evicted, so recent thread use still counts
+    last_used = asset_last_used()
+
+    evicted_threads = [tid for tid in find_idle_threads(thread_ttl, now) if remove_thread(tid)]
+
+    evicted_assets = []
+    for asset_id, metadata in chroma_client.list_assets().items():
+        seen = last_used.get(asset_id) or parse_timestamp(metadata.get(FileFormat.INGESTED_AT.value))
+        if seen and (now - seen).total_seconds() > asset_ttl:
+            if remove_asset(asset_id):
+                evicted_assets.append(asset_id)
+
+    logger.info(
+        "Reaper evicted %d threads and %d assets", len(evicted_threads), len(evicted_assets)
+    )
+    return {
+        FileFormat.THREADS.value: evicted_threads,
+        FileFormat.ASSETS.value: evicted_assets,
+    }
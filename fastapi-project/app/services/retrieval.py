@@ -0,0 +1,103 @@
+import time
+import asyncio
+import hashlib
+import logging
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from starlette.concurrency import run_in_threadpool
+from app.constant import CHAT_SETTINGS, FileFormat
+from app.core.embedding_versions import active_version
+from app.services import warmup
+
+logger = logging.getLogger(__name__)
+
+# A search cannot be interrupted once it runs, so searches get their own bounded pool:
+# searches abandoned on timeout can only tie up these threads, never the threadpool
+# every other request uses. Searches still queued when their caller gives up are
+# cancelled and never run.
+_search_pool = ThreadPoolExecutor(
+    max_workers=CHAT_SETTINGS.RETRIEVAL_WORKERS, thread_name_prefix="retrieval"
+)
+
+
+async def _search_asset(chroma_client, asset_id, query_embedding, k, timeout, version=None):
+    """
+    Search one asset in the retrieval pool, giving up after `timeout` seconds.
+    Returns [] on timeout or error so one slow or broken shard never blocks the answer.
+    """
+    start = time.perf_counter()
+    search = functools.partial(chroma_client.search, asset_id, query_embedding, k, version)
+    try:
+        results = await asyncio.wait_for(
+            asyncio.get_running_loop().run_in_executor(_search_pool, search),
+            timeout=timeout,
+        )
+        warmup.record_search(asset_id, (time.perf_counter() - start) * 1000)
+        return results
+    except asyncio.TimeoutError:
+        logger.warning("Retrieval timed out for asset_id=%s after %ss", asset_id, timeout)
+    except Exception as e:
+        logger.error("Retrieval failed for asset_id=%s: %s", asset_id, e)
+    return []
+
+
+def merge_results(results, budget_words=CHAT_SETTINGS.CONTEXT_BUDGET_WORDS):
+    """
+    Merge per-asset (document, metadata, distance) results into one context list.
+    Results are ordered by distance, duplicates (same chunk, or identical text across
+    assets) are dropped, and chunks are taken until the word budget is spent.
+    The closest chunk is always kept, even if it alone exceeds the budget.
+    """
+    ranked = sorted(
+        (hit for hits in results for hit in hits), key=lambda hit: hit[2]
+    )
+    seen = set()
+    picked = []
+    words = 0
+    for document, metadata, distance in ranked:
+        chunk_key = (
+            metadata.get(FileFormat.ASSET_ID.value),
+            metadata.get(FileFormat.CHUNK_IDX.value),
+        )
+        text_key = hashlib.sha1((document or "").encode()).digest()
+        if chunk_key in seen or text_key in seen or not (document or "").strip():
+            continue
+        n_words = len(document.split())
+        if picked and words + n_words > budget_words:
+            continue
+        seen.update((chunk_key, text_key))
+        picked.append((document, metadata))
+        words += n_words
+    return picked
+
+
+async def retrieve_context(chroma_client, asset_ids, question):
+    """
+    Fan retrieval out across every asset of a thread concurrently and merge the hits.
+    The question is embedded once and reused for every asset; the embedding version
+    is resolved once so a cutover mid-request never mixes models.
+    Returns the context string for the LLM ("" if nothing was found).
+    """
+    version = active_version()
+    query_embedding = await run_in_threadpool(chroma_client.embed_query, question, version)
+    results = await asyncio.gather(
+        *[
+            _search_asset(
+                chroma_client,
+                asset_id,
+                query_embedding,
+                None,  # k: each asset's collection has its own (see app.core.hnsw_params)
+                CHAT_SETTINGS.ASSET_RETRIEVAL_TIMEOUT,
+                version,
+            )
+            for asset_id in asset_ids
+        ]
+    )
+    picked = merge_results(results)
+    if len(asset_ids) > 1:
+        # Label chunks by source so answers can compare documents
+        return "\n\n".join(
+            f"[{metadata.get(FileFormat.FILE_NAME.value, metadata.get(FileFormat.ASSET_ID.value))}]\n{document}"
+            for document, metadata in picked
+        )
+    return "\n\n".join(document for document, _ in picked)
@@ -0,0 +1,140 @@
+"""
+Partitioning and spool files for split ingestion of very large documents.
+
+A file is cut into page ranges (PDF) or line-aligned byte ranges (TXT); DOCX is parsed
+as one part. The last range is open-ended, so nothing past it is ever dropped. Parse
+subtasks spool each part's text units; the plan step chunks the joined text once and
+spools each embed part's chunk texts, so an embed subtask reads only its own range;
+embed subtasks spool their vectors, and the commit step reads them back in order.
+Everything for an asset lives in split_spool/<asset_id>/ and is removed once the asset
+is committed or abandoned.
+"""
+import io
+import os
+import json
+import math
+import zlib
+import shutil
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from app.constant import DIRECTORY, FileFormat, FileType, SPLIT_SETTINGS, PARSE_CACHE_SETTINGS
+import pdfplumber
+from app.core.file_parser import UNIT_EXTRACTORS, UNIT_RANGE_EXTRACTORS
+from app.core.ingest_scheduler import estimate_pages
+from app.core.atomic_write import write_atomic
+
+_SPOOL_DIR = DIRECTORY.SPLIT_SPOOL.value
+
+
+def should_split(file_path: str, file_type: str) -> bool:
+    """
+    True when a file is large or long enough to be ingested by parallel subtasks.
+    """
+    if not SPLIT_SETTINGS.ENABLED:
+        return False
+    file_size = os.path.getsize(file_path)
+    if file_size >= SPLIT_SETTINGS.MIN_BYTES:
+        return True
+    return estimate_pages(file_path, file_type, file_size) >= SPLIT_SETTINGS.MIN_PAGES
+
+
+def _ranges(total: int, per_part: int, open_end: bool = False) -> List[Tuple[int, Optional[int]]]:
+    # Even [start, end) ranges of about per_part, at most MAX_PARTS of them;
+    # with open_end the last range runs to the end of the input (end=None)
+    if total <= 0:
+        return [(0, None if open_end else 0)]
+    parts = min(SPLIT_SETTINGS.MAX_PARTS, math.ceil(total / per_part))
+    step = math.ceil(total / parts)
+    ranges = [(start, min(total, start + step)) for start in range(0, total, step)]
+    if open_end:
+        ranges[-1] = (ranges[-1][0], None)
+    return ranges
+
+
+def _pdf_pages(file_path: str) -> int:
+    with pdfplumber.open(file_path) as pdf:
+        return len(pdf.pages)
+
+
+def parse_ranges(file_path: str, file_type: str) -> List[Optional[Tuple[int, Optional[int]]]]:
+    """
+    The parse parts of a file: page ranges for PDF, byte ranges for TXT,
+    and [None] (the whole file) for types that cannot be split.
+    """
+    if file_type == FileType.PDF.value:
+        return _ranges(_pdf_pages(file_path), SPLIT_SETTINGS.PAGES_PER_PART, open_end=True)
+    if file_type == FileType.TXT.value:
+        return _ranges(os.path.getsize(file_path), SPLIT_SETTINGS.BYTES_PER_PART, open_end=True)
+    return [None]
+
+
+def chunk_ranges(total_chunks: int) -> List[Tuple[int, int]]:
+    """
+    The embed parts of an asset: chunk index ranges [start, end) covering all chunks.
+    """
+    return _ranges(total_chunks, SPLIT_SETTINGS.CHUNKS_PER_PART)
+
+
+def parse_range(file_path: str, file_type: str, part_range: Optional[Tuple[int, int]]) -> List[str]:
+    if part_range is None:
+        return list(UNIT_EXTRACTORS[file_type](file_path))
+    start, end = part_range
+    return list(UNIT_RANGE_EXTRACTORS[file_type](file_path, start, end))
+
+
+def _part_path(asset_id: str, name: str) -> str:
+    return os.path.join(_SPOOL_DIR, asset_id, name)
+
+
+def _save_texts(path: str, texts: List[str]):
+    payload = json.dumps({FileFormat.UNITS.value: texts}, ensure_ascii=False).encode("utf-8")
+    write_atomic(path, zlib.compress(payload, PARSE_CACHE_SETTINGS.COMPRESSION_LEVEL))
+
+
+def _load_texts(path: str) -> List[str]:
+    with open(path, "rb") as f:
+        return json.loads(zlib.decompress(f.read()))[FileFormat.UNITS.value]
+
+
+def save_part_units(asset_id: str, part: int, units: List[str]):
+    _save_texts(_part_path(asset_id, f"units-{part:04d}.json.z"), units)
+
+
+def load_part_units(asset_id: str, part: int) -> List[str]:
+    return _load_texts(_part_path(asset_id, f"units-{part:04d}.json.z"))
+
+
+def save_part_texts(asset_id: str, part: int, chunks: List[str]):
+    # Chunk texts an embed part has to encode
+    _save_texts(_part_path(asset_id, f"texts-{part:04d}.json.z"), chunks)
+
+
+def load_part_texts(asset_id: str, part: int) -> List[str]:
+    return _load_texts(_part_path(asset_id, f"texts-{part:04d}.json.z"))
+
+
+def save_part_vectors(asset_id: str, part: int, chunks: List[str], vectors: Dict[str, np.ndarray]):
+    """
+    Spool an embed part: its chunk texts and one float32 array per embedding version.
+    The chunk file is written last, so its presence means the part is complete.
+    """
+    for version, array in vectors.items():
+        buffer = io.BytesIO()
+        np.save(buffer, array)
+        write_atomic(_part_path(asset_id, f"vectors-{part:04d}.{version}.npy"), buffer.getvalue())
+    _save_texts(_part_path(asset_id, f"chunks-{part:04d}.json.z"), chunks)
+
+
+def load_part_vectors(
+    asset_id: str, part: int, versions: List[str]
+) -> Tuple[List[str], Dict[str, np.ndarray]]:
+    chunks = _load_texts(_part_path(asset_id, f"chunks-{part:04d}.json.z"))
+    vectors = {
+        version: np.load(_part_path(asset_id, f"vectors-{part:04d}.{version}.npy"))
+        for version in versions
+    }
+    return chunks, vectors
+
+
+def remove_spool(asset_id: str):
+    shutil.rmtree(os.path.join(_SPOOL_DIR, asset_id), ignore_errors=True)
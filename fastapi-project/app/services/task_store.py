@@ -0,0 +1,129 @@
+"""
+SQLite task table for the embedded executor.
+
+Holds each task's state, result, error and latest progress event, so status and
+progress survive restarts and are visible from every API process and pool worker.
+"""
+import json
+import time
+import sqlite3
+from typing import Optional
+from app.constant import EXECUTION_SETTINGS, FileStatus
+
+# States a task may still leave; anything else is final
+UNFINISHED_STATES = (FileStatus.PENDING.value, FileStatus.STARTED.value, FileStatus.RETRY.value)
+
+
+# TaskStore uses a short-lived connection per call: safe from any thread or process.
+class TaskStore:
+    def __init__(self, path=EXECUTION_SETTINGS.TASKS_DB):
+        self.path = path
+        self._execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "task_id TEXT PRIMARY KEY, name TEXT NOT NULL, args TEXT NOT NULL, "
+            "kwargs TEXT NOT NULL, state TEXT NOT NULL, result TEXT, error TEXT, "
+            "retries INTEGER NOT NULL DEFAULT 0, progress TEXT, owner INTEGER, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._execute(
+            "CREATE TABLE IF NOT EXISTS schedule (name TEXT PRIMARY KEY, last_run REAL NOT NULL)"
+        )
+
+    def _execute(self, sql: str, params=()):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                cursor = conn.execute(sql, params)
+                return cursor.fetchall() if cursor.description else cursor.rowcount
+        finally:
+            conn.close()
+
+    def create(self, task_id: str, name: str, args, kwargs, owner: int):
+        now = time.time()
+        self._execute(
+            "INSERT INTO tasks (task_id, name, args, kwargs, state, owner, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (task_id, name, json.dumps(args), json.dumps(kwargs), FileStatus.PENDING.value, owner, now, now),
+        )
+
+    def set_state(self, task_id: str, state: FileStatus, result=None, error=None, retries=None):
+        self._execute(
+            "UPDATE tasks SET state = ?, result = ?, error = ?, "
+            "retries = COALESCE(?, retries), updated_at = ? WHERE task_id = ?",
+            (
+                state.value,
+                json.dumps(result) if result is not None else None,
+                error,
+                retries,
+                time.time(),
+                task_id,
+            ),
+        )
+
+    def get(self, task_id: str) -> Optional[dict]:
+        rows = self._execute(
+            "SELECT state, result, error, retries FROM tasks WHERE task_id = ?", (task_id,)
+        )
+        if not rows:
+            return None
+        state, result, error, retries = rows[0]
+        return {
+            "state": state,
+            "result": json.loads(result) if result is not None else None,
+            "error": error,
+            "retries": retries,
+        }
+
+    def set_progress(self, task_id: str, event: dict):
+        self._execute(
+            "UPDATE tasks SET progress = ? WHERE task_id = ?", (json.dumps(event), task_id)
+        )
+
+    def get_progress(self, task_id: str) -> Optional[str]:
+        # Raw JSON, so pollers can cheaply tell whether anything changed
+        rows = self._execute("SELECT progress FROM tasks WHERE task_id = ?", (task_id,))
+        return rows[0][0] if rows else None
+
+    def unfinished(self):
+        """
+        Return (task_id, name, args, kwargs, owner, retries) for tasks not yet in a final state.
+        """
+        rows = self._execute(
+            f"SELECT task_id, name, args, kwargs, owner, retries FROM tasks "
+            f"WHERE state IN ({','.join('?' * len(UNFINISHED_STATES))}) ORDER BY created_at",
+            UNFINISHED_STATES,
+        )
+        return [
+            (tid, name, json.loads(a), json.loads(kw), owner, retries)
+            for tid, name, a, kw, owner, retries in rows
+        ]
+
+    def claim(self, task_id: str, old_owner: int, new_owner: int) -> bool:
+        """
+        Atomically take over a task from a dead owner; only one process wins.
+        """
+        return (
+            self._execute(
+                "UPDATE tasks SET owner = ? WHERE task_id = ? AND owner IS ?",
+                (new_owner, task_id, old_owner),
+            )
+            == 1
+        )
+
+    def claim_schedule(self, name: str, interval: float, now: float) -> bool:
+        """
+        Claim a periodic job that is due; only one process runs each occurrence.
+        """
+        self._execute(
+            "INSERT OR IGNORE INTO schedule (name, last_run) VALUES (?, ?)", (name, now)
+        )
+        return (
+            self._execute(
+                "UPDATE schedule SET last_run = ? WHERE name = ? AND last_run <= ?",
+                (now, name, now - interval),
+            )
+            == 1
+        )
+
+
+task_store = TaskStore()
@@ -0,0 +1,76 @@
+import os
+import uuid
+import hashlib
+from starlette.concurrency import run_in_threadpool
+from app.constant import DIRECTORY, FILE_SETTINGS
+from app.core.file_parser import FileParser
+
+# Spool directory for streamed uploads; files land in <spool>/<sha256>/<file_name>
+_SPOOL_DIR = os.path.abspath(DIRECTORY.UPLOAD.value)
+
+
+class FileTooLargeError(ValueError):
+    """Raised when an upload exceeds FILE_SETTINGS.MAX_FILE_SIZE."""
+
+
+def _flush(f, digest, buffer: bytearray):
+    """
+    Hash and write one buffered block. Runs in the threadpool to keep the event loop free.
+    """
+    digest.update(buffer)
+    f.write(buffer)
+
+
+async def spool_upload(chunks, file_name: str, content_length: int = None):
+    """
+    Stream an upload body to the spool directory in fixed-size blocks.
+    The SHA-256 content hash is computed and MAX_FILE_SIZE is enforced while spooling,
+    so memory stays bounded by FILE_SETTINGS.UPLOAD_CHUNK_SIZE regardless of upload size.
+    The finished file is renamed into place (no extra copy) and can be handed
+    directly to the ingestion task.
+    Returns (file_path, content_hash, file_size).
+    """
+    name = os.path.basename(file_name or "")
+    ext = os.path.splitext(name)[1].lower().replace(".", "")
+    if not name or ext not in FileParser.SUPPORTED_FORMATS:
+        raise ValueError(f"Unsupported file format: '{ext}'")
+    if content_length is not None and content_length > FILE_SETTINGS.MAX_FILE_SIZE:
+        raise FileTooLargeError(
+            f"File exceeds maximum size of {FILE_SETTINGS.MAX_FILE_SIZE} bytes."
+        )
+
+    os.makedirs(_SPOOL_DIR, exist_ok=True)
+    part_path = os.path.join(_SPOOL_DIR, f"{uuid.uuid4()}.part")
+    digest = hashlib.sha256()
+    buffer = bytearray()
+    size = 0
+    try:
+        with open(part_path, "wb") as f:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > FILE_SETTINGS.MAX_FILE_SIZE:
+                    raise FileTooLargeError(
+                        f"File exceeds maximum size of {FILE_SETTINGS.MAX_FILE_SIZE} bytes."
+                    )
+                buffer.extend(chunk)
+                if len(buffer) >= FILE_SETTINGS.UPLOAD_CHUNK_SIZE:
+                    await run_in_threadpool(_flush, f, digest, buffer)
+                    buffer = bytearray()
+            if buffer:
+                await run_in_threadpool(_flush, f, digest, buffer)
+    except BaseException:
+        # Covers size violations and client disconnects mid-upload
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    if size == 0:
+        os.remove(part_path)
+        raise ValueError("Empty upload.")
+
+    content_hash = digest.hexdigest()
+    final_dir = os.path.join(_SPOOL_DIR, content_hash)
+    os.makedirs(final_dir, exist_ok=True)
+    final_path = os.path.join(final_dir, name)
+    # Same filesystem rename: the spooled bytes are never copied again
+    os.replace(part_path, final_path)
+    return final_path, content_hash, size
@@ -0,0 +1,182 @@
+"""
+Warm-up of hot assets in the API process.
+
+After a deploy or an idle period, the first message on a thread pays for loading the
+embedding model, opening the asset's collection (Chroma loads its HNSW index into the
+process on first query) and reading rows from chroma.sqlite3 through a cold page cache.
+A pass at startup, then every WARMUP_SETTINGS.INTERVAL seconds, takes the assets with the
+most recent thread activity (chat_manager.asset_last_used), runs the model once and
+searches each asset once, then reads its chunk metadata and texts.
+
+State is per process (each API worker warms and reports its own caches). Retrieval
+records the latency of each asset's first search after FIRST_HIT_IDLE, split by whether
+the asset had been warmed, so the effect is visible in stats().
+"""
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import List, Optional
+from starlette.concurrency import run_in_threadpool
+from app.constant import WARMUP_SETTINGS, FileFormat
+from app.core.embedder import get_embedder
+from app.core.embedding_versions import active_version
+from app.core.ingest_scheduler import wait_summary
+from app.services.chat_manager import asset_last_used
+
+logger = logging.getLogger("warmup")
+
+_lock = threading.Lock()
+_state = {
+    FileFormat.EMBEDDING_VERSION.value: None,
+    FileFormat.MODEL_MS.value: None,
+    FileFormat.PASSES.value: 0,
+    FileFormat.LAST_PASS_AT.value: None,
+    FileFormat.LAST_PASS_MS.value: None,
+}
+_hot: List[str] = []  # Asset ids of the last pass, most recently active first
+_warm = {}  # asset_id -> what the last pass did for it
+_warmed_at = {}  # asset_id -> monotonic time it was last warmed
+_last_search = {}  # asset_id -> monotonic time of its last search by a request
+_first_hits = {
+    FileFormat.WARMED.value: deque(maxlen=WARMUP_SETTINGS.SAMPLES),
+    FileFormat.COLD.value: deque(maxlen=WARMUP_SETTINGS.SAMPLES),
+}
+
+
+def _ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 3)
+
+
+def hot_assets(limit: int = WARMUP_SETTINGS.ASSETS, now: Optional[datetime] = None) -> List[str]:
+    """
+    The `limit` assets with the most recent thread activity within MAX_IDLE.
+    """
+    now = now or datetime.utcnow()
+    recent = [
+        (last_used, asset_id)
+        for asset_id, last_used in asset_last_used().items()
+        if (now - last_used).total_seconds() <= WARMUP_SETTINGS.MAX_IDLE
+    ]
+    return [asset_id for _, asset_id in sorted(recent, reverse=True)[:limit]]
+
+
+def warm_asset(chroma_client, asset_id: str, probe, version: str) -> dict:
+    """
+    Search an asset twice (the first loads its index if needed; the second is the warm
+    baseline), then read its chunk metadata and texts into the page cache.
+    """
+    start = time.perf_counter()
+    chroma_client.search(asset_id, probe, None, version)
+    cold_ms = _ms(start)
+    start = time.perf_counter()
+    chroma_client.search(asset_id, probe, None, version)
+    warm_ms = _ms(start)
+    collection = chroma_client.router_for(version).collection_for_asset(asset_id)
+    rows = {}
+    if collection is not None:
+        rows = collection.get(
+            where={FileFormat.ASSET_ID.value: asset_id},
+            limit=WARMUP_SETTINGS.MAX_CHUNKS,
+            include=[FileFormat.METADATAS.value, FileFormat.DOCUMENTS.value],
+        )
+    return {
+        FileFormat.COLLECTION.value: collection.name if collection is not None else None,
+        FileFormat.CHUNKS.value: len(rows.get(FileFormat.IDS.value) or []),
+        FileFormat.COLD_MS.value: cold_ms,
+        FileFormat.WARM_MS.value: warm_ms,
+        FileFormat.WARMED_AT.value: datetime.utcnow().isoformat() + "Z",
+    }
+
+
+def warm_up(chroma_client) -> dict:
+    """
+    One warm-up pass: the active version's model, then the hot assets (within PASS_BUDGET).
+    Returns stats().
+    """
+    pass_start = time.perf_counter()
+    version = active_version()
+    start = time.perf_counter()
+    probe = get_embedder(version).encode([WARMUP_SETTINGS.PROBE_TEXT])[0]
+    model_ms = _ms(start)
+    hot = hot_assets()
+    warmed = {}
+    for asset_id in hot:
+        if time.perf_counter() - pass_start > WARMUP_SETTINGS.PASS_BUDGET:
+            logger.info("Warm-up budget spent; %d assets left for the next pass", len(hot) - len(warmed))
+            break
+        try:
+            warmed[asset_id] = warm_asset(chroma_client, asset_id, probe, version)
+        except Exception as e:
+            logger.warning("Warm-up failed for asset_id=%s: %s", asset_id, e)
+    with _lock:
+        if _state[FileFormat.EMBEDDING_VERSION.value] != version:
+            # First pass (or a cutover): this is the model's load time
+            _state[FileFormat.MODEL_MS.value] = model_ms
+            _state[FileFormat.EMBEDDING_VERSION.value] = version
+        _hot[:] = hot
+        for asset_id in list(_warm):
+            if asset_id not in hot:
+                del _warm[asset_id]
+                del _warmed_at[asset_id]
+        _warm.update(warmed)
+        _warmed_at.update((asset_id, time.monotonic()) for asset_id in warmed)
+        _state[FileFormat.PASSES.value] += 1
+        _state[FileFormat.LAST_PASS_AT.value] = datetime.utcnow().isoformat() + "Z"
+        _state[FileFormat.LAST_PASS_MS.value] = _ms(pass_start)
+    logger.info(
+        "Warm-up pass: %d/%d hot assets in %.0f ms", len(warmed), len(hot), _state[FileFormat.LAST_PASS_MS.value]
+    )
+    return stats()
+
+
+async def run_warmup(chroma_client):
+    """
+    Run a warm-up pass now and then every INTERVAL seconds, off the event loop.
+    """
+    while True:
+        try:
+            await run_in_threadpool(warm_up, chroma_client)
+        except Exception as e:
+            logger.error("Warm-up pass failed: %s", e)
+        await asyncio.sleep(WARMUP_SETTINGS.INTERVAL)
+
+
+def record_search(asset_id: str, elapsed_ms: float):
+    """
+    Called by retrieval after each asset search. The first search of an asset after
+    FIRST_HIT_IDLE seconds is recorded as a first hit, as warmed or cold.
+    """
+    now = time.monotonic()
+    with _lock:
+        last = _last_search.get(asset_id)
+        _last_search[asset_id] = now
+        if last is not None and now - last < WARMUP_SETTINGS.FIRST_HIT_IDLE:
+            return
+        kind = FileFormat.WARMED if asset_id in _warm else FileFormat.COLD
+        _first_hits[kind.value].append(round(elapsed_ms, 3))
+
+
+def stats() -> dict:
+    """
+    This process's warm-up state: model load time, hot assets and what each pass did for
+    them, how many were warmed within the last two intervals (a pass ran over them; whether
+    their pages are still cached is not measured), and first-hit latencies.
+    """
+    now = time.monotonic()
+    with _lock:
+        assets = [
+            {FileFormat.ASSET_ID.value: asset_id, **_warm[asset_id]} for asset_id in _hot if asset_id in _warm
+        ]
+        recently_warmed = sum(
+            1 for warmed_at in _warmed_at.values() if now - warmed_at <= 2 * WARMUP_SETTINGS.INTERVAL
+        )
+        return {
+            **_state,
+            FileFormat.HOT.value: len(_hot),
+            FileFormat.RECENTLY_WARMED.value: recently_warmed,
+            FileFormat.ASSETS.value: assets,
+            FileFormat.FIRST_HIT_MS.value: {kind: wait_summary(list(values)) for kind, values in _first_hits.items()},
+        }
@@ -0,0 +1,77 @@
+"""
+Dispatch tasks and read their status independently of the execution mode.
+EXECUTION_MODE=celery sends tasks to the Redis broker; embedded runs them in a local
+process pool (see app.embedded_executor). Endpoints only use this module.
+Ingestion is classified when it is queued and routed by class (see app.core.ingest_scheduler).
+"""
+import uuid
+from typing import Optional
+from app.constant import EXECUTION_SETTINGS, ExecutionMode, FileFormat, FileStatus
+from app.core import ingest_scheduler
+from app.core.ingest_scheduler import IngestJob
+
+
+def is_embedded() -> bool:
+    return EXECUTION_SETTINGS.MODE == ExecutionMode.EMBEDDED.value
+
+
+def _dispatch(task, args, kwargs, job: Optional[IngestJob]) -> str:
+    if is_embedded():
+        from app.embedded_executor import submit
+
+        return submit(task.name, args, kwargs, job=job)
+    if job is None:
+        # Unclassified tasks (maintenance) follow celery_app.conf.task_routes
+        return task.apply_async(args=args, kwargs=kwargs).id
+    task_id = str(uuid.uuid4())
+    job = ingest_scheduler.admit(task_id, job)
+    return task.apply_async(
+        args=args, kwargs=kwargs, task_id=task_id, queue=job.queue, priority=job.priority
+    ).id
+
+
+def dispatch_task(task, *args, **kwargs) -> str:
+    """
+    Queue a Celery task (or run it on the embedded pool). Returns the task id.
+    """
+    return _dispatch(task, args, kwargs, ingest_scheduler.job_for_task(task.name, kwargs.get(FileFormat.TENANT_ID.value)))
+
+
+def dispatch_ingestion(task, file_path, *args, tenant_id=None, interactive=True, **kwargs) -> str:
+    """
+    Classify an ingestion job by file size, page count and type, then queue it on its
+    class's queue. interactive=False for folder ingestion and backfills. Reads the file's
+    page tree, so call it from a worker thread in async code. Returns the task id.
+    """
+    job = ingest_scheduler.classify(file_path, tenant_id, interactive=interactive)
+    return _dispatch(task, (file_path, *args), {FileFormat.TENANT_ID.value: tenant_id, **kwargs}, job)
+
+
+def get_task_status(task_id: str) -> Optional[dict]:
+    """
+    Return {"state", "result"} for a task, or None if it is unknown.
+    """
+    if is_embedded():
+        from app.services.task_store import task_store
+
+        return task_store.get(task_id)
+    from celery.result import AsyncResult
+    from app.celery_app import celery_app
+
+    result = AsyncResult(task_id, app=celery_app)
+    return {
+        "state": result.status,
+        "result": result.result if result.status == FileStatus.SUCCESS.value else None,
+    }
+
+
+def get_queue_stats() -> dict:
+    """
+    Per ingestion queue: jobs waiting, outstanding jobs per tenant and recent wait times
+    (p50/p95/max seconds). In embedded mode these are the calling API process's own pool.
+    """
+    if is_embedded():
+        from app.embedded_executor import get_dispatcher
+
+        return get_dispatcher().stats()
+    return ingest_scheduler.queue_stats()
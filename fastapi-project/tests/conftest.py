@@ -0,0 +1,11 @@
+"""
+Shared test setup. The app keeps its state (Chroma, chat histories, SQLite stores) in
+paths relative to the working directory, so every test runs in its own temporary directory.
+"""
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,63 @@
+import pytest
+from app.constant import SUMMARY_SETTINGS
+from app.services import asset_summary
+from app.services.asset_summary import is_overview_question, map_sections
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "Summarize this document",
+        "summarise it please",
+        "Can you summarize this?",
+        "Give me an overview of the report",
+        "TL;DR",
+        "What are the key points?",
+        "main topics of this paper",
+        "What’s this document about?",
+        "what is it about",
+    ],
+)
+def test_whole_document_questions_use_the_summary(message):
+    assert is_overview_question(message)
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "Summarize section 3",
+        "What does the summary say about revenue?",
+        "Give me an overview of the pricing model",
+        "What are the key points about security?",
+        "Is there an executive summary in the appendix?",
+        "What is the termination clause about?",
+    ],
+)
+def test_specific_questions_go_to_retrieval(message):
+    assert not is_overview_question(message)
+
+
+def test_map_groups_consecutive_chunks():
+    chunks = [f"c{i}" for i in range(10)]
+    sections = map_sections(chunks)
+    per_call = SUMMARY_SETTINGS.MAP_CHUNKS_PER_CALL
+    assert len(sections) == -(-10 // per_call)
+    assert sections[0] == "\n\n".join(chunks[:per_call])
+
+
+def test_map_calls_are_capped_for_long_documents():
+    limit = SUMMARY_SETTINGS.MAP_MAX_CALLS * SUMMARY_SETTINGS.MAP_MAX_CHUNKS_PER_CALL
+    for n in (SUMMARY_SETTINGS.MAP_MAX_CALLS * SUMMARY_SETTINGS.MAP_CHUNKS_PER_CALL + 1, limit, limit * 3):
+        sections = map_sections([f"c{i}" for i in range(n)])
+        assert len(sections) <= SUMMARY_SETTINGS.MAP_MAX_CALLS
+        assert all(s.count("\n\n") < SUMMARY_SETTINGS.MAP_MAX_CHUNKS_PER_CALL for s in sections)
+
+
+def test_summary_calls_wait_for_the_token_quota(monkeypatch):
+    answers = iter([(False, 0.01), (True, 0.0)])
+    monkeypatch.setattr(asset_summary, "reserve_tokens", lambda key, cost: next(answers))
+    asset_summary._reserve("summary:t1", 100)
+
+    monkeypatch.setattr(asset_summary, "reserve_tokens", lambda key, cost: (False, 3600.0))
+    with pytest.raises(asset_summary.TokenQuotaExceeded):
+        asset_summary._reserve("summary:t1", 100)
@@ -0,0 +1,52 @@
+import asyncio
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api.endpoints import chat
+from app.constant import DIRECTORY, FileFormat
+from app.core.atomic_write import write_json_atomic
+from app.limiter import limiter
+from app.services import chat_manager
+from app.services.history import add_message
+
+
+@pytest.fixture
+def client(workdir, monkeypatch):
+    monkeypatch.setattr(limiter, "enabled", False)  # Its SQLite store is outside the test directory
+    app = FastAPI()
+    app.state.limiter = limiter
+    app.include_router(chat.router, prefix="/api")
+    return TestClient(app)
+
+
+def test_delete_thread_runs_off_the_event_loop(client, monkeypatch):
+    calls = []
+
+    def remove_thread(thread_id):
+        try:
+            asyncio.get_running_loop()
+            calls.append("event loop")
+        except RuntimeError:
+            calls.append("worker thread")
+        return thread_id == "t1"
+
+    monkeypatch.setattr(chat, "remove_thread", remove_thread)
+    assert client.delete("/api/chat/threads/t1").json() == {"thread_id": "t1", "status": "deleted"}
+    assert client.delete("/api/chat/threads/t2").status_code == 404
+    assert calls == ["worker thread", "worker thread"]
+
+
+def test_a_conditional_history_poll_counts_as_activity(client, monkeypatch):
+    thread_id = chat_manager.create_chat_thread(asset_id="a1")
+    add_message(thread_id, "hello", "user")
+    etag = client.get("/api/chat/history", params={"thread_id": thread_id}).headers["etag"]
+    threads = chat_manager.load_threads()
+    threads[thread_id][FileFormat.LAST_USED.value] = "2000-01-01T00:00:00Z"
+    write_json_atomic(DIRECTORY.THREAD_ASSET_MAP.value, threads)
+    assert chat_manager.find_idle_threads(3600) == [thread_id]
+
+    response = client.get(
+        "/api/chat/history", params={"thread_id": thread_id}, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert chat_manager.find_idle_threads(3600) == []
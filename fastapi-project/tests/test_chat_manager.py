@@ -0,0 +1,35 @@
+import json
+import threading
+from app.constant import DIRECTORY
+from app.services import chat_manager
+
+
+def test_concurrent_creates_deletes_and_touches_lose_no_update():
+    keep = [chat_manager.create_chat_thread(asset_id=f"a{i}") for i in range(10)]
+    reaped = [chat_manager.create_chat_thread(asset_id="old") for _ in range(10)]
+    created = []
+
+    def create():
+        created.append(chat_manager.create_chat_thread(asset_id="new"))
+
+    workers = (
+        [threading.Thread(target=create) for _ in range(10)]
+        + [threading.Thread(target=chat_manager.delete_thread, args=(t,)) for t in reaped]
+        + [threading.Thread(target=chat_manager.update_last_used, args=(t,)) for t in keep]
+    )
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    with open(DIRECTORY.THREAD_ASSET_MAP.value) as f:
+        threads = json.load(f)
+    assert set(threads) == set(keep) | set(created)
+    assert len(created) == 10
+
+
+def test_detach_asset_keeps_the_remaining_assets():
+    thread_id = chat_manager.create_chat_thread(asset_ids=["a1", "a2"])
+    assert chat_manager.detach_asset(thread_id, "a1") == ["a2"]
+    assert chat_manager.get_asset_ids_for_thread(thread_id) == ["a2"]
+    assert chat_manager.load_threads()[thread_id]["asset_id"] == "a2"
@@ -0,0 +1,70 @@
+import threading
+import pytest
+from app.constant import FileFormat, RETENTION_SETTINGS
+from app.core.db_client import ChromaDBClient
+
+
+def _vectors(n, offset=0):
+    return [[float(offset + i), 1.0, 0.5] for i in range(n)]
+
+
+@pytest.fixture
+def db(workdir):
+    return ChromaDBClient(persist_directory=str(workdir / "chroma"))
+
+
+def _ids(db):
+    return sorted(db.list_documents()[FileFormat.IDS.value])
+
+
+def test_compaction_copies_live_records_only(db):
+    db.store("a1", _vectors(5), [f"t{i}" for i in range(5)], {})
+    db.store("a2", _vectors(3), [f"u{i}" for i in range(3)], {})
+    db.delete_asset("a1", from_idx=2)
+    report = db.compact()
+    assert report[FileFormat.RECORDS.value] == 5
+    assert report[FileFormat.VACUUMED.value] is True  # No other process has this store open
+    assert _ids(db) == ["a1_0", "a1_1", "a2_0", "a2_1", "a2_2"]
+    assert db.asset_chunks("a2") == ["u0", "u1", "u2"]
+
+
+def test_write_during_compaction_waits_and_is_kept(db, monkeypatch):
+    db.store("a1", _vectors(4), [f"t{i}" for i in range(4)], {})
+    copying, release = threading.Event(), threading.Event()
+    copy_records = ChromaDBClient._copy_records
+
+    def slow_copy(self, source, target):
+        copying.set()
+        release.wait(5)
+        return copy_records(self, source, target)
+
+    monkeypatch.setattr(ChromaDBClient, "_copy_records", slow_copy)
+    compaction = threading.Thread(target=db.compact)
+    compaction.start()
+    assert copying.wait(5)
+    writer = threading.Thread(target=db.store, args=("a1", _vectors(2, 4), ["t4", "t5"], {}), kwargs={"start_idx": 4})
+    writer.start()
+    writer.join(0.5)
+    assert writer.is_alive()  # Blocked by the rebuild's write lock
+    release.set()
+    compaction.join(10)
+    writer.join(10)
+    assert db.asset_chunks("a1") == ["t0", "t1", "t2", "t3", "t4", "t5"]
+
+
+def test_interrupted_swap_is_recovered(db):
+    db.store("a1", _vectors(3), ["t0", "t1", "t2"], {})
+    name = db.router.base_name
+    # Crash after the copy finished and the original was renamed aside
+    original = db.client.get_collection(name)
+    temp = db.client.create_collection(f"{name}{RETENTION_SETTINGS.COMPACT_SUFFIX}", metadata=original.metadata)
+    db._copy_records(original, temp)
+    original.modify(name=f"{name}{RETENTION_SETTINGS.REPLACED_SUFFIX}")
+    db.compact()
+    assert sorted(c.name for c in db.client.list_collections()) == [name]
+    assert db.asset_chunks("a1") == ["t0", "t1", "t2"]
+
+
+def test_vacuum_is_skipped_while_other_clients_are_open(db, monkeypatch):
+    monkeypatch.setattr("app.core.db_client.other_clients", lambda persist_directory: 1)
+    assert db.compact()[FileFormat.VACUUMED.value] is False
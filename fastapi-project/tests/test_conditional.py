@@ -0,0 +1,67 @@
+import threading
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api.endpoints.chat import router as chat_router
+from app.core.conditional import bump_catalog_version, catalog_version
+from app.limiter import limiter
+from app.services.history import add_message
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(limiter, "enabled", False)  # Rate limits are covered by test_rate_limit
+    app = FastAPI()
+    app.state.limiter = limiter
+    app.include_router(chat_router, prefix="/api")
+    return TestClient(app)
+
+
+def _history(client, etag=None, **params):
+    headers = {"If-None-Match": etag} if etag else {}
+    return client.get("/api/chat/history", params={"thread_id": "t1", **params}, headers=headers)
+
+
+def test_history_is_not_modified_until_a_message_is_added(client):
+    add_message("t1", "hello", "user")
+    first = _history(client)
+    etag = first.headers["ETag"]
+    assert first.status_code == 200
+    assert _history(client, etag).status_code == 304
+    assert _history(client, f"W/{etag}").status_code == 304
+    assert _history(client, f'"other", {etag}').status_code == 304
+
+    add_message("t1", "again", "user")
+    changed = _history(client, etag)
+    assert changed.status_code == 200
+    assert len(changed.json()) == 2
+    assert changed.headers["ETag"] != etag
+
+
+def test_history_delta_has_its_own_etag(client):
+    add_message("t1", "hello", "user")
+    full = _history(client)
+    delta = _history(client, full.headers["ETag"], since=1)
+    assert delta.status_code == 200
+    assert delta.json()["messages"] == []
+    assert _history(client, delta.headers["ETag"], since=1).status_code == 304
+
+
+def test_catalog_version_bumps_from_many_threads():
+    errors = []
+
+    def bump():
+        try:
+            for _ in range(200):
+                bump_catalog_version()
+        except Exception as e:  # Shared temp files used to collide here
+            errors.append(e)
+
+    before = catalog_version()
+    threads = [threading.Thread(target=bump) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert catalog_version() != before
@@ -0,0 +1,56 @@
+import asyncio
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api.endpoints import document
+from app.limiter import limiter
+
+
+def _off_the_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return True
+    return False
+
+
+@pytest.fixture
+def client(workdir, monkeypatch):
+    monkeypatch.setattr(limiter, "enabled", False)  # Its SQLite store is outside the test directory
+    app = FastAPI()
+    app.state.limiter = limiter
+    app.include_router(document.router, prefix="/api")
+    return TestClient(app)
+
+
+def test_reindex_dispatches_off_the_event_loop(client, monkeypatch):
+    calls = []
+
+    def dispatch(task, asset_id):
+        calls.append(_off_the_event_loop())
+        return f"task-{asset_id}"
+
+    monkeypatch.setattr(document, "dispatch_task", dispatch)
+    response = client.post("/api/documents/reindex", json={"asset_ids": ["a1", "a2"]})
+    assert response.json() == {
+        "tasks": [{"asset_id": "a1", "task_id": "task-a1"}, {"asset_id": "a2", "task_id": "task-a2"}]
+    }
+    assert calls == [True, True]
+
+
+def test_delete_and_compact_run_off_the_event_loop(client, monkeypatch):
+    calls = []
+
+    def remove_asset(asset_id):
+        calls.append(_off_the_event_loop())
+        return True
+
+    def dispatch(task):
+        calls.append(_off_the_event_loop())
+        return "compact-1"
+
+    monkeypatch.setattr(document, "remove_asset", remove_asset)
+    monkeypatch.setattr(document, "dispatch_task", dispatch)
+    assert client.delete("/api/documents/a1").json() == {"asset_id": "a1", "status": "deleted"}
+    assert client.post("/api/chroma/compact").json() == {"task_id": "compact-1"}
+    assert calls == [True, True]
@@ -0,0 +1,85 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from app import embedded_executor
+from app.constant import EXECUTION_SETTINGS, FileStatus, IngestClass
+from app.core.ingest_scheduler import IngestJob
+from app.document_tasks import RetryIngestion
+from app.services.task_store import TaskStore
+
+
+@pytest.fixture
+def store(workdir, monkeypatch):
+    store = TaskStore()
+    monkeypatch.setattr(embedded_executor, "task_store", store)
+    return store
+
+
+def _bound_runner(monkeypatch, runner):
+    monkeypatch.setitem(embedded_executor.BOUND_RUNNERS, "test.task", "test.runner")
+    monkeypatch.setattr(embedded_executor, "_import", lambda path: runner)
+
+
+def test_a_retry_frees_the_worker_and_runs_again_after_its_countdown(store, monkeypatch):
+    calls = []
+
+    def runner(task_id, name, retries=0, max_retries=3):
+        calls.append((name, retries, time.monotonic()))
+        if name == "flaky" and retries == 0:
+            raise RetryIngestion(ValueError("busy"), 0.3, max_retries)
+        return name
+
+    _bound_runner(monkeypatch, runner)
+    monkeypatch.setattr(embedded_executor, "get_executor", lambda: pool)
+    pool = ThreadPoolExecutor(max_workers=1)
+    dispatcher = embedded_executor.Dispatcher(workers=2)
+    for task_id in ("flaky", "other"):
+        store.create(task_id, "test.task", [task_id], {}, owner=None)
+
+    dispatcher.push("flaky", "test.task", ["flaky"], {}, IngestJob(IngestClass.INTERACTIVE))
+    time.sleep(0.05)
+    dispatcher.push("other", "test.task", ["other"], {}, IngestJob(IngestClass.INTERACTIVE))
+    deadline = time.monotonic() + 5
+    while store.get("flaky")["state"] != FileStatus.SUCCESS.value and time.monotonic() < deadline:
+        time.sleep(0.02)
+    pool.shutdown(wait=True)
+
+    assert [(name, retries) for name, retries, _ in calls] == [("flaky", 0), ("other", 0), ("flaky", 1)]
+    # The single worker ran the other task while the retry was waiting
+    assert calls[1][2] - calls[0][2] < 0.2
+    assert calls[2][2] - calls[0][2] >= 0.3
+    assert store.get("flaky") == {"state": FileStatus.SUCCESS.value, "result": "flaky", "error": None, "retries": 1}
+
+
+def test_retry_budget_is_passed_to_the_next_attempt(store, monkeypatch):
+    def runner(task_id, retries=0, max_retries=3):
+        raise RetryIngestion(ValueError("busy"), 5, 7)
+
+    _bound_runner(monkeypatch, runner)
+    store.create("t1", "test.task", [], {}, owner=None)
+    assert embedded_executor._run_task("t1", "test.task", [], {}, retries=2) == (3, 7, 5)
+    assert store.get("t1")["state"] == FileStatus.RETRY.value
+    assert store.get("t1")["retries"] == 3
+
+
+def test_scheduler_ticks_off_the_event_loop_and_survives_errors(monkeypatch):
+    ticks = []
+
+    def tick():
+        ticks.append(threading.current_thread())
+        if len(ticks) == 1:
+            raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(embedded_executor, "_schedule_tick", tick)
+    monkeypatch.setattr(EXECUTION_SETTINGS, "SCHEDULER_TICK", 0.01)
+
+    async def run():
+        scheduler = asyncio.create_task(embedded_executor.run_schedule())
+        while len(ticks) < 3:
+            await asyncio.sleep(0.01)
+        scheduler.cancel()
+
+    asyncio.run(asyncio.wait_for(run(), 5))
+    assert all(thread is not threading.main_thread() for thread in ticks)
@@ -0,0 +1,70 @@
+import threading
+import pytest
+from app.constant import FileFormat
+from app.core import embedding_versions
+from app.core.db_client import ChromaDBClient
+from app.core.embedding_versions import MigrationPending, load_state
+from app.services import embedding_migration
+
+
+@pytest.fixture
+def db(workdir, monkeypatch):
+    db = ChromaDBClient(persist_directory=str(workdir / "chroma"))
+    monkeypatch.setattr(embedding_migration, "chroma_client", db)
+    return db
+
+
+def _store(db, asset_id, version, texts=("a", "b")):
+    db.store(asset_id, [[float(i), 1.0, 0.5] for i in range(len(texts))], list(texts), {}, version=version)
+
+
+def test_start_empties_vectors_left_in_the_target(db):
+    _store(db, "a1", "v1")
+    _store(db, "a1", "v2", texts=("stale a", "stale b"))
+    embedding_migration.start("v2")
+    assert load_state()[FileFormat.TARGET.value] == "v2"
+    assert db.asset_chunks("a1", version="v2") == []
+    assert embedding_migration.pending_assets("v1", "v2") == ["a1"]
+
+
+def test_abort_drops_what_was_reembedded(db):
+    _store(db, "a1", "v1")
+    embedding_migration.start("v2")
+    _store(db, "a1", "v2")
+    embedding_migration.abort()
+    assert load_state()[FileFormat.TARGET.value] is None
+    assert db.list_assets(version="v2") == {}
+    assert db.asset_chunks("a1", version="v1") == ["a", "b"]
+
+
+def test_cutover_waits_for_pending_assets_unless_forced(db):
+    _store(db, "a1", "v1")
+    embedding_migration.start("v2")
+    with pytest.raises(MigrationPending):
+        embedding_migration.cutover()
+    _store(db, "a1", "v2")
+    state = embedding_migration.cutover()
+    assert (state[FileFormat.ACTIVE.value], state[FileFormat.PREVIOUS.value]) == ("v2", "v1")
+
+
+def test_nothing_changes_the_pointer_between_the_pending_check_and_the_swap(db):
+    embedding_migration.start("v2")
+    order = []
+
+    def abort():
+        embedding_migration.abort()
+        order.append("abort")
+
+    def pending(active, target):
+        contender.start()
+        contender.join(0.2)
+        order.append("checked")
+        return []
+
+    contender = threading.Thread(target=abort)
+    embedding_versions.cutover(pending=pending)
+    order.append("swapped")
+    contender.join(5)
+
+    assert order == ["checked", "swapped", "abort"]
+    assert load_state()[FileFormat.ACTIVE.value] == "v2"
@@ -0,0 +1,65 @@
+import asyncio
+from app.core import rag_agent
+from app.core.admission import AdmissionController
+from app.core.llm_client import HedgedChatModel
+
+
+class _Reply:
+    def __init__(self, content):
+        self.content = content
+
+
+class _Model:
+    def __init__(self, name, delay):
+        self.name = name
+        self.delay = delay
+        self.calls = 0
+
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return _Reply(self.name)
+
+
+def _hedged(monkeypatch, slots):
+    admission = AdmissionController(max_concurrent=slots)
+    monkeypatch.setattr(rag_agent, "llm_admission", admission)
+    model = HedgedChatModel(_Model("primary", 0.3), _Model("backup", 0.0), label="test")
+    model.latency.hedge_delay = lambda: 0.01
+    return model, admission
+
+
+async def _call(model, admission, charge=None):
+    async with admission.slot("relevance"):
+        reply = await model.ainvoke("prompt", may_hedge=rag_agent._hedge_admission(charge))
+    return reply.content
+
+
+def test_backup_takes_a_second_slot_and_gives_it_back(monkeypatch):
+    model, admission = _hedged(monkeypatch, slots=2)
+    charged = []
+
+    async def charge(prompt):
+        charged.append(prompt)
+        return True
+
+    assert asyncio.run(_call(model, admission, charge)) == "backup"
+    assert charged == ["prompt"]
+    assert admission.stats()["active"] == 0
+
+
+def test_no_hedge_without_a_free_slot(monkeypatch):
+    model, admission = _hedged(monkeypatch, slots=1)
+    assert asyncio.run(_call(model, admission)) == "primary"
+    assert model.backup.calls == 0
+
+
+def test_no_hedge_when_the_quota_is_spent(monkeypatch):
+    model, admission = _hedged(monkeypatch, slots=2)
+
+    async def charge(prompt):
+        return False
+
+    assert asyncio.run(_call(model, admission, charge)) == "primary"
+    assert model.backup.calls == 0
+    assert admission.stats()["active"] == 0
@@ -0,0 +1,104 @@
+import os
+import json
+import zlib
+import threading
+from app.services import history, history_archive
+from app.services.history_archive import read_archived, remove_archived, shard_lock, shard_of
+
+
+def _same_shard_threads(n, shard="00"):
+    thread_ids, i = [], 0
+    while len(thread_ids) < n:
+        if shard_of(f"t{i}") == shard:
+            thread_ids.append(f"t{i}")
+        i += 1
+    return thread_ids
+
+
+def _write_hot(thread_id, text="hello"):
+    os.makedirs(history._HISTORY_DIR, exist_ok=True)
+    messages = [{"message": f"{text} {thread_id}", "sender": "user", "timestamp": "2025-01-01T00:00:00Z"}]
+    with open(history._history_file(thread_id), "w") as f:
+        json.dump(messages, f)
+    return messages
+
+
+def _segments(shard):
+    return [n for n in os.listdir(history_archive._shard_dir(shard)) if n.endswith(".seg")]
+
+
+def test_archived_histories_round_trip(workdir):
+    expected = {thread_id: _write_hot(thread_id) for thread_id in _same_shard_threads(5)}
+    assert history.archive_idle_histories(max_idle_seconds=-1) == 5
+
+    for thread_id, messages in expected.items():
+        assert not os.path.exists(history._history_file(thread_id))
+        assert json.loads(read_archived(thread_id)) == messages
+    assert remove_archived(next(iter(expected)))
+    assert read_archived(next(iter(expected))) is None
+
+
+def test_small_segments_are_packed_together_across_runs(workdir):
+    first, second = _same_shard_threads(2)
+    _write_hot(first)
+    history.archive_idle_histories(max_idle_seconds=-1)
+    _write_hot(second)
+    history.archive_idle_histories(max_idle_seconds=-1)
+
+    assert len(_segments("00")) == 1
+    assert json.loads(read_archived(first))[0]["message"] == f"hello {first}"
+
+
+def test_read_retries_with_the_new_index_after_a_repack(workdir, monkeypatch):
+    first, second = _same_shard_threads(2)
+    _write_hot(first)
+    history.archive_idle_histories(max_idle_seconds=-1)
+    stale = history_archive._load_index("00")
+    _write_hot(second)
+    history.archive_idle_histories(max_idle_seconds=-1)
+    assert stale[first][0] not in _segments("00")
+
+    load_index = history_archive._load_index
+    answers = iter([stale])
+    monkeypatch.setattr(history_archive, "_load_index", lambda shard: next(answers, None) or load_index(shard))
+    assert json.loads(read_archived(first))[0]["message"] == f"hello {first}"
+
+
+def test_shard_lock_excludes_other_threads_and_ignores_leftover_lock_files(workdir):
+    os.makedirs(history_archive._shard_dir("00"), exist_ok=True)
+    # A lock file left behind by a dead process does not hold the lock
+    open(os.path.join(history_archive._shard_dir("00"), ".lock"), "w").close()
+    acquired = threading.Event()
+
+    def contend():
+        with shard_lock("00"):
+            acquired.set()
+
+    with shard_lock("00"):
+        with shard_lock("00"):  # Re-entrant within the thread
+            contender = threading.Thread(target=contend)
+            contender.start()
+            assert not acquired.wait(0.2)
+    assert acquired.wait(5)
+    contender.join()
+
+
+def test_histories_of_the_per_history_codec_stay_readable_and_are_repacked(workdir):
+    old, new = _same_shard_threads(2)
+    raw = json.dumps([{"message": "old", "sender": "user", "timestamp": "2025-01-01T00:00:00Z"}]).encode()
+    c = zlib.compressobj(9, zdict=history_archive._ZDICT_V1)
+    blob = c.compress(raw) + c.flush()
+    shard_dir = history_archive._shard_dir("00")
+    os.makedirs(shard_dir)
+    with open(os.path.join(shard_dir, "old.seg"), "wb") as f:
+        f.write(blob)
+    with open(os.path.join(shard_dir, "index.json"), "w") as f:
+        json.dump({old: ["old.seg", 0, len(blob), "zd1"]}, f)
+
+    assert read_archived(old) == raw
+    _write_hot(new)
+    history.archive_idle_histories(max_idle_seconds=-1)
+
+    assert "old.seg" not in _segments("00")
+    assert read_archived(old) == raw
+    assert history_archive._load_index("00")[old][3] == history_archive.CODEC_ZSTD_BLOCK_V1
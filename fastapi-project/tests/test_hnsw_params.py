@@ -0,0 +1,19 @@
+from app.constant import HNSW_SETTINGS, HnswParam
+from app.core import hnsw_params
+from app.core.db_client import ChromaDBClient
+
+
+def test_tuned_parameters_reach_a_collection_when_it_is_rebuilt(workdir):
+    db = ChromaDBClient(persist_directory=str(workdir / "chroma"))
+    db.store("a1", [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]], ["t0", "t1"], {})
+    name = db.router.route_of("a1")
+    hnsw_params.save_tuned({name: {HnswParam.SEARCH_EF.value: 64, HnswParam.K.value: 7}})
+
+    # Looking a collection up never rewrites it; the new k applies right away
+    assert db.router.get_collection(name).metadata[HnswParam.SEARCH_EF.metadata_key] == HNSW_SETTINGS.SEARCH_EF
+    assert db.router.params_for(name)[HnswParam.K.value] == 7
+
+    db.compact()
+    rebuilt = db.router.get_collection(name)
+    assert rebuilt.metadata[HnswParam.SEARCH_EF.metadata_key] == 64
+    assert rebuilt.count() == 2
@@ -0,0 +1,48 @@
+import fakeredis
+import pytest
+from app.constant import FileFormat, IngestClass
+from app.core import ingest_scheduler
+from app.core.ingest_scheduler import IngestJob
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(ingest_scheduler, "_redis", client)
+    return client
+
+
+def _counts(queue):
+    stats = ingest_scheduler.queue_stats()[queue]
+    return stats[FileFormat.QUEUED.value], stats[FileFormat.OUTSTANDING.value]
+
+
+def _admit(task_id):
+    return ingest_scheduler.admit(task_id, IngestJob(IngestClass.STANDARD, tenant_id="t1"))
+
+
+def test_revoking_a_queued_job_releases_its_queue_place_and_tenant_slot(client):
+    job = _admit("j1")
+    assert _counts(job.queue) == (1, {"t1": 1})
+    ingest_scheduler.record_discarded("j1")
+    assert _counts(job.queue) == (0, {})
+    # A second signal for the same job changes nothing
+    ingest_scheduler.record_discarded("j1")
+    ingest_scheduler.record_finished("j1", "REVOKED")
+    assert client.hget(ingest_scheduler._key("queued"), job.queue) == "0"
+    assert client.hget(ingest_scheduler._key("outstanding", job.queue), "t1") == "0"
+
+
+def test_a_failed_running_job_is_released_once(client):
+    job = _admit("j1")
+    ingest_scheduler.record_started("j1")
+    ingest_scheduler.record_discarded("j1")  # task_failure, then task_postrun
+    ingest_scheduler.record_finished("j1", "FAILURE")
+    assert client.hget(ingest_scheduler._key("queued"), job.queue) == "0"
+    assert client.hget(ingest_scheduler._key("outstanding", job.queue), "t1") == "0"
+
+
+def test_wait_summary():
+    assert ingest_scheduler.wait_summary([]) == {"count": 0, "p50": None, "p95": None, "max": None}
+    summary = ingest_scheduler.wait_summary([0.3, 0.1, 0.2])
+    assert summary == {"count": 3, "p50": 0.2, "p95": 0.3, "max": 0.3}
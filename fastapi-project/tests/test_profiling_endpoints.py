@@ -0,0 +1,30 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api.endpoints import profiling
+from app.constant import PROFILING_SETTINGS
+from app.limiter import limiter
+
+
+@pytest.fixture
+def client(workdir, monkeypatch):
+    monkeypatch.setattr(profiling, "list_profiles", lambda: [{"id": "p1"}])
+    monkeypatch.setattr(limiter, "enabled", False)  # Its SQLite store is outside the test directory
+    app = FastAPI()
+    app.state.limiter = limiter
+    app.include_router(profiling.router, prefix="/api")
+    return TestClient(app)
+
+
+def test_profiles_are_closed_without_a_configured_token(client, monkeypatch):
+    monkeypatch.setattr(PROFILING_SETTINGS, "TOKEN", None)
+    assert client.get("/api/profiles", headers={PROFILING_SETTINGS.HEADER: "1"}).status_code == 403
+
+
+def test_profiles_require_the_token(client, monkeypatch):
+    monkeypatch.setattr(PROFILING_SETTINGS, "TOKEN", "s3cret")
+    assert client.get("/api/profiles").status_code == 403
+    assert client.get("/api/profiles/p1", headers={PROFILING_SETTINGS.HEADER: "wrong"}).status_code == 403
+    response = client.get("/api/profiles", headers={PROFILING_SETTINGS.HEADER: "s3cret"})
+    assert response.status_code == 200
+    assert response.json() == [{"id": "p1"}]
@@ -0,0 +1,26 @@
+from app.constant import FileFormat, ProgressStage
+from app.core.progress import ProgressPublisher
+
+
+def _recording(task_id):
+    publisher = ProgressPublisher(task_id)
+    published = []
+    publisher._publish = published.append
+    return publisher, published
+
+
+def test_non_terminal_events_are_throttled():
+    publisher, published = _recording("task-1")
+    publisher.on_page(1, 10)
+    publisher.on_page(2, 10)
+    publisher.on_page(3, 10)
+    assert published == [ProgressStage.PARSING]
+    assert publisher.counters[FileFormat.PAGES_PARSED.value] == 3
+
+
+def test_terminal_and_forced_events_are_always_published():
+    publisher, published = _recording("task-2")
+    publisher.update(ProgressStage.PARSING)
+    publisher.update(ProgressStage.EMBEDDING, force=True)
+    publisher.update(ProgressStage.SUCCESS)
+    assert published == [ProgressStage.PARSING, ProgressStage.EMBEDDING, ProgressStage.SUCCESS]
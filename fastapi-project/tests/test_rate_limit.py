@@ -0,0 +1,74 @@
+import pytest
+from app.constant import LIMITER_SETTINGS
+from app.core import rate_limit
+from app.core.rate_limit import MemoryTokenBucket, SQLiteStorage, SQLiteTokenBucket, TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "time", lambda: now[0])
+    return now
+
+
+def _rows(conn, table):
+    return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_fixed_window_counts_and_resets(workdir, clock):
+    storage = SQLiteStorage("sqlite:///limits.db")
+    assert storage.incr("k", expiry=10) == 1
+    assert storage.incr("k", expiry=10) == 2
+    assert storage.get("k") == 2
+    assert storage.get_expiry("k") == 1010.0
+
+    clock[0] += 10
+    assert storage.get("k") == 0
+    assert storage.incr("k", expiry=10) == 1
+    assert storage.get_expiry("k") == 1020.0
+
+
+def test_ended_windows_are_deleted_on_write(workdir, clock):
+    storage = SQLiteStorage("sqlite:///limits.db")
+    for client in range(5):
+        storage.incr(f"client-{client}", expiry=10)
+    conn = storage._connections.get()
+    assert _rows(conn, "rate_counters") == 5
+
+    clock[0] += 10
+    storage.incr("other", expiry=10)
+    # Pruning runs at most once per interval
+    assert _rows(conn, "rate_counters") == 6
+
+    clock[0] += LIMITER_SETTINGS.PRUNE_INTERVAL
+    storage.incr("other", expiry=10)
+    assert _rows(conn, "rate_counters") == 1
+
+
+@pytest.mark.parametrize("backend", [MemoryTokenBucket, SQLiteTokenBucket])
+def test_token_buckets_consume_refill_and_adjust(workdir, clock, backend):
+    bucket = backend("sqlite:///limits.db")
+    assert bucket.consume("k", 80, capacity=100, rate=10) == (True, 0.0)
+    assert bucket.consume("k", 30, capacity=100, rate=10) == (False, 1.0)
+
+    clock[0] += 1
+    assert bucket.consume("k", 30, capacity=100, rate=10) == (True, 0.0)
+    bucket.adjust("k", -50, capacity=100, rate=10)  # Charge past zero
+    assert bucket.consume("k", 10, capacity=100, rate=10) == (False, 6.0)
+
+
+def test_full_sqlite_buckets_are_deleted_on_write(workdir, clock):
+    bucket = SQLiteTokenBucket("sqlite:///limits.db")
+    bucket.consume("idle", 50, capacity=100, rate=10)
+    conn = bucket._connections.get()
+
+    clock[0] += LIMITER_SETTINGS.PRUNE_INTERVAL
+    bucket.consume("busy", 50, capacity=100, rate=10)
+    assert [row[0] for row in conn.execute("SELECT key FROM token_buckets")] == ["busy"]
+    # A deleted bucket reads as full
+    assert bucket.consume("idle", 100, capacity=100, rate=10) == (True, 0.0)
+
+
+def test_token_bucket_base_needs_a_backend():
+    with pytest.raises(TypeError):
+        TokenBucket()
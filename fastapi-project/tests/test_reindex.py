@@ -0,0 +1,49 @@
+import pytest
+from app import document_tasks, embedded_executor
+from app.constant import IngestClass
+from app.document_tasks import RetryIngestion, reindex_asset, reindex_asset_task
+
+
+def _failing(monkeypatch, exc):
+    def reindex(asset_id):
+        raise exc
+
+    monkeypatch.setattr(document_tasks, "_reindex_asset", reindex)
+
+
+def test_missing_asset_fails_without_retrying(monkeypatch):
+    monkeypatch.setattr(document_tasks.chroma_client, "asset_metadata", lambda asset_id: None)
+    with pytest.raises(ValueError, match="Asset not found"):
+        reindex_asset("gone")
+
+
+def test_transient_errors_retry_until_the_budget_is_spent(monkeypatch):
+    _failing(monkeypatch, ConnectionError("store busy"))
+    with pytest.raises(RetryIngestion) as retry:
+        reindex_asset("a1", retries=0, max_retries=3)
+    assert retry.value.max_retries == 3 and retry.value.countdown > 0
+    with pytest.raises(ConnectionError):
+        reindex_asset("a1", retries=3, max_retries=3)
+
+
+def test_celery_task_retries_with_the_countdown(monkeypatch):
+    _failing(monkeypatch, ConnectionError("store busy"))
+    calls = []
+
+    class Retry(Exception):
+        pass
+
+    def retry(**kwargs):
+        calls.append(kwargs)
+        return Retry()
+
+    monkeypatch.setattr(reindex_asset_task, "retry", retry)
+    with pytest.raises(Retry):
+        reindex_asset_task.run("a1")
+    assert isinstance(calls[0]["exc"], ConnectionError)
+    assert calls[0]["countdown"] > 0 and calls[0]["max_retries"] == 3
+
+
+def test_embedded_reindex_is_queued_as_bulk():
+    job = embedded_executor._default_job("app.document_tasks.reindex_asset_task", ["a1"], {})
+    assert job.ingest_class == IngestClass.BULK
@@ -0,0 +1,49 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from starlette.concurrency import run_in_threadpool
+from app.services import retrieval, warmup
+
+
+class _Client:
+    def __init__(self, slow):
+        self.slow = slow
+        self.release = threading.Event()
+        self.searched = []
+
+    def search(self, asset_id, query_embedding, k, version):
+        self.searched.append(asset_id)
+        if asset_id in self.slow:
+            self.release.wait(5)
+        return [(f"text of {asset_id}", {"asset_id": asset_id}, 0.1)]
+
+
+def test_abandoned_searches_stay_in_the_retrieval_pool(monkeypatch):
+    monkeypatch.setattr(retrieval, "_search_pool", ThreadPoolExecutor(max_workers=2))
+    monkeypatch.setattr(warmup, "record_search", lambda asset_id, ms: None)
+    client = _Client(slow={"a", "b"})
+
+    async def scenario():
+        timed_out = await asyncio.gather(
+            *[retrieval._search_asset(client, asset_id, [0.0], None, 0.1) for asset_id in ("a", "b", "c")]
+        )
+        # Both retrieval threads are still stuck; the request threadpool is not
+        other_work = await asyncio.wait_for(run_in_threadpool(lambda: "free"), 1)
+        return timed_out, other_work
+
+    try:
+        timed_out, other_work = asyncio.run(scenario())
+    finally:
+        client.release.set()
+        retrieval._search_pool.shutdown(wait=True)
+
+    assert timed_out == [[], [], []]
+    assert other_work == "free"
+    # The search queued behind the stuck ones was cancelled when its caller gave up
+    assert client.searched == ["a", "b"]
+
+
+def test_fast_searches_return_their_hits(monkeypatch):
+    monkeypatch.setattr(warmup, "record_search", lambda asset_id, ms: None)
+    hits = asyncio.run(retrieval._search_asset(_Client(slow=set()), "a", [0.0], None, 1))
+    assert hits == [("text of a", {"asset_id": "a"}, 0.1)]
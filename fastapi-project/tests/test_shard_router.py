@@ -0,0 +1,76 @@
+import pytest
+from app.constant import ShardStrategy
+from app.core.db_client import ChromaDBClient
+from app.core.shard_router import RouteCatalog, _slug
+from app.scripts import migrate_shards
+
+
+def _vectors(n):
+    return [[float(i), 1.0, 0.0] for i in range(n)]
+
+
+@pytest.mark.parametrize(
+    "a, b",
+    [("Acme", "acme"), ("ACME", "Acme"), ("a_b", "a-b"), ("x" * 50, "x" * 51), ("Ü", "ü")],
+)
+def test_slugs_of_distinct_values_never_collide(a, b):
+    assert _slug(a) != _slug(b)
+
+
+def test_slug_keeps_short_lowercase_values_readable():
+    assert _slug("acme-01") == "acme-01"
+    assert _slug("Acme").startswith("acme.")
+
+
+def test_route_cache_sees_changes_from_other_processes(workdir):
+    ours, theirs = RouteCatalog(str(workdir / "routes.db")), RouteCatalog(str(workdir / "routes.db"))
+    ours.put("a1", "documents_b_01")
+    assert theirs.get("a1") == "documents_b_01"
+    ours.put("a1", "documents_b_02")
+    assert theirs.get("a1") == "documents_b_02"
+    ours.delete("a1")
+    assert theirs.get("a1") is None
+
+
+def test_reads_never_create_collections(workdir):
+    db = ChromaDBClient(persist_directory=str(workdir / "chroma"))
+    assert db.asset_metadata("missing") is None
+    assert db.asset_chunks("missing") == []
+    assert not db.asset_exists("missing")
+    assert db.client.list_collections() == []
+
+
+def test_deleting_an_asset_drops_its_own_collection(workdir):
+    db = ChromaDBClient(persist_directory=str(workdir / "chroma"))
+    router = db.router
+    router.strategy = ShardStrategy.ASSET
+    db.store("a1", _vectors(2), ["t0", "t1"], {})
+    name = router.route_of("a1")
+    assert router.is_asset_collection(name)
+
+    db.delete_asset("a1", from_idx=1)
+    assert router.get_collection(name).count() == 1
+    db.delete_asset("a1")
+    assert name not in [c.name for c in db.client.list_collections()]
+
+
+def test_migration_switches_an_asset_only_once_it_is_complete(workdir, monkeypatch):
+    db = ChromaDBClient()
+    db.store("a1", _vectors(5), [f"a{i}" for i in range(5)], {})
+    db.store("a2", _vectors(3), [f"b{i}" for i in range(3)], {})
+
+    seen = []
+    move = migrate_shards._move_asset
+
+    def observe(db_, router, asset_id, *args):
+        moved = move(db_, router, asset_id, *args)
+        # Right after each switch, every asset reads back in full
+        seen.append({a: len(db_.asset_chunks(a)) for a in ("a1", "a2")})
+        return moved
+
+    monkeypatch.setattr(migrate_shards, "_move_asset", observe)
+    moved = migrate_shards.migrate(ShardStrategy.ASSET_HASH.value, batch_size=2)
+
+    assert sum(moved.values()) == 8
+    assert seen == [{"a1": 5, "a2": 3}] * 2
+    assert db.collection.count() == 0
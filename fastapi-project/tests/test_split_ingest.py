@@ -0,0 +1,87 @@
+from app.constant import FileFormat, FileType, SPLIT_SETTINGS
+from app.services import split_ingest
+from app.services.split_ingest import chunk_ranges, load_part_texts, parse_range, parse_ranges
+
+
+def test_text_ranges_cover_every_line(workdir, monkeypatch):
+    monkeypatch.setattr(SPLIT_SETTINGS, "BYTES_PER_PART", 100)
+    path = workdir / "big.txt"
+    lines = [f"line {i} " + "x" * (i % 7) + "\n" for i in range(200)]
+    path.write_text("".join(lines))
+
+    ranges = parse_ranges(str(path), FileType.TXT.value)
+    assert len(ranges) > 1
+    assert ranges[-1][1] is None
+    parsed = [unit for part_range in ranges for unit in parse_range(str(path), FileType.TXT.value, part_range)]
+    assert parsed == lines
+
+
+def test_last_pdf_range_is_open_ended(monkeypatch):
+    monkeypatch.setattr(split_ingest, "_pdf_pages", lambda path: 100)
+    ranges = parse_ranges("doc.pdf", FileType.PDF.value)
+    assert ranges[0][0] == 0
+    assert ranges[-1][1] is None
+    assert all(end == nxt for (_, end), (nxt, _) in zip(ranges, ranges[1:]))
+
+
+def test_chunk_ranges_are_exact():
+    ranges = chunk_ranges(SPLIT_SETTINGS.CHUNKS_PER_PART * 2 + 5)
+    assert ranges[0][0] == 0
+    assert ranges[-1][1] == SPLIT_SETTINGS.CHUNKS_PER_PART * 2 + 5
+
+
+def test_embed_parts_read_only_their_own_chunks(workdir, monkeypatch):
+    from app import document_tasks
+
+    monkeypatch.setattr(SPLIT_SETTINGS, "CHUNKS_PER_PART", 2)
+    monkeypatch.setattr(document_tasks.FILE_SETTINGS, "CHUNK_SIZE_WORDS", 3)
+    monkeypatch.setattr(document_tasks.FILE_SETTINGS, "CHUNK_OVERLAP", 0)
+    units = [" ".join(f"w{i}" for i in range(start, start + 3)) for start in range(0, 15, 3)]
+    job = {FileFormat.ASSET_ID.value: "a1", FileFormat.QUEUE.value: None}
+
+    workflow = document_tasks.embed_phase(job, units)
+
+    assert len(workflow.tasks) == 3
+    assert [load_part_texts("a1", part) for part in range(3)] == [units[0:2], units[2:4], units[4:5]]
+
+
+def test_a_failed_part_releases_the_jobs_scheduling_counters(workdir, monkeypatch):
+    import fakeredis
+    from celery import chord, group
+    from celery.backends.cache import CacheBackend
+    from celery.exceptions import ChordError
+    from app import document_tasks
+    from app.celery_app import celery_app
+    from app.constant import IngestClass
+    from app.core import ingest_scheduler
+    from app.core.ingest_scheduler import IngestJob
+
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(ingest_scheduler, "_redis", client)
+    monkeypatch.setattr(celery_app.conf, "task_always_eager", True)
+    abandoned = []
+    monkeypatch.setattr(
+        document_tasks, "abandon_ingestion", lambda asset_id, progress, error: abandoned.append(asset_id)
+    )
+    job = ingest_scheduler.admit("t1", IngestJob(IngestClass.BULK, tenant_id="tenant"))
+    ingest_scheduler.record_started("t1")
+
+    # As split_ingestion builds it; the body carries the original task id (Task.replace)
+    split = {FileFormat.TASK_ID.value: "t1"}
+    workflow = chord(
+        group(document_tasks.parse_part_task.si(split, 0, (0, None))),
+        document_tasks.plan_embed_task.s(split).set(task_id="t1"),
+    )
+    workflow.link_error(document_tasks.abort_split_task.s())
+    # What the result backend does when a header part finally fails
+    backend = CacheBackend(app=celery_app, backend="memory")
+    monkeypatch.setattr(document_tasks.plan_embed_task, "backend", backend)
+    try:
+        raise ChordError("parse part 0 failed")
+    except ChordError as e:
+        backend.chord_error_from_stack(workflow.body, e)
+
+    assert abandoned == [document_tasks.stable_asset_id("t1")]
+    assert not client.exists(ingest_scheduler._key("job", "t1"))
+    assert client.hget(ingest_scheduler._key("outstanding", job.queue), "tenant") == "0"
+    assert client.hget(ingest_scheduler._key("queued"), job.queue) == "0"
@@ -0,0 +1,15 @@
+import time
+from app.constant import WARMUP_SETTINGS, FileFormat
+from app.services import warmup
+
+
+def test_recently_warmed_counts_assets_warmed_within_two_intervals(monkeypatch):
+    now = time.monotonic()
+    monkeypatch.setattr(
+        warmup,
+        "_warmed_at",
+        {"fresh": now, "edge": now - 1.5 * WARMUP_SETTINGS.INTERVAL, "stale": now - 3 * WARMUP_SETTINGS.INTERVAL},
+    )
+    stats = warmup.stats()
+    assert stats[FileFormat.RECENTLY_WARMED.value] == 2
+    assert "resident" not in stats